@@ -8,6 +8,7 @@ the context of what kinds of conditions have led to slides in the past.
 
 import utils.analysis_utils as a_utils
 from utils import plot_utils
+from utils.critical_points import CriticalPointDetector
 
 
 print("Analyzing current river data.")
@@ -16,7 +17,14 @@ current_data = a_utils.fetch_current_data(fresh=False)
 readings = a_utils.process_xml_data(current_data)
 
 recent_readings = a_utils.get_recent_readings(readings, 48)
-critical_points = a_utils.get_critical_points(recent_readings)
+
+# Feed readings through a streaming detector. Each reading is examined once,
+#   so the same detector can keep running against a live feed.
+config = a_utils.AnalysisConfig()
+detector = CriticalPointDetector(config.rise_critical, config.m_critical,
+        config.river_min_height)
+critical_points = [reading for reading in recent_readings
+                        if detector.update(reading).is_critical]
 plot_utils.plot_current_data_html(recent_readings)
 
 # Make a data file of all hx IRReading objects, to make the rest of the
@@ -0,0 +1,341 @@
+"""Benchmark parsing, analysis, and plotting at several data sizes.
+
+Each benchmark is run at each size. Throughput is reported as items/s,
+  where an item is a reading for the parsers and critical point functions,
+  a reading set for get_48hr_readings() and get_relevant_slide(), and a
+  reading in the plotted set for the plot functions. Peak memory is
+  measured with tracemalloc, in a separate run from the timed runs.
+
+Results are written as json, so runs from different commits can be
+  compared:
+$ python benchmark.py
+$ python benchmark.py --sizes 1000 4000 --output before.json
+$ python benchmark.py --compare before.json
+
+Inputs are built from slices of the data files in the repo, so sizes larger
+  than a data file are capped at the size of the file. The number of items
+  actually processed is recorded with each result.
+"""
+
+import argparse, contextlib, datetime, io, json, os, platform, subprocess
+import tempfile, time, tracemalloc
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import plot_heights as ph
+import utils.analysis_utils as a_utils
+import utils.parse_utils as parse_utils
+from utils.reading_series import TimeIndex
+from slide_event import SlideCatalog
+
+
+HX_FILE = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+ARCH_FILE = 'ir_data_other/irva_akdt_101019-123120_arch_format.txt'
+SLIDES_FILE = 'known_slides/known_slides.json'
+
+SIZES = [1000, 4000, 12000]
+PLOT_SIZES = [192, 960]
+BENCHMARKS_DIR = 'other_output/benchmarks'
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+    help="Numbers of readings to process.")
+parser.add_argument('--plot-sizes', type=int, nargs='+', default=PLOT_SIZES,
+    help="Numbers of readings in each plotted reading set. 192 is 48 hrs of 15-min readings.")
+parser.add_argument('--repeat', type=int, default=3,
+    help="Timed runs of each benchmark; the fastest is reported.")
+parser.add_argument('--only', nargs='+',
+    help="Only run these benchmarks.")
+parser.add_argument('--output',
+    help=f"Results file. Default: {BENCHMARKS_DIR}/<commit>.json")
+parser.add_argument('--compare',
+    help="Earlier results file to compare against.")
+
+
+def get_commit():
+    """Return the short hash of the current commit, or None."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Inputs ---
+
+def write_hx_file(path, size):
+    """Write the header and the first size readings of HX_FILE to path."""
+    with open(HX_FILE) as f:
+        lines = f.readlines()
+    # The header ends with a sentinel row, which isn't a reading.
+    header_length = next(line_num for line_num, line in enumerate(lines)
+                            if line.startswith(parse_utils.HX_SENTINEL)) + 1
+    with open(path, 'w') as f:
+        f.writelines(lines[:header_length + size])
+
+
+def write_arch_file(path, size):
+    """Write the header and the first size readings of ARCH_FILE to path."""
+    with open(ARCH_FILE) as f:
+        lines = f.readlines()
+    header_length = next(line_num for line_num, line in enumerate(lines)
+                            if line.startswith('USGS'))
+    with open(path, 'w') as f:
+        f.writelines(lines[:header_length + size])
+
+
+def get_xml_data(readings):
+    """Return readings in the xml format that fetch_current_data() gets,
+    with the most recent reading first.
+    """
+    data = ['<site><sigstages/><sigflows/><zerodatum/><rating/>',
+            '<alt_rating/><observed>']
+    for reading in reversed(readings):
+        dt_str = reading.dt_reading.strftime('%Y-%m-%dT%H:%M:%S-00:00')
+        data.append(f'<datum><valid timezone="UTC">{dt_str}</valid>'
+                f'<primary name="Stage" units="ft">{reading.height}</primary>'
+                '</datum>')
+    data.append('</observed><forecast/></site>')
+    return ''.join(data)
+
+
+def get_reading_set_starts(readings, window_hours=a_utils.WINDOW_HOURS):
+    """Return one reading per day, far enough from both ends of readings
+    for a full reading set around it.
+    """
+    readings_per_hr = a_utils.get_reading_rate(readings)
+    window = window_hours * readings_per_hr
+    step = 24 * readings_per_hr
+    return [readings[i] for i in range(window, len(readings) - window, step)]
+
+
+class BenchmarkData:
+    """Inputs shared by all benchmarks, built once."""
+
+    def __init__(self, work_dir):
+        self.work_dir = Path(work_dir)
+        self.known_slides = SlideCatalog.load(SLIDES_FILE)
+        self.series = parse_utils.get_series_arch_format(ARCH_FILE)
+        self.files = {}
+
+    def get_file(self, kind, size):
+        """Return the path to a data file with size readings."""
+        if (kind, size) not in self.files:
+            path = self.work_dir / f"{kind}_{size}_{kind}_format.txt"
+            if kind == 'hx':
+                write_hx_file(path, size)
+            else:
+                write_arch_file(path, size)
+            self.files[(kind, size)] = str(path)
+        return self.files[(kind, size)]
+
+
+# --- Benchmarks ---
+# Each benchmark takes the shared data and a size, and returns a function to
+#   time, and the number of items that function processes.
+
+def bench_get_readings_hx_format(data, size):
+    data_file = data.get_file('hx', size)
+    n_items = len(parse_utils.get_series_hx_format(data_file))
+    return lambda: ph.get_readings_hx_format(data_file), n_items
+
+
+def bench_get_readings_arch_format(data, size):
+    data_file = data.get_file('arch', size)
+    n_items = len(parse_utils.get_series_arch_format(data_file))
+    return lambda: ph.get_readings_arch_format(data_file), n_items
+
+
+def bench_process_xml_data(data, size):
+    readings = data.series[:size].to_readings()
+    xml_data = get_xml_data(readings)
+    return lambda: a_utils.process_xml_data(xml_data), len(readings)
+
+
+def bench_get_critical_points(data, size):
+    readings = data.series[:size]
+    return lambda: a_utils.get_critical_points(readings), len(readings)
+
+
+def bench_get_first_critical_points(data, size):
+    readings = data.series[:size]
+    return lambda: a_utils.get_first_critical_points(readings), len(readings)
+
+
+def bench_get_48hr_readings(data, size):
+    readings = data.series[:size]
+    starts = get_reading_set_starts(readings)
+
+    def run():
+        time_index = TimeIndex(readings)
+        for reading in starts:
+            a_utils.get_48hr_readings(reading, readings, time_index)
+
+    return run, len(starts)
+
+
+def bench_get_relevant_slide(data, size):
+    readings = data.series[:size]
+    time_index = TimeIndex(readings)
+    reading_sets = [a_utils.get_48hr_readings(reading, readings, time_index)
+                        for reading in get_reading_set_starts(readings)]
+
+    def run():
+        for reading_set in reading_sets:
+            ph.get_relevant_slide(reading_set, data.known_slides)
+
+    return run, len(reading_sets)
+
+
+def get_plot_args(data, size):
+    """Return a reading set of size readings around a critical event, and
+    its critical points.
+    """
+    first_critical_points = a_utils.get_first_critical_points(data.series)
+    center = data.series.index(first_critical_points[0])
+    start = max(center - size // 2, 0)
+    readings = data.series[start:start + size].to_readings()
+    return readings, a_utils.get_critical_points(readings)
+
+
+def bench_plot_data(data, size):
+    readings, critical_points = get_plot_args(data, size)
+    root_output_directory = f"{data.work_dir}/"
+    os.makedirs(f"{root_output_directory}current_ir_plots", exist_ok=True)
+
+    def run():
+        ph.plot_data(readings, critical_points=critical_points,
+                known_slides=data.known_slides,
+                root_output_directory=root_output_directory)
+
+    return run, len(readings)
+
+
+def bench_plot_data_static(data, size):
+    readings, critical_points = get_plot_args(data, size)
+    root_output_directory = f"{data.work_dir}/"
+    os.makedirs(f"{root_output_directory}current_ir_plots", exist_ok=True)
+
+    def run():
+        ph.plot_data_static(readings, critical_points=critical_points,
+                known_slides=data.known_slides,
+                root_output_directory=root_output_directory)
+        plt.close('all')
+
+    return run, len(readings)
+
+
+BENCHMARKS = {
+    'get_readings_hx_format': bench_get_readings_hx_format,
+    'get_readings_arch_format': bench_get_readings_arch_format,
+    'process_xml_data': bench_process_xml_data,
+    'get_critical_points': bench_get_critical_points,
+    'get_first_critical_points': bench_get_first_critical_points,
+    'get_48hr_readings': bench_get_48hr_readings,
+    'get_relevant_slide': bench_get_relevant_slide,
+    'plot_data': bench_plot_data,
+    'plot_data_static': bench_plot_data_static,
+}
+PLOT_BENCHMARKS = {'plot_data', 'plot_data_static'}
+
+
+def measure(run, repeat):
+    """Return the fastest time for run(), in seconds, and its peak traced
+    memory use, in bytes. Output from run() is discarded.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return min(timings), peak_memory
+
+
+def run_benchmarks(names, sizes, plot_sizes, repeat, work_dir):
+    """Run each benchmark at each size.
+    Returns a list of results dicts.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = BenchmarkData(work_dir)
+
+    all_results = []
+    for name in names:
+        for size in (plot_sizes if name in PLOT_BENCHMARKS else sizes):
+            with contextlib.redirect_stdout(io.StringIO()):
+                run, n_items = BENCHMARKS[name](data, size)
+            seconds, peak_memory = measure(run, repeat)
+            results_dict = {
+                'name': name,
+                'size': size,
+                'items': n_items,
+                'seconds': seconds,
+                'items per second': n_items / seconds if seconds else None,
+                'peak memory bytes': peak_memory,
+            }
+            all_results.append(results_dict)
+            print(f"  {name:<28}{size:>8}{n_items:>8} items {seconds:>10.4f}s  {peak_memory/1e6:>8.2f} MB")
+
+    return all_results
+
+
+def compare_results(old_report, new_report):
+    """Print the change in throughput and peak memory for each benchmark in
+    both reports.
+    """
+    old_results = {(results_dict['name'], results_dict['size']): results_dict
+                    for results_dict in old_report['results']}
+    print(f"\nCompared to {old_report['commit']}:")
+    for results_dict in new_report['results']:
+        old = old_results.get((results_dict['name'], results_dict['size']))
+        if not old or not old['items per second']:
+            continue
+        speedup = results_dict['items per second'] / old['items per second']
+        memory_ratio = (results_dict['peak memory bytes']
+                            / max(old['peak memory bytes'], 1))
+        print(f"  {results_dict['name']:<28}{results_dict['size']:>8}  {speedup:>6.2f}x throughput  {memory_ratio:>6.2f}x memory")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    names = args.only or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark: {name}")
+
+    print("\nRunning benchmarks...")
+    with tempfile.TemporaryDirectory() as work_dir:
+        all_results = run_benchmarks(names, args.sizes, args.plot_sizes,
+                args.repeat, work_dir)
+
+    commit = get_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': all_results,
+    }
+
+    output = args.output or f"{BENCHMARKS_DIR}/{commit or 'results'}.json"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nWrote results to {output}.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), report)
@@ -0,0 +1,43 @@
+"""Build a binary archive of all cleaned gauge data.
+
+This parses every hx and arch format data file in ir_data_clean/ and
+  ir_data_other/, and writes all the readings to a single compact binary
+  archive. Once the archive exists, get_readings_from_data_file() loads
+  readings from it instead of parsing the text files, as long as the text
+  files haven't changed since the archive was built.
+
+Run this again whenever data files are added or updated:
+$ python build_archive.py
+"""
+
+import argparse
+
+import utils.analysis_utils as a_utils
+from utils import reading_archive
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('data_files', nargs='*',
+    help="Data files to archive. Defaults to all files in the data directories.")
+parser.add_argument('--output', default=reading_archive.ARCHIVE_FILE,
+    help=f"Archive file to write. Default: {reading_archive.ARCHIVE_FILE}")
+
+
+def build_archive(data_files, archive_file):
+    """Parse all data files, and write them to a single archive."""
+    segments = []
+    for data_file in data_files:
+        readings = a_utils.get_readings_from_data_file(data_file,
+                archive_file=None, use_cache=False)
+        segments.append((data_file, readings))
+
+    reading_archive.write_archive(archive_file, segments)
+
+    n_readings = sum(len(readings) for _, readings in segments)
+    print(f"\nWrote {n_readings} readings from {len(segments)} files to {archive_file}.")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    data_files = args.data_files or reading_archive.find_data_files()
+    build_archive(data_files, args.output)
@@ -4,13 +4,41 @@ different critical values. I'm not sure how to evaluate the
 
 For now, this is a tabular summary of the results of varying the critical
 values.
+
+Results are read from other_output/all_results.json by default. To read the
+append-only results store written by vary_parameters.py, which is streamed
+one trial at a time:
+$ python generate_roc_curve.py other_output/all_results.jsonl
+
+A continuous curve can also be generated directly from the data files, for
+every threshold along the path rise_critical = ratio_hours * m_critical. Each
+point on the curve is exactly what the full analysis gives at that point's
+critical values, with a lookback of ratio_hours rounded up. See
+utils/roc_scores.py for how this works.
+$ python generate_roc_curve.py --continuous --ratio-hours 5
 """
 
-import json
+import json, argparse
 
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 
+import vary_parameters as vp
+import utils.roc_scores as roc_scores
+import utils.analysis_utils as a_utils
+from utils.result_store import iter_results
+
+
+def load_results(filename):
+    """Yield the results of each trial in filename.
+    A .jsonl results store is streamed, instead of loaded all at once.
+    """
+    if filename.endswith('.jsonl'):
+        yield from iter_results(filename)
+    else:
+        with open(filename) as f:
+            yield from json.load(f)
+
 
 def generate_plot_tpvfp(all_results):
     """For now, generate a simple TP vs FP plot.
@@ -100,21 +128,68 @@ def generate_plot_tpvfn(all_results):
     plt.savefig(filename)
 
 
+def generate_plot_continuous(roc_curve, all_results, ratio_hours):
+    """Plot the continuous TP vs FP curve, with the discrete trials
+    for comparison.
+    """
+    # Start the curve at the highest threshold, where nothing is detected.
+    #   Lower thresholds can merge events, so the curve can step back.
+    x_values = [0] + [point['false positives'] for point in roc_curve]
+    y_values = [0] + [point['true positives'] for point in roc_curve]
+    lookback_hours = roc_scores.get_lookback_hours(ratio_hours)
+
+    fig, ax = plt.subplots(figsize=(6, 6), dpi=128)
+    ax.plot(x_values, y_values, marker='.', drawstyle='steps-post',
+            label=f"rise = {ratio_hours} hr x slope, {lookback_hours} hr lookback")
+    ax.scatter([trial['false positives'] for trial in all_results],
+            [trial['true positives'] for trial in all_results],
+            c='gray', label='trials')
+
+    ax.set_title('True Positives vs False Positives')
+    ax.set_xlabel('False Positives')
+    ax.set_ylabel('True Positives')
+    ax.legend(loc='lower right')
+
+    # Make integer tick marks.
+    ax.yaxis.set_major_locator(ticker.MultipleLocator(1))
+
+    # Save to file.
+    filename = "other_output/tp_vs_fp_continuous_plot.png"
+    plt.savefig(filename)
+
+
+# Define cli arguments.
+parser = argparse.ArgumentParser()
+parser.add_argument('results_file', nargs='?',
+    default='other_output/all_results.json',
+    help="Results of varying critical values; .json, or a .jsonl store.")
+parser.add_argument('--continuous', action='store_true',
+    help="Also generate a continuous curve from the data files. Every point is exact, with a lookback of --ratio-hours rounded up.")
+parser.add_argument('--ratio-hours', type=float,
+    default=a_utils.RISE_CRITICAL / a_utils.M_CRITICAL,
+    help="Threshold path for the continuous curve: rise / slope, in hours.")
+parser.add_argument('--data-files', nargs='+',
+    help="Data files for the continuous curve.")
+
+
 if __name__ == '__main__':
+    args = parser.parse_args()
 
     # Get cached results of varying critical values.
-    filename = 'other_output/all_results.json'
-    with open(filename) as f:
-        all_results = json.load(f)
+    filename = args.results_file
 
     label_str = "Trial\tR_C\tM_C\tTP\tFP\tFN\tNotification Times"
     print(label_str)
 
-    # Modify 'alpha name' for labeling purposes?
-    for trial in all_results:
+    # Only keep what the plots need from each trial, so a large store
+    #   doesn't need to fit in memory.
+    plot_fields = ('alpha name', 'true positives', 'false positives',
+            'false negatives')
+    all_results = []
+    for trial in load_results(filename):
+        # Modify 'alpha name' for labeling purposes?
         trial['alpha name'] = trial['alpha name'].lower()
 
-    for trial in all_results:
         # Generate a table of results. Print, and write to file.
         value_str = f"{trial['alpha name']}\t{trial['critical rise']}\t"
         value_str += f"{trial['critical slope']}\t{trial['true positives']}\t"
@@ -123,6 +198,20 @@ if __name__ == '__main__':
         value_str += f"{sorted(trial['notification times'])}"
 
         print(value_str)
+        all_results.append({field: trial[field] for field in plot_fields})
 
     generate_plot_tpvfp(all_results)
-    generate_plot_tpvfn(all_results)
\ No newline at end of file
+    generate_plot_tpvfn(all_results)
+
+    if args.continuous:
+        all_readings, known_slides = vp.load_data(
+                args.data_files or vp.DATA_FILES)
+        roc_curve = roc_scores.get_roc_curve(all_readings, known_slides,
+                args.ratio_hours, a_utils.RIVER_MIN_HEIGHT)
+
+        print(f"\nContinuous curve, rise = {args.ratio_hours} hr x slope, lookback = {roc_scores.get_lookback_hours(args.ratio_hours)} hr:")
+        print("M_C\tR_C\tTP\tFP\tFN")
+        for point in roc_curve:
+            print(f"{point['critical slope']:.4f}\t{point['critical rise']:.3f}\t{point['true positives']}\t{point['false positives']}\t{point['false negatives']}")
+
+        generate_plot_continuous(roc_curve, all_results, args.ratio_hours)
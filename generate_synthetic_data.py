@@ -0,0 +1,73 @@
+"""Generate synthetic gauge data and slides, for testing at scale.
+
+This writes a synthetic series in the hx or arch format, and a matching
+  known slides file. The files can be used anywhere real data files are
+  used. For example, to run the whole pipeline against 30 years of 1-min
+  data:
+$ python generate_synthetic_data.py --years 30 --interval 1
+$ python process_hx_data.py --no-interactive-plots --no-static-plots \\
+    --data-files synthetic_data/synthetic_1min_hx_format.txt \\
+    --slides-file synthetic_data/synthetic_slides.json
+
+The same seed always generates the same data.
+"""
+
+import argparse, datetime, os
+
+import pytz
+
+import utils.synthetic_data as synthetic_data
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--years', type=float, default=10,
+    help="Years of readings to generate.")
+parser.add_argument('--interval', type=int, default=15,
+    help="Minutes between readings. Real data is hourly or every 15 min.")
+parser.add_argument('--start-year', type=int, default=2000,
+    help="Year of the first reading.")
+parser.add_argument('--format', choices=['hx', 'arch'], default='hx',
+    help="Format of the data file.")
+parser.add_argument('--storms-per-year', type=float, default=20)
+parser.add_argument('--rise-range', type=float, nargs=2, default=[0.5, 4.5],
+    help="Smallest and largest storm rise, in ft.")
+parser.add_argument('--rise-rate-range', type=float, nargs=2,
+    default=[0.1, 1.0],
+    help="Slowest and fastest storm rise rate, in ft/hr.")
+parser.add_argument('--noise', type=float, default=0.01,
+    help="Standard deviation of noise added to each reading, in ft.")
+parser.add_argument('--gaps-per-year', type=float, default=0,
+    help="Gauge outages per year, each 1 to 48 hours long.")
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--output-dir', default='synthetic_data')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    config = synthetic_data.HydrographConfig(
+            interval_minutes=args.interval,
+            noise=args.noise,
+            storms_per_year=args.storms_per_year,
+            rise_range=tuple(args.rise_range),
+            rise_rate_range=tuple(args.rise_rate_range),
+            gaps_per_year=args.gaps_per_year)
+
+    dt_start = datetime.datetime(args.start_year, 1, 1, tzinfo=pytz.utc)
+    print(f"\nGenerating {args.years} years of {args.interval}-min readings...")
+    series, storms = synthetic_data.generate_series(dt_start,
+            args.years * 365.25, config, seed=args.seed)
+    slides = synthetic_data.generate_slides(storms, series, config,
+            seed=args.seed)
+    print(f"  Generated {len(series)} readings, {len(storms)} storms, and {len(slides)} slides.")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    data_file = f"{args.output_dir}/synthetic_{args.interval}min_{args.format}_format.txt"
+    if args.format == 'hx':
+        synthetic_data.write_hx_file(series, data_file)
+    else:
+        synthetic_data.write_arch_file(series, data_file)
+    slides_file = f"{args.output_dir}/synthetic_slides.json"
+    synthetic_data.write_slides_file(slides, slides_file)
+
+    print(f"\nWrote {data_file}")
+    print(f"Wrote {slides_file}")
@@ -1,5 +1,5 @@
 """Recreate the IR depth gauge graph."""
-import datetime, math, csv
+import datetime, math
 import sys
 
 import pytz
@@ -13,7 +13,9 @@ import matplotlib.ticker as ticker
 
 import utils.ir_reading as ir_reading
 import utils.analysis_utils as a_utils
-from slide_event import SlideEvent
+import utils.parse_utils as parse_utils
+from utils.reading_series import timestamp_to_dt
+from slide_event import SlideEvent, SlideCatalog
 
 
 aktz = pytz.timezone('US/Alaska')
@@ -106,33 +108,9 @@ def get_readings_hx_format(data_file):
 
     print(f"\nReading historical data from {data_file}.")
 
-    with open(data_file) as f:
-        # First line of data is on line 5.
-        reader = csv.reader(f)
-        for _ in range(4):
-            next(reader)
-        
-        # readings = []
-        # for row in reader:
-        #     datetime_str = row[0]
-        #     # dt = datetime.datetime.fromisoformat(datetime_str)
-        #     # dt = dt.replace(tzinfo=pytz.utc)
-        #     dt = datetime.datetime.fromisoformat(datetime_str).replace(
-        #                 tzinfo=pytz.utc)
-        #     height = float(row[2])
-        #     reading = ir_reading.IRReading(dt, height)
-        #     readings.append(reading)
-
-
-        readings = [
-            ir_reading.IRReading(
-                dt_reading=datetime.datetime.fromisoformat(
-                        row[0]).replace(tzinfo=pytz.utc),
-                height=float(row[2]))
-            for row in reader
-        ]
-
-
+    # Parse the whole file into arrays, then build IRReading objects for
+    #   callers that need a list.
+    readings = parse_utils.get_series_hx_format(data_file).to_readings()
 
     print(f"  First reading: {ir_reading.get_formatted_reading(readings[0])}")
 
@@ -151,35 +129,15 @@ def get_readings_arch_format(data_file):
 
     print(f"\nReading historical data from {data_file}.")
 
-    with open(data_file) as f:
-        reader = csv.reader(f, delimiter='\t')
-        # First line of data is on line 35.
+    # Parse the whole file into arrays, then build IRReading objects for
+    #   callers that need a list. Lines that can't be parsed are summarized,
+    #   instead of printed one at a time.
+    bad_lines = []
+    series = parse_utils.get_series_arch_format(data_file, bad_lines)
+    for line_number, line in bad_lines[:5]:
+        print(f"    Line {line_number}: {line}")
+    readings = series.to_readings()
 
-        # Scroll through header lines.
-        for row in reader:
-            if "5s  15s 20d 6s  14n 10s 14n 10s" in row[0]:
-                break
-
-        readings = []
-        for row in reader:
-            row = row[0].split('    ')
-            # print(f"Row: {row}")
-            try:
-                datetime_str = row[2]
-                dt_ak = datetime.datetime.fromisoformat(datetime_str)
-                # dt is either AKST or AKDT right now.
-                tz_str = row[3]
-                if tz_str == 'AKST':
-                    dt_utc = dt_ak + datetime.timedelta(hours=9)
-                elif tz_str == 'AKDT':
-                    dt_utc = dt_ak + datetime.timedelta(hours=8)
-                dt_utc = dt_utc.replace(tzinfo=pytz.utc)
-                height = float(row[4][:5])
-                reading = ir_reading.IRReading(dt_utc, height)
-                readings.append(reading)
-            except ValueError:
-                print("Error reading line:", row)
-                
     print(f"  First reading: {ir_reading.get_formatted_reading(readings[0])}")
 
     # Text file is in chronological order.
@@ -192,13 +150,18 @@ def get_relevant_slide(readings, known_slides):
     return that slide.
     Otherwise, return None.
     """
-    relevant_slide = None
-    for slide in known_slides:
-        if readings[0].dt_reading <= slide.dt_slide <= readings[-1].dt_reading:
-            print(f"Slide in range: {slide.name} - {slide.dt_slide}")
-            relevant_slide = slide
-            break
+    if isinstance(known_slides, SlideCatalog):
+        relevant_slide = known_slides.first_in_range(readings[0].dt_reading,
+                readings[-1].dt_reading)
+    else:
+        relevant_slide = None
+        for slide in known_slides:
+            if readings[0].dt_reading <= slide.dt_slide <= readings[-1].dt_reading:
+                relevant_slide = slide
+                break
 
+    if relevant_slide:
+        print(f"Slide in range: {relevant_slide.name} - {relevant_slide.dt_slide}")
     return relevant_slide
 
 
@@ -214,11 +177,26 @@ def get_notification_time(critical_points, relevant_slide):
 
 
 def plot_data(readings, critical_points=[], known_slides=[],
-        root_output_directory='', auto_open=False):
+        root_output_directory='', auto_open=False, include_plotlyjs=True):
     """Plot IR gauge data, with critical points in red. Known slide
     events are indicated by a vertical line at the time of the event.
+
+    By default each html file includes all of plotly.js. Pass
+      include_plotlyjs='directory' to load plotly.js from a shared
+      plotly.min.js file in the same directory instead.
     """
     # DEV: Move this to utils.plot_utils.py when possible.
+    fig = get_plot_figure(readings, critical_points, known_slides)
+    filename = f"{root_output_directory}current_ir_plots/ir_plot_{readings[-1].dt_reading.__str__()[:10]}.html"
+    offline.plot(fig, filename=filename, auto_open=auto_open,
+            include_plotlyjs=include_plotlyjs)
+    print("\nPlotted data.")
+
+
+def get_plot_figure(readings, critical_points=[], known_slides=[]):
+    """Build the plotly figure for plot_data(), as a dict of data and
+    layout.
+    """
     # DEV: This fn should receive any relevant slides, it shouldn't do any
     #   data processing.
     print("\nPlotting data")
@@ -343,16 +321,19 @@ def plot_data(readings, critical_points=[], known_slides=[],
             }
     }
 
-    fig = {'data': data, 'layout': my_layout}
-    filename = f"{root_output_directory}current_ir_plots/ir_plot_{readings[-1].dt_reading.__str__()[:10]}.html"
-    offline.plot(fig, filename=filename, auto_open=auto_open)
-    print("\nPlotted data.")
+    return {'data': data, 'layout': my_layout}
 
 
 def plot_data_static(readings, critical_points=[], known_slides=[],
-        filename=None, root_output_directory=''):
+        filename=None, root_output_directory='', config=None):
     """Plot IR gauge data, with critical points in red. Known slide
     events are indicated by a vertical line at the time of the event.
+
+    The shaded critical heights use the values in config, an
+    AnalysisConfig. If config is None, the default AnalysisConfig() is
+    used. They're taken over a trailing window, so they only approximate
+    what the detector flags; see a_utils.get_critical_forecast(). The
+    legend says so.
     """
     # DEV: This fn should receive any relevant slides, it shouldn't do any
     #       data processing.
@@ -373,88 +354,24 @@ def plot_data_static(readings, critical_points=[], known_slides=[],
 
 
 
-    # Build a set of future readings, once every 15 minutes for the next
-    #   6 hours.
-    # DEV: May want to only look ahead 4.5 hrs; looking farther ahead
-    #   than the critical 5-hour period seems less meaningful.
-    # DEV: Doing some imports here, because this will be moved to 
-    #   analysis_utils
-    # import datetime
-    # from .ir_reading import IRReading
-
-    interval = datetime.timedelta(minutes=15)
-    future_readings = []
-    new_reading_dt = readings[-1].dt_reading + interval
-    for _ in range(18):
-        new_reading = ir_reading.IRReading(new_reading_dt, 23.0)
-        future_readings.append(new_reading)
-        new_reading_dt += interval
-    future_datetimes = [r.dt_reading.astimezone(aktz) for r in future_readings]
-    future_heights = [r.height for r in future_readings]
-
     # What are the future critical points?
-    #   These are the heights that would result in 5-hour total rise and 
-    #     average rate matching critical values.
+    #   These are the heights that would result in a total rise and average
+    #   rate matching critical values, over the next 4.5 hours.
     #   These are the minimum values needed to become, or remain, critical.
-    # DEV: Replace all 0.5 and 2.5 with M_CRITICAL and CRITICAL_RISE
-    min_cf_readings = []
-    latest_reading = readings[-1]
-    for reading in future_readings:
-        dt_lookback = reading.dt_reading - datetime.timedelta(hours=5)
-        # Get minimum height from last 5 hours of readings, including future readings.
-        # print(reading.dt_reading - datetime.timedelta(hours=5))
-        relevant_readings = [r for r in readings
-            if r.dt_reading >= dt_lookback]
-        relevant_readings += min_cf_readings
-        critical_height = min([r.height for r in relevant_readings]) + 2.5
-
-        # Make sure critical_height also gives a 5-hour average rise at least
-        #   as great as M_CRITICAL. Units are ft/hr.
-        m_avg = (critical_height - relevant_readings[0].height) / 5
-        if m_avg < 0.5:
-            # The critical height satisfies total rise, but not sustained rate
-            #   of rise. Bump critical height so it satisfies total rise and
-            #   rate of rise.
-            critical_height = 5 * 0.5 + relevant_readings[0].height
-
-        new_reading = ir_reading.IRReading(reading.dt_reading, critical_height)
-        min_cf_readings.append(new_reading)
-
-    min_cf_datetimes = [r.dt_reading.astimezone(aktz) for r in min_cf_readings]
-    min_cf_heights = [r.height for r in min_cf_readings]
-
-    # What would the critical points have been over the last 6 hours?
-    #   This shows how close conditions were to being critical over the
-    #   previous 6 hours.
-    dt_first_min_prev_reading = latest_reading.dt_reading - datetime.timedelta(hours=12)
-
-    min_crit_prev_readings = []
-    prev_datetimes = [r.dt_reading for r in readings
-                        if r.dt_reading >= dt_first_min_prev_reading]
-
-    for dt in prev_datetimes:
-        dt_lookback = dt - datetime.timedelta(hours=5)
-        # Get minimum height from last 5 hours of readings.
-        relevant_readings = [r for r in readings
-            if (r.dt_reading >= dt_lookback) and (r.dt_reading < dt)]
-        critical_height = min([r.height for r in relevant_readings]) + 2.5
-
-        # Make sure critical_height also gives a 5-hour average rise at least
-        #   as great as M_CRITICAL. Units are ft/hr.
-        m_avg = (critical_height - relevant_readings[0].height) / 5
-        if m_avg < 0.5:
-            # The critical height satisfies total rise, but not sustained rate
-            #   of rise. Bump critical height so it satisfies total rise and
-            #   rate of rise.
-            critical_height = 5 * 0.5 + relevant_readings[0].height
-
-        # reading.height = critical_height
-        reading = ir_reading.IRReading(dt, critical_height)
-        min_crit_prev_readings.append(reading)
-
-    min_crit_prev_datetimes = [r.dt_reading.astimezone(aktz)
-                                for r in min_crit_prev_readings]
-    min_crit_prev_heights = [r.height for r in min_crit_prev_readings]
+    # And what would the critical points have been over the last 12 hours?
+    #   This shows how close conditions were to being critical.
+    if config is None:
+        config = a_utils.get_default_config()
+    forecast = a_utils.get_critical_forecast(readings, config)
+    overlay_hours = config.lookback_hours
+    if overlay_hours is None:
+        overlay_hours = config.rise_critical / config.m_critical
+    min_cf_datetimes = [timestamp_to_dt(ts).astimezone(aktz)
+                            for ts in forecast.future_timestamps.tolist()]
+    min_cf_heights = forecast.future_heights.tolist()
+    min_crit_prev_datetimes = [timestamp_to_dt(ts).astimezone(aktz)
+                                for ts in forecast.prev_timestamps.tolist()]
+    min_crit_prev_heights = forecast.prev_heights.tolist()
 
     y_min, y_max = min_height - 0.5, max_height + 0.5
 
@@ -522,7 +439,8 @@ def plot_data_static(readings, critical_points=[], known_slides=[],
 
     # Plot minimum future critical readings.
     #   Plot these points, and shade to max y value.
-    ax.plot(min_cf_datetimes, min_cf_heights, c='red', alpha=0.4)
+    ax.plot(min_cf_datetimes, min_cf_heights, c='red', alpha=0.4,
+            label=f"Approx. critical heights, {overlay_hours:g} hr trailing window")
     ax.fill_between(min_cf_datetimes, min_cf_heights, 27.5, color='red', alpha=0.2)
 
     # Plot previous critical readings, and shade to max y value.
@@ -585,6 +503,8 @@ def plot_data_static(readings, critical_points=[], known_slides=[],
     # Make major and minor x ticks small.
     ax.tick_params(axis='x', which='both', labelsize=8)
 
+    ax.legend(loc='upper left', fontsize=8)
+
     # DEV: Uncomment this to see interactive plots during dev work,
     #   rather than opening file images.
     # plt.show()
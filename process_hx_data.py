@@ -32,15 +32,23 @@ We want to be able to use the output to answer the following questions. In
       positive)
 """
 
-import argparse, sys, pickle, pdb
+import argparse, pickle
+from multiprocessing import Pool
 
 from os import listdir, path
 from pathlib import Path
 
+import matplotlib.pyplot as plt
+
 import plot_heights as ph
-from slide_event import SlideEvent
+import utils.plot_utils as plot_utils
+from slide_event import SlideCatalog
 import utils.analysis_utils as a_utils
-from utils.stats import stats
+from utils.stats import AnalysisStats
+from utils.event_record import EventRecord, EVENT_RECORDS_DIR
+from utils.event_record import pickle_event_record, load_event_records
+from utils.plot_manifest import PlotManifest, get_code_version
+from utils.plot_manifest import get_plot_filename, get_plot_key
 
 
 # Define cli arguments.
@@ -51,13 +59,127 @@ parser.add_argument('--no-interactive-plots',
 parser.add_argument('--no-static-plots',
     help="Do not generate static plots.",
     action='store_true')
+parser.add_argument('--data-files', nargs='+',
+    help="Data files to process, instead of the default files.")
+parser.add_argument('--slides-file', default='known_slides/known_slides.json',
+    help="Known slides file, such as one written by generate_synthetic_data.py.")
+parser.add_argument('--jobs', type=int, default=1,
+    help="Number of processes to render plots in.")
+parser.add_argument('--shared-plotlyjs', action='store_true',
+    help="Write plotly.js once, and load it from each interactive plot.")
+parser.add_argument('--dashboard', action='store_true',
+    help="Write a single dashboard page that loads each event on demand.")
+parser.add_argument('--force', action='store_true',
+    help="Render every plot, even plots that are already up to date.")
 parser.add_argument('--use-cached-data',
     help="Use pickled data; don't parse raw data files.",
     action='store_true')
 
 args = parser.parse_args()
 
-def process_hx_data(root_output_directory='', data_files=None):
+
+# Known slides and settings shared by every plot in a worker process.
+#   Set once per process by init_plot_worker(), and only read after that.
+_plot_data = {}
+
+
+def init_plot_worker(known_slides, root_output_directory, include_plotlyjs,
+        config=None):
+    """Store shared plot settings in a worker process."""
+    _plot_data['known_slides'] = known_slides
+    _plot_data['root_output_directory'] = root_output_directory
+    _plot_data['include_plotlyjs'] = include_plotlyjs
+    _plot_data['config'] = config
+
+
+def plot_event_record(plot_job):
+    """Render the plots for one event, in a worker process.
+    plot_job is (record, interactive, static).
+    """
+    record, interactive, static = plot_job
+    known_slides = _plot_data['known_slides']
+    root_output_directory = _plot_data['root_output_directory']
+
+    if interactive:
+        ph.plot_data(
+            record.readings,
+            known_slides=known_slides,
+            critical_points=record.critical_points,
+            root_output_directory=root_output_directory,
+            include_plotlyjs=_plot_data['include_plotlyjs'])
+
+    if static:
+        ph.plot_data_static(
+            record.readings,
+            known_slides=known_slides,
+            critical_points=record.critical_points,
+            root_output_directory=root_output_directory,
+            config=_plot_data['config'])
+        # Workers render many plots; don't keep every figure open.
+        plt.close('all')
+
+
+def get_last_records(records):
+    """Return the last record for each plot file name.
+
+    Plot files are named for the last day in each event. One at a time,
+      the last event with a given name overwrites earlier ones, so only
+      that event needs to be plotted.
+    """
+    last_records = {}
+    for record in records:
+        last_records[get_plot_filename(record.readings, 'png')] = record
+    return list(last_records.values())
+
+
+def get_plot_jobs(records, known_slides, config, root_output_directory,
+        interactive, static, force=False, include_plotlyjs=True):
+    """Return a (record, interactive, static) job for each event with a
+    plot that isn't up to date, the manifest with keys for every plot, and
+    the number of plots that are already up to date.
+
+    If force is True, every plot is rendered.
+    """
+    manifest = PlotManifest(f"{root_output_directory}current_ir_plots")
+    code_version = get_code_version()
+    plot_jobs, n_current = [], 0
+    plot_options = {'html': {'include_plotlyjs': include_plotlyjs}, 'png': {}}
+    for record in get_last_records(records):
+        needs_plot = {}
+        for suffix, wanted in (('html', interactive), ('png', static)):
+            needs_plot[suffix] = False
+            if not wanted:
+                continue
+            filename = get_plot_filename(record.readings, suffix)
+            key = get_plot_key(record, known_slides, config, suffix,
+                    code_version, plot_options[suffix])
+            if force or not manifest.is_current(filename, key):
+                needs_plot[suffix] = True
+                manifest.update(filename, key)
+            else:
+                n_current += 1
+        if any(needs_plot.values()):
+            plot_jobs.append((record, needs_plot['html'], needs_plot['png']))
+
+    return plot_jobs, manifest, n_current
+
+
+def plot_event_records_parallel(plot_jobs, known_slides,
+        root_output_directory, jobs, include_plotlyjs=True, config=None):
+    """Render plots for all events in a pool of jobs processes.
+    Output files are the same as rendering them one at a time.
+    """
+    with Pool(processes=jobs, initializer=init_plot_worker,
+            initargs=(known_slides, root_output_directory,
+                      include_plotlyjs, config)) as pool:
+        # Consume results, so any error in a worker is raised here.
+        for _ in pool.imap(plot_event_record, plot_jobs):
+            pass
+
+
+def process_hx_data(root_output_directory='', data_files=None, config=None,
+        slides_file='known_slides/known_slides.json', jobs=1, force=False,
+        shared_plotlyjs=False, dashboard=False):
     """Process all historical data in ir_data_clean/.
 
     - Get known slide events.
@@ -67,7 +189,15 @@ def process_hx_data(root_output_directory='', data_files=None):
     - Plot reading sets.
     - Summarize results.
 
-    Accept a data_files arg, so tests can send test data.
+    Accept data_files and slides_file args, so tests can send test data.
+    Accept a config arg, an AnalysisConfig with the critical values to use.
+      Stats are tracked separately for each call.
+    Accept a jobs arg, to render plots in that many processes.
+    Plots that are already up to date aren't rendered again, unless force
+      is True.
+    If shared_plotlyjs is True, interactive plots share one copy of
+      plotly.js. If dashboard is True, a dashboard page is written that
+      loads each event's plot on demand.
 
     Does not return anything, but generates:
     - pkl files of reading sets.
@@ -77,8 +207,7 @@ def process_hx_data(root_output_directory='', data_files=None):
     """
 
     # Get known slides.
-    slides_file = 'known_slides/known_slides.json'
-    known_slides = SlideEvent.load_slides(slides_file)
+    known_slides = SlideCatalog.load(slides_file)
 
     # DEV: Should probably walk the ir_data_clean directory, instead of making
     #      this list manually.
@@ -88,24 +217,40 @@ def process_hx_data(root_output_directory='', data_files=None):
             'ir_data_clean/irva_akdt_022016-033124_arch_format.txt'
         ]
 
-    reading_sets = []
+    if config is None:
+        config = a_utils.AnalysisConfig()
+    stats = AnalysisStats()
+
+    # Each event record carries its readings and critical points, so
+    #   detection only runs once per event.
+    records = []
+    plot_jobs = []
 
     if not args.use_cached_data:
         print("Parsing raw data files...")
         for data_file in data_files:
             readings = a_utils.get_readings_from_data_file(data_file)
-            reading_sets += a_utils.get_reading_sets(readings, known_slides, stats)
+            records += a_utils.get_event_records(readings, known_slides,
+                    stats, config)
 
     if not args.use_cached_data:
         print("Pickling reading sets...")
-        for reading_set in reading_sets:
+        records_dir = Path(f"{root_output_directory}{EVENT_RECORDS_DIR}")
+        records_dir.mkdir(parents=True, exist_ok=True)
+        for record in records:
             # Pickle reading sets for faster analysis and plotting later,
             #   and for use by other programs.
-            a_utils.pickle_reading_set(reading_set, root_output_directory)
+            a_utils.pickle_reading_set(record.readings, root_output_directory)
+            pickle_event_record(record, root_output_directory)
 
     if args.use_cached_data:
         print("Reading data from pickled files...")
-        pkl_file_path = 'other_output/'
+        records = load_event_records(root_output_directory)
+
+    if args.use_cached_data and not records:
+        # Reading dumps from before event records were saved don't have
+        #   critical points.
+        pkl_file_path = f"{root_output_directory}other_output/"
         pkl_files = [f for f in listdir(pkl_file_path)
                 if path.isfile(path.join(pkl_file_path, f))
                 and Path(f).suffix=='.pkl']
@@ -115,30 +260,71 @@ def process_hx_data(root_output_directory='', data_files=None):
             filename = f"{pkl_file_path}{pkl_file}"
             with open(filename, 'rb') as f:
                 reading_set = pickle.load(f)
-                reading_sets.append(reading_set)
+                critical_points = a_utils.get_critical_points(reading_set,
+                        config)
+                records.append(EventRecord(reading_set, critical_points,
+                        None, None))
+
+    plots_dir = f"{root_output_directory}current_ir_plots"
+    include_plotlyjs = True
+    if shared_plotlyjs:
+        include_plotlyjs = 'directory'
+        if not args.no_interactive_plots:
+            # Write the shared copy before any pages are rendered.
+            plot_utils.write_plotlyjs(plots_dir)
 
-    if not args.no_interactive_plots:
+    if not (args.no_interactive_plots and args.no_static_plots):
+        plot_jobs, manifest, n_current = get_plot_jobs(records, known_slides,
+                config, root_output_directory,
+                interactive=not args.no_interactive_plots,
+                static=not args.no_static_plots,
+                force=force, include_plotlyjs=include_plotlyjs)
+        print(f"{n_current} plots are already up to date.")
+
+    if plot_jobs and jobs > 1:
+        print(f"Generating plots in {jobs} processes...")
+        plot_event_records_parallel(plot_jobs, known_slides,
+                root_output_directory, jobs, include_plotlyjs, config)
+    elif plot_jobs:
         print("Generating interactive plots...")
-        for reading_set in reading_sets:
-            critical_points = a_utils.get_critical_points(reading_set)
+        for record, interactive, _ in plot_jobs:
+            if not interactive:
+                continue
             ph.plot_data(
-                reading_set,
+                record.readings,
                 known_slides=known_slides,
-                critical_points=critical_points,
-                root_output_directory=root_output_directory)
+                critical_points=record.critical_points,
+                root_output_directory=root_output_directory,
+                include_plotlyjs=include_plotlyjs)
 
-    if not args.no_static_plots:
         print("Generating static plots...")
-        for reading_set in reading_sets:
-            critical_points = a_utils.get_critical_points(reading_set)
+        for record, _, static in plot_jobs:
+            if not static:
+                continue
             ph.plot_data_static(
-                reading_set,
+                record.readings,
                 known_slides=known_slides,
-                critical_points=critical_points,
-                root_output_directory=root_output_directory)
+                critical_points=record.critical_points,
+                root_output_directory=root_output_directory,
+                config=config)
+
+    if plot_jobs:
+        # Only record new keys once their plots have been rendered.
+        manifest.save()
+
+    if dashboard:
+        print("Generating dashboard...")
+        figures = {}
+        for record in get_last_records(records):
+            name = Path(get_plot_filename(record.readings, 'json')).stem
+            figures[name] = ph.get_plot_figure(record.readings,
+                    record.critical_points, known_slides)
+        dashboard_path = plot_utils.write_dashboard(figures, plots_dir)
+        print(f"  saved: {dashboard_path}")
 
     if not args.use_cached_data:
-        a_utils.summarize_results(reading_sets, known_slides, stats)
+        reading_sets = [record.readings for record in records]
+        a_utils.summarize_results(reading_sets, known_slides, stats, config)
 
 
 if __name__ == '__main__':
@@ -146,4 +332,6 @@ if __name__ == '__main__':
     plots_dir = Path("current_ir_plots")
     if not plots_dir.exists():
         plots_dir.mkdir()
-    process_hx_data()
\ No newline at end of file
+    process_hx_data(data_files=args.data_files, slides_file=args.slides_file,
+            jobs=args.jobs, force=args.force,
+            shared_plotlyjs=args.shared_plotlyjs, dashboard=args.dashboard)
\ No newline at end of file
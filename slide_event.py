@@ -1,6 +1,6 @@
 """Model for landslide events."""
 
-import datetime, json
+import datetime, json, bisect
 
 import pytz
 
@@ -129,6 +129,74 @@ class SlideEvent:
         document.save(filename)
 
 
+class SlideCatalog:
+    """A collection of known slides, kept in order of dt_slide.
+
+    Supports interval queries by binary search, so associating reading
+      sets with slides doesn't require scanning every known slide.
+    """
+
+    def __init__(self, slides):
+        # sorted() is stable, so simultaneous slides keep their file order.
+        self.slides = sorted(slides, key=lambda slide: slide.dt_slide)
+        self.dt_slides = [slide.dt_slide for slide in self.slides]
+
+
+    @classmethod
+    def load(cls, data_file):
+        """Load a catalog from a json file of known slides."""
+        return cls(SlideEvent.load_slides(data_file))
+
+
+    def __len__(self):
+        return len(self.slides)
+
+
+    def __iter__(self):
+        return iter(self.slides)
+
+
+    def in_range(self, dt_start, dt_end):
+        """Return all slides with dt_start <= dt_slide <= dt_end."""
+        start = bisect.bisect_left(self.dt_slides, dt_start)
+        end = bisect.bisect_right(self.dt_slides, dt_end)
+        return self.slides[start:end]
+
+
+    def first_in_range(self, dt_start, dt_end):
+        """Return the earliest slide with dt_start <= dt_slide <= dt_end,
+        or None.
+        """
+        index = bisect.bisect_left(self.dt_slides, dt_start)
+        if index < len(self.slides) and self.dt_slides[index] <= dt_end:
+            return self.slides[index]
+        return None
+
+
+    def associate(self, windows):
+        """Find the first slide in each of a list of (dt_start, dt_end)
+        windows.
+
+        Windows are visited in order of dt_start, so the whole list is
+          matched against the catalog in a single merge pass.
+        Returns a list of slides or None, in the same order as windows.
+        """
+        order = sorted(range(len(windows)), key=lambda i: windows[i][0])
+        results = [None] * len(windows)
+
+        slide_index = 0
+        for window_index in order:
+            dt_start, dt_end = windows[window_index]
+            while (slide_index < len(self.dt_slides)
+                    and self.dt_slides[slide_index] < dt_start):
+                slide_index += 1
+            if (slide_index < len(self.dt_slides)
+                    and self.dt_slides[slide_index] <= dt_end):
+                results[window_index] = self.slides[slide_index]
+
+        return results
+
+
 if __name__ == '__main__':
 
     known_slides = []
@@ -0,0 +1,35 @@
+"""Shared fixtures for the test suite.
+
+Run the tests from project root directory:
+$ python -m pytest
+"""
+
+import pytest
+
+import utils.analysis_utils as a_utils
+import utils.reading_archive as reading_archive
+from slide_event import SlideCatalog
+
+
+HX_DATA_FILE = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+SLIDES_FILE = 'known_slides/known_slides.json'
+
+
+@pytest.fixture(scope="session", autouse=True)
+def parse_cache_dir(tmp_path_factory):
+    """Keep parse caches written during tests out of the project."""
+    cache_dir = tmp_path_factory.mktemp('parse_cache').as_posix()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(reading_archive, 'CACHE_DIR', cache_dir)
+        yield cache_dir
+
+
+@pytest.fixture(scope="session")
+def hx_data():
+    """Readings from the hx test data file, and the known slides.
+    Shared by every test, so don't modify them.
+    """
+    readings = a_utils.get_readings_from_data_file(HX_DATA_FILE,
+            use_cache=False)
+    known_slides = SlideCatalog.load(SLIDES_FILE)
+    return readings, known_slides
@@ -0,0 +1,73 @@
+"""Tests for AnalysisConfig and AnalysisStats in the analysis functions.
+
+Run this from project root directory:
+$ python -m pytest tests/test_analysis_utils.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import plot_heights as ph
+import utils.analysis_utils as a_utils
+from utils.stats import AnalysisStats
+
+
+CONFIGS = [a_utils.AnalysisConfig(2.5, 0.5), a_utils.AnalysisConfig(2.0, 0.4),
+           a_utils.AnalysisConfig(2.75, 0.625, 20.0)]
+
+
+def run_analysis(readings, known_slides, config):
+    stats = AnalysisStats()
+    reading_sets = a_utils.get_reading_sets(readings, known_slides, stats,
+            config)
+    return ([reading_set[0] for reading_set in reading_sets],
+            stats['notifications_issued'], stats['associated_notifications'],
+            stats['unassociated_notifications'],
+            dict(stats['notification_times']))
+
+
+def test_default_config():
+    assert(a_utils.AnalysisConfig() == a_utils.get_default_config())
+    assert(a_utils.AnalysisConfig().rise_critical == a_utils.RISE_CRITICAL)
+
+
+def test_stats_are_independent():
+    stats_a, stats_b = AnalysisStats(), AnalysisStats()
+    stats_a['relevant_slides'].append('slide')
+    stats_a['notifications_issued'] += 1
+    assert(stats_b['relevant_slides'] == [])
+    assert(stats_b['notifications_issued'] == 0)
+
+
+def test_config_matches_module_values(hx_data):
+    readings, _ = hx_data
+    config = a_utils.AnalysisConfig(2.0, 0.4)
+    assert(a_utils.get_first_critical_points(readings, config)
+            != a_utils.get_first_critical_points(readings))
+    assert(a_utils.get_first_critical_points(readings,
+                a_utils.AnalysisConfig())
+            == a_utils.get_first_critical_points(readings))
+
+    # AnalysisConfig holds the only defaults, so passing no config and
+    #   passing AnalysisConfig() can't disagree.
+    a_utils.RISE_CRITICAL, a_utils.M_CRITICAL = 2.0, 0.4
+    try:
+        assert(a_utils.get_default_config() == a_utils.AnalysisConfig())
+    finally:
+        a_utils.RISE_CRITICAL, a_utils.M_CRITICAL = 2.5, 0.5
+
+
+def test_concurrent_analyses(hx_data):
+    """Analyses with different configs can run in threads at the same time."""
+    readings, known_slides = hx_data
+    serial_results = [run_analysis(readings, known_slides, config)
+                        for config in CONFIGS * 2]
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        threaded_results = list(executor.map(
+                lambda config: run_analysis(readings, known_slides, config),
+                CONFIGS * 2))
+
+    assert(threaded_results == serial_results)
+    assert(serial_results[0] != serial_results[1])
@@ -0,0 +1,192 @@
+"""Tests for utils/critical_points.py.
+
+The vectorized detector must find exactly the same critical points as the
+  original loop-based approach, which is reproduced here as a reference.
+
+Run this from project root directory:
+$ python -m pytest tests/test_critical_points.py
+"""
+
+import datetime, math
+
+import numpy as np
+import pytest
+
+import plot_heights as ph
+import utils.ir_reading as ir_reading
+import utils.analysis_utils as a_utils
+import utils.critical_points as critical_points
+from utils.reading_series import ReadingSeries, dt_to_timestamp
+
+
+# (rise_critical, m_critical) pairs to check.
+CRITICAL_VALUES = [(2.5, 0.5), (2.25, 0.375), (2.75, 0.625), (2.0, 0.4)]
+
+
+@pytest.fixture(scope="module")
+def hx_readings():
+    data_file = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+    return ph.get_readings_hx_format(data_file)
+
+
+def get_critical_points_reference(readings, rise_critical, m_critical):
+    """Loop-based critical point detection, as originally implemented."""
+    readings_per_hr = a_utils.get_reading_rate(readings)
+    max_lookback = math.ceil(rise_critical / m_critical) * readings_per_hr
+
+    critical_points = []
+    for reading_index, reading in enumerate(readings[max_lookback:]):
+        if reading.height < a_utils.RIVER_MIN_HEIGHT + rise_critical:
+            continue
+        prev_readings = readings[reading_index-max_lookback:reading_index]
+        for prev_reading in prev_readings:
+            rise = ir_reading.get_rise(reading, prev_reading)
+            m = ir_reading.get_slope(reading, prev_reading)
+            if rise >= rise_critical and m > m_critical:
+                critical_points.append(reading)
+                break
+
+    return critical_points
+
+
+def get_first_critical_points_reference(readings, rise_critical, m_critical):
+    first_critical_points = []
+    for reading in get_critical_points_reference(readings, rise_critical,
+            m_critical):
+        if (not first_critical_points
+                or (reading.dt_reading - first_critical_points[-1].dt_reading
+                    ).total_seconds() // 3600 > 12):
+            first_critical_points.append(reading)
+    return first_critical_points
+
+
+@pytest.mark.parametrize("rise_critical, m_critical", CRITICAL_VALUES)
+def test_critical_points_match_reference(hx_readings, rise_critical,
+        m_critical):
+    reference = get_critical_points_reference(hx_readings, rise_critical,
+            m_critical)
+    indices = critical_points.find_critical_indices(hx_readings,
+            rise_critical, m_critical, a_utils.RIVER_MIN_HEIGHT, 1)
+    assert(reference)
+    assert([hx_readings[i] for i in indices] == reference)
+
+@pytest.mark.parametrize("rise_critical, m_critical", CRITICAL_VALUES)
+def test_first_critical_points_match_reference(hx_readings, rise_critical,
+        m_critical):
+    reference = get_first_critical_points_reference(hx_readings,
+            rise_critical, m_critical)
+    indices = critical_points.find_first_critical_indices(hx_readings,
+            rise_critical, m_critical, a_utils.RIVER_MIN_HEIGHT, 1)
+    assert([hx_readings[i] for i in indices] == reference)
+
+def test_get_critical_points_accepts_series(hx_readings):
+    # Lists and ReadingSeries should give the same critical points.
+    series = ReadingSeries.from_readings(hx_readings)
+    assert(a_utils.get_critical_points(series)
+            == a_utils.get_critical_points(hx_readings))
+    assert(a_utils.get_first_critical_points(series)
+            == a_utils.get_first_critical_points(hx_readings))
+
+@pytest.mark.parametrize("rise_critical, m_critical", CRITICAL_VALUES)
+def test_streaming_detector_matches_batch(hx_readings, rise_critical,
+        m_critical):
+    detector = critical_points.CriticalPointDetector(rise_critical,
+            m_critical, a_utils.RIVER_MIN_HEIGHT)
+    results = [detector.update(reading) for reading in hx_readings]
+
+    indices = critical_points.find_critical_indices(hx_readings,
+            rise_critical, m_critical, a_utils.RIVER_MIN_HEIGHT, 1)
+    first_indices = critical_points.find_first_critical_indices(hx_readings,
+            rise_critical, m_critical, a_utils.RIVER_MIN_HEIGHT, 1)
+
+    assert(detector.readings_per_hr == 1)
+    assert([i for i, result in enumerate(results) if result.is_critical]
+            == indices.tolist())
+    assert([i for i, result in enumerate(results) if result.is_first_critical]
+            == first_indices.tolist())
+
+@pytest.mark.parametrize("lookback_hours, dedup_hours", [(3, 6), (4.5, 24)])
+def test_streaming_detector_other_parameters(hx_readings, lookback_hours,
+        dedup_hours):
+    detector = critical_points.CriticalPointDetector(2.5, 0.5,
+            a_utils.RIVER_MIN_HEIGHT, lookback_hours=lookback_hours,
+            dedup_hours=dedup_hours)
+    results = [detector.update(reading) for reading in hx_readings]
+
+    indices = critical_points.find_critical_indices(hx_readings, 2.5, 0.5,
+            a_utils.RIVER_MIN_HEIGHT, 1, lookback_hours)
+    first_indices = critical_points.find_first_critical_indices(hx_readings,
+            2.5, 0.5, a_utils.RIVER_MIN_HEIGHT, 1, lookback_hours,
+            dedup_hours)
+
+    assert(len(indices))
+    assert([i for i, result in enumerate(results) if result.is_critical]
+            == indices.tolist())
+    assert([i for i, result in enumerate(results) if result.is_first_critical]
+            == first_indices.tolist())
+
+def get_critical_forecast_reference(readings, rise_critical, m_critical):
+    """Loop-based critical heights for static plots, as originally
+    implemented in plot_data_static().
+    """
+    lookback = datetime.timedelta(hours=rise_critical / m_critical)
+    lookback_hours = rise_critical / m_critical
+
+    def get_critical_height(relevant_readings):
+        critical_height = (min([r.height for r in relevant_readings])
+                            + rise_critical)
+        m_avg = (critical_height - relevant_readings[0].height) / lookback_hours
+        if m_avg < m_critical:
+            critical_height = (lookback_hours * m_critical
+                                + relevant_readings[0].height)
+        return critical_height
+
+    min_cf_readings = []
+    for step in range(1, 19):
+        dt = readings[-1].dt_reading + datetime.timedelta(minutes=15*step)
+        relevant_readings = [r for r in readings
+            if r.dt_reading >= dt - lookback]
+        relevant_readings += min_cf_readings
+        min_cf_readings.append(ir_reading.IRReading(dt,
+                get_critical_height(relevant_readings)))
+
+    min_crit_prev_readings = []
+    dt_first = readings[-1].dt_reading - datetime.timedelta(hours=12)
+    for dt in [r.dt_reading for r in readings if r.dt_reading >= dt_first]:
+        relevant_readings = [r for r in readings
+            if (r.dt_reading >= dt - lookback) and (r.dt_reading < dt)]
+        min_crit_prev_readings.append(ir_reading.IRReading(dt,
+                get_critical_height(relevant_readings)))
+
+    return min_cf_readings, min_crit_prev_readings
+
+def test_get_window_minimums():
+    values = [3.0, 1.0, 4.0, 1.5, 5.0]
+    minimums = critical_points.get_window_minimums(values,
+            [0, 2, 2, 3, 0], [2, 5, 2, 4, 5])
+    assert(minimums[[0, 1, 3, 4]].tolist() == [1.0, 1.5, 1.5, 1.0])
+    assert(np.isnan(minimums[2]))
+
+@pytest.mark.parametrize("rise_critical, m_critical", CRITICAL_VALUES)
+def test_critical_forecast_matches_reference(hx_readings, rise_critical,
+        m_critical):
+    config = a_utils.AnalysisConfig(rise_critical, m_critical)
+    first_critical_points = a_utils.get_first_critical_points(hx_readings)
+    assert(first_critical_points)
+    for reading in first_critical_points:
+        reading_set = a_utils.get_48hr_readings(reading, hx_readings)
+        min_cf_readings, min_crit_prev_readings = (
+                get_critical_forecast_reference(reading_set, rise_critical,
+                    m_critical))
+        forecast = a_utils.get_critical_forecast(reading_set, config)
+
+        # Heights must match exactly, so plots don't change.
+        assert(forecast.future_timestamps.tolist()
+                == [dt_to_timestamp(r.dt_reading) for r in min_cf_readings])
+        assert(forecast.future_heights.tolist()
+                == [r.height for r in min_cf_readings])
+        assert(forecast.prev_timestamps.tolist()
+                == [dt_to_timestamp(r.dt_reading)
+                        for r in min_crit_prev_readings])
+        assert(forecast.prev_heights.tolist()
+                == [r.height for r in min_crit_prev_readings])
@@ -0,0 +1,58 @@
+"""Tests for utils/event_record.py, and event records from the analysis.
+
+Run this from project root directory:
+$ python -m pytest tests/test_event_record.py
+"""
+
+import pytest
+
+import utils.analysis_utils as a_utils
+from utils import event_record
+from utils.stats import AnalysisStats
+
+
+@pytest.fixture(scope="module")
+def records_and_stats(hx_data):
+    readings, known_slides = hx_data
+    stats = AnalysisStats()
+    records = a_utils.get_event_records(readings, known_slides, stats)
+    return records, stats
+
+
+def test_records_match_analysis(records_and_stats):
+    records, stats = records_and_stats
+    assert(records)
+    for record in records:
+        assert(record.critical_points
+                == a_utils.get_critical_points(record.readings))
+
+    slide_records = [record for record in records
+                        if record.notification_time is not None]
+    assert(len(slide_records) == stats['associated_notifications'])
+    for record in slide_records:
+        assert(record.notification_time
+                == stats['notification_times'][record.slide])
+
+
+def test_pickle_round_trip(records_and_stats, tmp_path):
+    records, _ = records_and_stats
+    root_output_directory = f"{tmp_path}/"
+    (tmp_path / event_record.EVENT_RECORDS_DIR).mkdir(parents=True)
+    for record in records:
+        event_record.pickle_event_record(record, root_output_directory)
+
+    loaded = event_record.load_event_records(root_output_directory)
+    by_filename = {event_record.get_record_filename(record): record
+                    for record in records}
+    assert(len(loaded) == len(by_filename))
+    for record in loaded:
+        original = by_filename[event_record.get_record_filename(record)]
+        assert(record.readings == list(original.readings))
+        assert(record.critical_points == original.critical_points)
+        assert(record.notification_time == original.notification_time)
+        assert(getattr(record.slide, 'name', None)
+                == getattr(original.slide, 'name', None))
+
+
+def test_no_records(tmp_path):
+    assert(event_record.load_event_records(f"{tmp_path}/") == [])
@@ -0,0 +1,64 @@
+"""Tests for process_hx_data.py that only need the hx test data: rendering
+plots in several processes, and replotting from cached data.
+
+Run this from project root directory:
+$ python -m pytest tests/test_parallel_plots.py
+"""
+
+import filecmp, sys
+from os import listdir
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+# process_hx_data.py parses cli arguments when it's imported.
+with mock.patch.object(sys, 'argv', ['process_hx_data.py']):
+    import process_hx_data as phd
+
+
+def render_static_plots(root_output_directory, jobs):
+    """Render static plots of the hx test data, and return the plots dir."""
+    for dir_name in ('current_ir_plots', 'other_output'):
+        (root_output_directory / dir_name).mkdir(parents=True)
+    phd.process_hx_data(root_output_directory=f"{root_output_directory}/",
+            data_files=['tests/test_data/irva_utc_072014-022016_hx_format.txt'],
+            jobs=jobs)
+    return root_output_directory / 'current_ir_plots'
+
+
+def test_jobs_render_same_pngs(tmp_path, monkeypatch):
+    monkeypatch.setattr(phd.args, 'no_interactive_plots', True)
+    serial_dir = render_static_plots(tmp_path / 'serial', jobs=1)
+    parallel_dir = render_static_plots(tmp_path / 'parallel', jobs=2)
+
+    png_files = sorted(f for f in listdir(serial_dir) if f.endswith('.png'))
+    assert(png_files)
+    assert(png_files == sorted(f for f in listdir(parallel_dir)
+                                    if f.endswith('.png')))
+    _, mismatch, errors = filecmp.cmpfiles(serial_dir, parallel_dir,
+            png_files, shallow=False)
+    assert(not mismatch and not errors)
+
+
+def test_cached_data_from_output_directory(tmp_path, monkeypatch):
+    """Cached records are read from root_output_directory, not from the
+    current directory.
+    """
+    monkeypatch.setattr(phd.args, 'no_interactive_plots', True)
+    plots_dir = render_static_plots(tmp_path / 'output', jobs=1)
+    png_files = sorted(f for f in listdir(plots_dir) if f.endswith('.png'))
+    saved_dir = tmp_path / 'saved_plots'
+    plots_dir.rename(saved_dir)
+    plots_dir.mkdir()
+
+    slides_file = Path('known_slides/known_slides.json').resolve()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(phd.args, 'use_cached_data', True)
+    phd.process_hx_data(root_output_directory=f"{tmp_path / 'output'}/",
+            slides_file=slides_file, force=True)
+
+    assert(png_files)
+    _, mismatch, errors = filecmp.cmpfiles(saved_dir, plots_dir, png_files,
+            shallow=False)
+    assert(not mismatch and not errors)
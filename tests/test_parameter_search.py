@@ -0,0 +1,73 @@
+"""Tests for utils/parameter_search.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_parameter_search.py
+"""
+
+import utils.parameter_search as parameter_search
+
+
+def make_results_dict(rise_critical, m_critical, tp, fp, fn):
+    return {'critical rise': rise_critical, 'critical slope': m_critical,
+            'true positives': tp, 'false positives': fp,
+            'false negatives': fn}
+
+
+def step_outcomes(parameter_pairs, evaluated_pairs=None):
+    """Fake evaluation with a sharp transition at m_critical = 0.53.
+    Higher slopes miss a slide, lower slopes issue a false positive.
+    """
+    all_results = []
+    for rise_critical, m_critical in parameter_pairs:
+        if evaluated_pairs is not None:
+            evaluated_pairs.append((rise_critical, m_critical))
+        if m_critical < 0.53:
+            outcome = (2, 1, 0)
+        else:
+            outcome = (1, 0, 1)
+        all_results.append(make_results_dict(rise_critical, m_critical,
+                *outcome))
+    return all_results
+
+
+def test_pareto_front():
+    all_results = [make_results_dict(2.5, 0.5, 2, 1, 0),
+                   make_results_dict(2.5, 0.6, 1, 0, 1),
+                   make_results_dict(2.5, 0.7, 1, 1, 1),
+                   make_results_dict(2.6, 0.5, 2, 1, 0)]
+    front = parameter_search.get_pareto_front(all_results)
+    assert(front == [all_results[0], all_results[1], all_results[3]])
+
+
+def test_cache_evaluates_each_pair_once():
+    evaluated_pairs = []
+    cache = parameter_search.EvaluationCache(
+            lambda pairs: step_outcomes(pairs, evaluated_pairs))
+    cache.evaluate_pairs([(2.5, 0.5), (2.5, 0.5), (2.5, 0.6)])
+    cache.evaluate_pairs([(2.5, 0.6), (2.5000000001, 0.5)])
+    assert(evaluated_pairs == [(2.5, 0.5), (2.5, 0.6)])
+    assert((2.5, 0.5) in cache)
+
+
+def test_adaptive_search_refines_transition():
+    evaluated_pairs = []
+    all_results, front = parameter_search.adaptive_search(
+            lambda pairs: step_outcomes(pairs, evaluated_pairs),
+            (2.25, 2.75), (0.375, 0.625), budget=100)
+
+    # No pair is evaluated twice, and the budget is respected.
+    assert(len(evaluated_pairs) == len(set(evaluated_pairs)))
+    assert(len(all_results) <= 100)
+    assert(len(all_results) > 25)
+
+    # Refinement closes in on the transition, which a 5x5 grid only
+    #   brackets between 0.5 and 0.5625.
+    m_values = sorted({results_dict['critical slope']
+                        for results_dict in all_results})
+    below = max(m for m in m_values if m < 0.53)
+    above = min(m for m in m_values if m >= 0.53)
+    assert(above - below < 0.0625 / 4)
+
+    # Both outcomes are on the front.
+    assert({parameter_search.get_outcome(results_dict)
+                for results_dict in front} == {(2, 1, 0), (1, 0, 1)})
@@ -0,0 +1,103 @@
+"""Tests for utils/parse_utils.py.
+
+The bulk parsers must give exactly the same readings as parsing each line
+  individually.
+
+Run this from project root directory:
+$ python -m pytest tests/test_parse_utils.py
+"""
+
+import csv, datetime, math
+
+import pytz
+
+import utils.ir_reading as ir_reading
+import utils.parse_utils as parse_utils
+
+
+HX_DATA_FILE = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+
+
+def get_readings_hx_format_reference(data_file):
+    """Line-by-line hx parsing, as originally implemented."""
+    with open(data_file) as f:
+        reader = csv.reader(f)
+        for _ in range(4):
+            next(reader)
+        return [ir_reading.IRReading(
+                    datetime.datetime.fromisoformat(row[0]).replace(
+                            tzinfo=pytz.utc),
+                    float(row[2]))
+                for row in reader]
+
+
+def test_hx_series_matches_reference():
+    reference = get_readings_hx_format_reference(HX_DATA_FILE)
+    series = parse_utils.get_series_hx_format(HX_DATA_FILE)
+    assert(len(series) == len(reference))
+    assert(series.to_readings() == reference)
+
+def test_hx_skips_sentinel_rows(tmp_path):
+    lines = open(HX_DATA_FILE).read().splitlines()
+    # Repeat the sentinel row in the middle of the data.
+    lines.insert(10, lines[3])
+    data_file = tmp_path / 'irva_hx_format.txt'
+    data_file.write_text('\n'.join(lines) + '\n')
+
+    series = parse_utils.get_series_hx_format(data_file)
+    reference = get_readings_hx_format_reference(HX_DATA_FILE)
+    assert(series.to_readings() == reference)
+
+
+ARCH_HEADER = """# Data-value qualification codes included in this output:
+#     A  Approved for publication -- Processing and review completed.
+#
+agency_cd   site_no datetime    tz_cd   1343_00065  1343_00065_cd   1344_00060  1344_00060_cd
+5s  15s 20d 6s  14n 10s 14n 10s
+"""
+
+ARCH_LINES = [
+    "USGS    15087700    2020-11-01 00:45    AKDT    21.19   A   108 A",
+    "USGS    15087700    2020-11-01 01:00    AKDT    21.20   A   110 A",
+    "USGS    15087700    2020-11-01 01:00    AKST    21.22   A   112 A",
+    "USGS    15087700    2020-11-01 01:15    AKST    21.25   P   117 P",
+]
+
+
+def write_arch_file(tmp_path, lines):
+    data_file = tmp_path / 'irva_arch_format.txt'
+    data_file.write_text(ARCH_HEADER + '\n'.join(lines) + '\n')
+    return data_file
+
+
+def test_arch_series_converts_to_utc(tmp_path):
+    data_file = write_arch_file(tmp_path, ARCH_LINES)
+    series = parse_utils.get_series_arch_format(data_file)
+
+    dt_readings = [r.dt_reading for r in series]
+    assert(dt_readings == [
+        datetime.datetime(2020, 11, 1, 8, 45, tzinfo=pytz.utc),
+        datetime.datetime(2020, 11, 1, 9, 0, tzinfo=pytz.utc),
+        datetime.datetime(2020, 11, 1, 10, 0, tzinfo=pytz.utc),
+        datetime.datetime(2020, 11, 1, 10, 15, tzinfo=pytz.utc),
+    ])
+    assert(series.heights.tolist() == [21.19, 21.2, 21.22, 21.25])
+    assert(series.discharges.tolist() == [108, 110, 112, 117])
+
+def test_arch_series_collects_bad_lines(tmp_path):
+    lines = ARCH_LINES[:2] + [
+        "USGS    15087700    2020-11-01 01:00    AKDT    Eqp A   110 A",
+        "not a data line",
+        "USGS    15087700    2020-11-01 01:00    AKDT    21.20   A",
+    ] + ARCH_LINES[2:]
+    data_file = write_arch_file(tmp_path, lines)
+
+    bad_lines = []
+    series = parse_utils.get_series_arch_format(data_file, bad_lines)
+
+    # Line numbers count the 5 header lines.
+    assert(bad_lines == [(8, lines[2]), (9, lines[3])])
+    assert(len(series) == 5)
+    # A reading with no discharge is kept, with NaN discharge.
+    assert(series.heights[2] == 21.2)
+    assert(math.isnan(series.discharges[2]))
@@ -0,0 +1,63 @@
+"""Tests for utils/plot_manifest.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_plot_manifest.py
+"""
+
+import pytest
+
+import utils.analysis_utils as a_utils
+from utils import plot_manifest
+from utils.plot_manifest import PlotManifest
+from slide_event import SlideCatalog
+from utils.stats import AnalysisStats
+
+
+@pytest.fixture(scope="module")
+def plot_data(hx_data):
+    readings, known_slides = hx_data
+    records = a_utils.get_event_records(readings, known_slides,
+            AnalysisStats())
+    return records, known_slides
+
+
+def get_key(record, known_slides, config=None, suffix='png'):
+    if config is None:
+        config = a_utils.AnalysisConfig()
+    return plot_manifest.get_plot_key(record, known_slides, config, suffix,
+            plot_manifest.get_code_version())
+
+
+def test_key_changes_with_inputs(plot_data):
+    records, known_slides = plot_data
+    record = records[0]
+    key = get_key(record, known_slides)
+
+    # The same inputs, as a list instead of a ReadingSeries.
+    assert(get_key(record._replace(readings=list(record.readings)),
+            known_slides) == key)
+
+    assert(get_key(record, known_slides, suffix='html') != key)
+    assert(get_key(record._replace(critical_points=record.critical_points[1:]),
+            known_slides) != key)
+    assert(get_key(record, known_slides, a_utils.AnalysisConfig(2.0, 0.4))
+            != key)
+
+    # The slide shown on the plot is part of the key.
+    slide_records = [record for record in records if record.slide]
+    assert(slide_records)
+    assert(get_key(slide_records[0], known_slides)
+            != get_key(slide_records[0], SlideCatalog([])))
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = PlotManifest(tmp_path)
+    manifest.update('ir_plot_2014-09-07.png', 'abc')
+    manifest.save()
+
+    # A plot is only current if its file still exists.
+    manifest = PlotManifest(tmp_path)
+    assert(not manifest.is_current('ir_plot_2014-09-07.png', 'abc'))
+    (tmp_path / 'ir_plot_2014-09-07.png').write_bytes(b'png')
+    assert(manifest.is_current('ir_plot_2014-09-07.png', 'abc'))
+    assert(not manifest.is_current('ir_plot_2014-09-07.png', 'abd'))
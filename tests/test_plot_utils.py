@@ -0,0 +1,46 @@
+"""Tests for the shared plotly.js and dashboard output in
+utils/plot_utils.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_plot_utils.py
+"""
+
+import json
+
+import plot_heights as ph
+import utils.analysis_utils as a_utils
+import utils.plot_utils as plot_utils
+
+
+def test_write_plotlyjs_once(tmp_path):
+    plot_utils.write_plotlyjs(tmp_path)
+    plotlyjs_path = tmp_path / plot_utils.PLOTLYJS_FILENAME
+    mtime = plotlyjs_path.stat().st_mtime_ns
+
+    plot_utils.write_plotlyjs(tmp_path)
+    assert(plotlyjs_path.stat().st_mtime_ns == mtime)
+
+
+def test_dashboard(tmp_path, hx_data):
+    readings, known_slides = hx_data
+    first_critical_points = a_utils.get_first_critical_points(readings)
+
+    figures = {}
+    for fcp in first_critical_points[:3]:
+        reading_set = a_utils.get_48hr_readings(fcp, readings)
+        critical_points = a_utils.get_critical_points(reading_set)
+        name = f"ir_plot_{reading_set[-1].dt_reading.__str__()[:10]}"
+        figures[name] = ph.get_plot_figure(reading_set, critical_points,
+                known_slides)
+
+    dashboard_path = plot_utils.write_dashboard(figures, tmp_path)
+    dashboard_html = dashboard_path.read_text()
+    assert('src="plotly.min.js"' in dashboard_html)
+    assert((tmp_path / plot_utils.PLOTLYJS_FILENAME).exists())
+
+    # Each event is in its own json file, listed in the dashboard.
+    for name, fig in figures.items():
+        event_file = f"{plot_utils.EVENTS_DIR}/{name}.json"
+        assert(f'"{event_file}"' in dashboard_html)
+        with open(tmp_path / event_file) as f:
+            assert(json.load(f) == fig)
@@ -0,0 +1,148 @@
+"""Tests for utils/reading_archive.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_reading_archive.py
+"""
+
+import os, shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import utils.analysis_utils as a_utils
+import utils.parse_utils as parse_utils
+import utils.reading_archive as reading_archive
+
+
+HX_DATA_FILE = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = tmp_path / 'irva_utc_072014-022016_hx_format.txt'
+    shutil.copy(HX_DATA_FILE, data_file)
+    return data_file.as_posix()
+
+
+def test_round_trip(tmp_path, data_file):
+    archive_file = (tmp_path / 'archive.bin').as_posix()
+    series = parse_utils.get_series_hx_format(data_file)
+    reading_archive.write_archive(archive_file,
+            [(data_file, series), ('other_file', series[:100])])
+
+    header, data_offset = reading_archive.read_archive_header(archive_file)
+    assert(data_offset % reading_archive.RECORD_DTYPE.itemsize == 0)
+    assert(header['segments'][0]['reading_interval'] == 3600)
+
+    archived = reading_archive.load_archive(archive_file)
+    assert(list(archived) == [data_file, 'other_file'])
+    assert(np.array_equal(archived[data_file].timestamps, series.timestamps))
+    assert(np.array_equal(archived[data_file].heights, series.heights))
+    assert(archived['other_file'].to_readings() == series[:100].to_readings())
+
+def test_stale_source_is_ignored(tmp_path, data_file):
+    archive_file = (tmp_path / 'archive.bin').as_posix()
+    series = parse_utils.get_series_hx_format(data_file)
+    reading_archive.write_archive(archive_file, [(data_file, series)])
+
+    archived = reading_archive.get_series_from_archive(data_file, archive_file)
+    assert(len(archived) == len(series))
+
+    # Changing the data file invalidates its segment.
+    with open(data_file, 'a') as f:
+        f.write("2016-02-09 01:00:00,RZ,20.85\n")
+    assert(reading_archive.get_series_from_archive(data_file,
+            archive_file) is None)
+
+def test_missing_archive(tmp_path, data_file):
+    archive_file = (tmp_path / 'no_archive.bin').as_posix()
+    assert(reading_archive.get_series_from_archive(data_file,
+            archive_file) is None)
+
+
+def test_reading_store_appends_only_new_readings(tmp_path):
+    store_file = (tmp_path / 'store.bin').as_posix()
+    series = parse_utils.get_series_hx_format(HX_DATA_FILE)
+
+    store = reading_archive.ReadingStore(store_file)
+    assert(store.watermark is None)
+    assert(store.append(series[:100]) == 100)
+
+    # Overlapping batches only add readings past the watermark.
+    assert(store.append(series[50:150]) == 50)
+    assert(store.append(series[50:150]) == 0)
+    assert(store.watermark == series.timestamps[149])
+
+    # Reopening the store picks up where it left off.
+    store = reading_archive.ReadingStore(store_file)
+    assert(len(store) == 150)
+    assert(store.load().to_readings() == series[:150].to_readings())
+
+def test_reading_store_accepts_unordered_readings(tmp_path):
+    store_file = (tmp_path / 'store.bin').as_posix()
+    readings = parse_utils.get_series_hx_format(HX_DATA_FILE)[:20].to_readings()
+
+    store = reading_archive.ReadingStore(store_file)
+    # Gauge xml lists readings newest first, sometimes with duplicates.
+    assert(store.append(list(reversed(readings)) + readings[:5]) == 20)
+    assert(store.load().to_readings() == readings)
+
+def test_reading_store_drops_partial_record(tmp_path):
+    store_file = (tmp_path / 'store.bin').as_posix()
+    series = parse_utils.get_series_hx_format(HX_DATA_FILE)
+
+    store = reading_archive.ReadingStore(store_file)
+    store.append(series[:10])
+    # Simulate an append that was interrupted partway through a record.
+    with open(store_file, 'ab') as f:
+        f.write(b'\0' * 5)
+    assert(len(store) == 10)
+
+    store.append(series[:20])
+    assert(store.load().to_readings() == series[:20].to_readings())
+
+
+def test_parse_cache(data_file, tmp_path):
+    cache_dir = (tmp_path / 'cache').as_posix()
+    series = parse_utils.get_series_hx_format(data_file)
+    assert(reading_archive.get_cached_series(data_file, cache_dir) is None)
+
+    reading_archive.cache_series(data_file, series, cache_dir)
+    assert(os.path.dirname(reading_archive.get_cache_file(data_file,
+            cache_dir)) == cache_dir)
+    cached = reading_archive.get_cached_series(data_file, cache_dir)
+    assert(cached.to_readings() == series.to_readings())
+
+    # Touching the file without changing it keeps the cache valid.
+    os.utime(data_file, ns=(0, 0))
+    assert(reading_archive.get_cached_series(data_file, cache_dir) is not None)
+
+    # Changing the contents invalidates the cache.
+    with open(data_file, 'r+') as f:
+        contents = f.read()
+        f.seek(0)
+        f.write(contents.replace('21.21', '21.22', 1))
+    assert(reading_archive.get_cached_series(data_file, cache_dir) is None)
+
+
+def test_parser_version_invalidates_cache(data_file, tmp_path, monkeypatch):
+    cache_dir = (tmp_path / 'cache').as_posix()
+    series = parse_utils.get_series_hx_format(data_file)
+    reading_archive.cache_series(data_file, series, cache_dir)
+
+    monkeypatch.setattr(parse_utils, 'PARSER_VERSION',
+            parse_utils.PARSER_VERSION + 1)
+    assert(reading_archive.get_cached_series(data_file, cache_dir) is None)
+
+
+def test_fetch_survives_bad_response(tmp_path, monkeypatch):
+    # A partial response can't be parsed, but the raw text is still returned.
+    response = SimpleNamespace(status_code=200, text='<site><sigstages/>')
+    monkeypatch.setattr(a_utils.requests, 'get', lambda url: response)
+    store_file = (tmp_path / 'store.bin').as_posix()
+    current_data = a_utils.fetch_current_data(
+            filename=(tmp_path / 'current_data.txt').as_posix(),
+            store_file=store_file)
+    assert(current_data == response.text)
+    assert(len(reading_archive.ReadingStore(store_file)) == 0)
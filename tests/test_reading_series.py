@@ -0,0 +1,73 @@
+"""Tests for utils/reading_series.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_reading_series.py
+"""
+
+import pickle, datetime
+
+import pytest
+
+import plot_heights as ph
+from utils.reading_series import ReadingSeries, TimeIndex, get_reading_rate
+
+
+@pytest.fixture(scope="module")
+def hx_readings():
+    data_file = 'tests/test_data/irva_utc_072014-022016_hx_format.txt'
+    return ph.get_readings_hx_format(data_file)
+
+
+def test_round_trip(hx_readings):
+    # Converting to a series and back should give identical readings.
+    series = ReadingSeries.from_readings(hx_readings)
+    assert(len(series) == len(hx_readings))
+    assert(series.to_readings() == hx_readings)
+
+def test_round_trip_pickles_identically(hx_readings):
+    # Dumps made from a series must match dumps made from parsed readings.
+    series = ReadingSeries.from_readings(hx_readings)
+    readings = hx_readings[1000:1200]
+    assert(pickle.dumps(list(series[1000:1200])) == pickle.dumps(readings))
+
+def test_indexing_and_slicing(hx_readings):
+    series = ReadingSeries.from_readings(hx_readings)
+    assert(series[0] == hx_readings[0])
+    assert(series[-1] == hx_readings[-1])
+    assert(isinstance(series[10:20], ReadingSeries))
+    assert(list(series[10:20]) == hx_readings[10:20])
+    assert(series.index(hx_readings[500]) == 500)
+
+def test_between(hx_readings):
+    series = ReadingSeries.from_readings(hx_readings)
+    dt_start = hx_readings[100].dt_reading
+    dt_end = hx_readings[150].dt_reading
+    assert(list(series.between(dt_start, dt_end)) == hx_readings[100:151])
+
+def test_reading_rate(hx_readings):
+    # Lists and series give the same rate.
+    series = ReadingSeries.from_readings(hx_readings)
+    assert(get_reading_rate(hx_readings) == 1)
+    assert(get_reading_rate(series) == 1)
+
+def test_memory(hx_readings):
+    series = ReadingSeries.from_readings(hx_readings)
+    assert(series.nbytes == 16 * len(hx_readings))
+
+@pytest.mark.parametrize("as_series", [False, True])
+def test_time_index(hx_readings, as_series):
+    readings = hx_readings
+    if as_series:
+        readings = ReadingSeries.from_readings(hx_readings)
+    time_index = TimeIndex(readings)
+    dt = hx_readings[400].dt_reading
+
+    assert(time_index.index_of(dt) == 400)
+    assert(time_index.first_after(dt) == hx_readings[401])
+    assert(list(time_index.since(dt)) == hx_readings[400:])
+    # Hourly readings, so 24 hrs either side is 24 readings either side.
+    assert(list(time_index.window_around(dt, 24, 24)) == hx_readings[376:424])
+
+    with pytest.raises(ValueError):
+        time_index.index_of(dt + datetime.timedelta(minutes=1))
+    assert(time_index.first_after(hx_readings[-1].dt_reading) is None)
@@ -0,0 +1,70 @@
+"""Tests for utils/result_store.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_result_store.py
+"""
+
+import json
+
+import utils.result_store as result_store
+from utils.result_store import ResultStore
+
+
+def make_results_dict(rise_critical, m_critical):
+    return {'critical rise': rise_critical, 'critical slope': m_critical,
+            'true positives': 1, 'false positives': 2, 'false negatives': 0,
+            'notification times': [41]}
+
+
+def test_append_and_resume(tmp_path):
+    results_file = str(tmp_path / 'results.jsonl')
+    store = ResultStore(results_file)
+    store.append(make_results_dict(2.5, 0.5))
+    store.append(make_results_dict(2.5, 0.625))
+    # Appending the same trial again does nothing.
+    store.append(make_results_dict(2.5, 0.5))
+
+    store = ResultStore(results_file)
+    assert(len(store) == 2)
+    assert((2.5, 0.5) in store)
+    # Keys are rounded, so this is the same trial.
+    assert((2.5000000001, 0.5) in store)
+    assert(store.get_pending([(2.5, 0.5), (2.75, 0.5)]) == [(2.75, 0.5)])
+    assert(store.get_results([(2.5, 0.625), (2.75, 0.5), (2.5, 0.5)])
+            == [make_results_dict(2.5, 0.625), make_results_dict(2.5, 0.5)])
+
+
+def test_fresh_starts_over(tmp_path):
+    results_file = str(tmp_path / 'results.jsonl')
+    ResultStore(results_file).append(make_results_dict(2.5, 0.5))
+    assert(len(ResultStore(results_file)) == 1)
+    assert(len(ResultStore(results_file, fresh=True)) == 0)
+
+
+def test_partial_line_is_dropped(tmp_path):
+    results_file = tmp_path / 'results.jsonl'
+    line = json.dumps(make_results_dict(2.5, 0.5))
+    results_file.write_text(line + '\n' + line[:20])
+
+    assert(len(list(result_store.iter_results(str(results_file)))) == 1)
+
+    store = ResultStore(str(results_file))
+    store.append(make_results_dict(2.75, 0.5))
+    assert([result_store.get_result_key(results_dict)
+                for results_dict in store]
+            == [result_store.get_trial_key((2.5, 0.5)),
+                result_store.get_trial_key((2.75, 0.5))])
+
+
+def test_keys_include_all_parameters():
+    """Results without the newer parameters get their default values."""
+    default_key = result_store.get_trial_key((2.5, 0.5))
+    assert(result_store.get_result_key(make_results_dict(2.5, 0.5))
+            == default_key)
+
+    config = result_store.get_config((2.5, 0.5, 20.0, 6, 12, 36))
+    results_dict = make_results_dict(2.5, 0.5)
+    results_dict.update(result_store.get_config_fields(config))
+    assert(result_store.get_result_key(results_dict)
+            == result_store.get_trial_key(config))
+    assert(result_store.get_result_key(results_dict) != default_key)
@@ -0,0 +1,116 @@
+"""Tests for utils/roc_scores.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_roc_scores.py
+"""
+
+import numpy as np
+import pytest
+
+import utils.analysis_utils as a_utils
+import utils.critical_points as critical_points
+import utils.roc_scores as roc_scores
+import utils.threshold_grid as threshold_grid
+import vary_parameters as vp
+
+
+RATIO_HOURS = 5.0
+# Slopes that don't fall exactly on a reading's score.
+M_CRITICALS = [0.3123, 0.4567, 0.5123, 0.6543, 0.8765]
+
+
+def get_exact_results(readings, known_slides, m_criticals):
+    """Evaluate each m_critical on the path with the threshold grid.
+    test_threshold_grid.py checks the grid against the full analysis.
+    """
+    return threshold_grid.evaluate_grid([readings], known_slides,
+            [a_utils.AnalysisConfig(RATIO_HOURS * m_critical, m_critical,
+                    a_utils.RIVER_MIN_HEIGHT,
+                    roc_scores.get_lookback_hours(RATIO_HOURS))
+                for m_critical in m_criticals])
+
+
+def test_reading_scores_match_detector(hx_data):
+    """A reading is critical at m_critical when its score is at least
+    m_critical, including when m_critical is exactly a reading's score.
+    """
+    readings, _ = hx_data
+    scores = roc_scores.get_reading_scores(readings, RATIO_HOURS,
+            a_utils.RIVER_MIN_HEIGHT)
+    tied_m_criticals = np.unique(scores[scores > 0.3])[::25].tolist()
+    assert(tied_m_criticals)
+    for m_critical in M_CRITICALS + tied_m_criticals:
+        critical_indices = critical_points.find_critical_indices(readings,
+                RATIO_HOURS * m_critical, m_critical,
+                a_utils.RIVER_MIN_HEIGHT, 1,
+                roc_scores.get_lookback_hours(RATIO_HOURS))
+        assert(np.array_equal(critical_indices,
+                np.flatnonzero(scores >= m_critical)))
+
+
+def test_roc_curve(hx_data):
+    readings, known_slides = hx_data
+    roc_curve = roc_scores.get_roc_curve([readings], known_slides,
+            RATIO_HOURS, a_utils.RIVER_MIN_HEIGHT, min_m_critical=0.3)
+
+    # Thresholds decrease, and every point is a change in outcome.
+    slopes = [point['critical slope'] for point in roc_curve]
+    assert(slopes == sorted(set(slopes), reverse=True))
+    outcomes = [(point['true positives'], point['false positives'],
+                    point['false negatives']) for point in roc_curve]
+    for outcome, next_outcome in zip(outcomes, outcomes[1:]):
+        assert(outcome != next_outcome)
+
+    # Every point matches the full analysis, at its own threshold and just
+    #   above the next point's threshold.
+    m_criticals = slopes + [np.nextafter(slope, np.inf).item()
+                                for slope in slopes[1:]]
+    exact_results = get_exact_results(readings, known_slides, m_criticals)
+    for m_critical, exact in zip(m_criticals, exact_results):
+        point = [point for point in roc_curve
+                    if point['critical slope'] >= m_critical][-1]
+        assert(point['true positives'] == exact['true positives'])
+        assert(point['false positives'] == exact['false positives'])
+        assert(point['false negatives'] == exact['false negatives'])
+
+    # And at slopes between points.
+    exact_results = get_exact_results(readings, known_slides, M_CRITICALS)
+    for m_critical, exact in zip(M_CRITICALS, exact_results):
+        points = [point for point in roc_curve
+                    if point['critical slope'] >= m_critical]
+        assert(points)
+        assert(points[-1]['true positives'] == exact['true positives'])
+        assert(points[-1]['false positives'] == exact['false positives'])
+        assert(points[-1]['false negatives'] == exact['false negatives'])
+
+
+def test_roc_curve_matches_full_analysis(hx_data):
+    """Spot check points on the curve against analyze_all_data()."""
+    readings, known_slides = hx_data
+    roc_curve = roc_scores.get_roc_curve([readings], known_slides,
+            RATIO_HOURS, a_utils.RIVER_MIN_HEIGHT, min_m_critical=0.3)
+    for point in roc_curve[::len(roc_curve) // 4]:
+        m_critical = point['critical slope']
+        results_dict = vp.analyze_all_data(RATIO_HOURS * m_critical,
+                m_critical, all_readings=[readings],
+                known_slides=known_slides,
+                lookback_hours=point['lookback hours'])
+        assert(point['true positives'] == results_dict['true positives'])
+        assert(point['false positives'] == results_dict['false positives'])
+        assert(point['false negatives'] == results_dict['false negatives'])
+
+
+def test_add_critical_indices():
+    # Timestamps an hour apart, with a new event after more than 2 hours.
+    timestamps = np.arange(10) * 3600
+    next_first_bounds = np.searchsorted(timestamps,
+            timestamps + 3 * 3600).tolist()
+    critical_indices, first_indices = [], []
+    for new_indices in ([4, 8], [6], [2], [0, 9]):
+        removed, added = roc_scores.add_critical_indices(critical_indices,
+                first_indices, new_indices, next_first_bounds)
+        expected = critical_points.select_first_critical_indices(
+                np.array(critical_indices), timestamps, 2).tolist()
+        assert(first_indices == expected)
+    assert(critical_indices == [0, 2, 4, 6, 8, 9])
+    assert(first_indices == [0, 4, 8])
@@ -0,0 +1,56 @@
+"""Tests for SlideCatalog in slide_event.py.
+
+Run this from project root directory:
+$ python -m pytest tests/test_slide_event.py
+"""
+
+import datetime
+
+import pytest
+
+from slide_event import SlideEvent, SlideCatalog
+
+
+@pytest.fixture(scope="module")
+def known_slides():
+    return SlideEvent.load_slides('known_slides/known_slides.json')
+
+
+def get_slides_in_range_reference(known_slides, dt_start, dt_end):
+    return [slide for slide in known_slides
+                if dt_start <= slide.dt_slide <= dt_end]
+
+
+def test_catalog_is_sorted(known_slides):
+    catalog = SlideCatalog(known_slides)
+    assert(len(catalog) == len(known_slides))
+    assert(catalog.dt_slides == sorted(catalog.dt_slides))
+
+def test_in_range(known_slides):
+    catalog = SlideCatalog(known_slides)
+    td_day = datetime.timedelta(days=1)
+    for slide in known_slides:
+        dt_start, dt_end = slide.dt_slide - td_day, slide.dt_slide + td_day
+        reference = get_slides_in_range_reference(known_slides, dt_start,
+                dt_end)
+        assert(set(catalog.in_range(dt_start, dt_end)) == set(reference))
+        assert(catalog.first_in_range(dt_start, dt_end) == min(reference,
+                key=lambda slide: slide.dt_slide))
+
+    # Boundaries are inclusive.
+    slide = known_slides[0]
+    assert(catalog.in_range(slide.dt_slide, slide.dt_slide) == [slide])
+
+def test_associate(known_slides):
+    catalog = SlideCatalog(known_slides)
+    td_day = datetime.timedelta(days=1)
+    # Windows around each slide, out of order, plus one with no slides.
+    windows = [(s.dt_slide - td_day, s.dt_slide + td_day)
+                    for s in reversed(known_slides)]
+    dt_empty = datetime.datetime(2000, 1, 1, tzinfo=known_slides[0].dt_slide.tzinfo)
+    windows.append((dt_empty, dt_empty + td_day))
+
+    results = catalog.associate(windows)
+    expected = [catalog.first_in_range(*window) for window in windows]
+    assert(results == expected)
+    assert(results[-1] is None)
@@ -0,0 +1,96 @@
+"""Tests for utils/synthetic_data.py.
+
+Synthetic data must read back exactly through the same parsers real data
+  goes through, and storms must look like storms to the detector.
+
+Run this from project root directory:
+$ python -m pytest tests/test_synthetic_data.py
+"""
+
+import datetime
+
+import numpy as np
+import pytz
+
+import utils.analysis_utils as a_utils
+import utils.parse_utils as parse_utils
+import utils.synthetic_data as synthetic_data
+from slide_event import SlideEvent
+
+
+# Covers the start of DST in March.
+DT_START = datetime.datetime(2019, 2, 1, tzinfo=pytz.utc)
+
+
+def test_same_seed_same_data():
+    series_a, storms_a = synthetic_data.generate_series(DT_START, 60, seed=1)
+    series_b, storms_b = synthetic_data.generate_series(DT_START, 60, seed=1)
+    assert(storms_a == storms_b)
+    assert((series_a.heights == series_b.heights).all())
+
+
+def test_hx_file_round_trip(tmp_path):
+    config = synthetic_data.HydrographConfig(interval_minutes=60)
+    series, _ = synthetic_data.generate_series(DT_START, 60, config, seed=1)
+    data_file = tmp_path / 'synthetic_hx_format.txt'
+    synthetic_data.write_hx_file(series, data_file)
+
+    parsed = parse_utils.get_series_hx_format(data_file)
+    assert((parsed.timestamps == series.timestamps).all())
+    assert((parsed.heights == series.heights).all())
+
+
+def test_arch_file_round_trip(tmp_path):
+    """Local times in the file convert back to the same UTC times, across
+    the start and end of DST.
+    """
+    series, _ = synthetic_data.generate_series(DT_START, 300, seed=1)
+    data_file = tmp_path / 'synthetic_arch_format.txt'
+    synthetic_data.write_arch_file(series, data_file)
+
+    bad_lines = []
+    parsed = parse_utils.get_series_arch_format(data_file, bad_lines)
+    assert(not bad_lines)
+    assert((parsed.timestamps == series.timestamps).all())
+    assert((parsed.heights == series.heights).all())
+    assert((parsed.discharges == series.discharges).all())
+
+
+def test_slides_file_round_trip(tmp_path):
+    series, storms = synthetic_data.generate_series(DT_START, 365, seed=1)
+    slides = synthetic_data.generate_slides(storms, series, seed=1)
+    assert(slides)
+    slides_file = tmp_path / 'synthetic_slides.json'
+    synthetic_data.write_slides_file(slides, slides_file)
+
+    loaded = SlideEvent.load_slides(slides_file)
+    assert([(slide.name, slide.dt_slide) for slide in loaded]
+            == [(slide.name, slide.dt_slide) for slide in slides])
+
+
+def test_gaps():
+    config = synthetic_data.HydrographConfig(gaps_per_year=50)
+    series, _ = synthetic_data.generate_series(DT_START, 365, config, seed=1)
+    intervals = np.diff(series.timestamps)
+    assert((intervals > 0).all())
+    assert((intervals > 15 * 60).any())
+
+
+def test_detector_finds_large_storms():
+    """Storms that rise fast and far enough have a first critical point
+    during the storm, at 1-min resolution.
+    """
+    config = synthetic_data.HydrographConfig(interval_minutes=1,
+            noise=0)
+    series, storms = synthetic_data.generate_series(DT_START, 120, config,
+            seed=1)
+    first_critical_points = a_utils.get_first_critical_points(series)
+    fcp_times = [reading.dt_reading for reading in first_critical_points]
+
+    large_storms = [storm for storm in storms
+                        if storm.rise >= 3.5 and storm.rise_rate >= 0.7]
+    assert(large_storms)
+    for storm in large_storms:
+        dt_start = synthetic_data.timestamp_to_dt(storm.start)
+        dt_end = synthetic_data.timestamp_to_dt(storm.peak + 6 * 3600)
+        assert(any(dt_start <= dt <= dt_end for dt in fcp_times))
@@ -0,0 +1,93 @@
+"""Tests for utils/threshold_grid.py.
+
+Evaluating a whole grid at once must give the same results as running the
+  full analysis for each pair of critical values.
+
+Run this from project root directory:
+$ python -m pytest tests/test_threshold_grid.py
+"""
+
+from itertools import product
+
+import pytest
+
+import vary_parameters as vp
+import utils.analysis_utils as a_utils
+import utils.threshold_grid as threshold_grid
+import utils.result_store as result_store
+from utils.result_store import ResultStore
+
+
+PARAMETER_PAIRS = [(rise_critical, m_critical)
+                    for rise_critical in (2.0, 2.25, 2.5, 2.75, 3.0)
+                    for m_critical in (0.375, 0.5, 0.625)]
+
+
+def test_evaluate_grid_matches_trials(hx_data):
+    readings, known_slides = hx_data
+    all_readings = [readings]
+    grid_results = threshold_grid.evaluate_grid(all_readings, known_slides,
+            PARAMETER_PAIRS, a_utils.RIVER_MIN_HEIGHT)
+
+    for (rise_critical, m_critical), grid_result in zip(PARAMETER_PAIRS,
+            grid_results):
+        trial_result = vp.analyze_all_data(rise_critical, m_critical,
+                all_readings=all_readings, known_slides=known_slides)
+        del trial_result['alpha name']
+        assert(grid_result == trial_result)
+
+
+def test_evaluate_grid_multiple_files(hx_data):
+    """Readings split across data files are analyzed file by file."""
+    readings, known_slides = hx_data
+    split_readings = [readings[:len(readings)//2], readings[len(readings)//2:]]
+
+    assert(vp.run_grid(PARAMETER_PAIRS, split_readings, known_slides)
+            == vp.run_sweep(PARAMETER_PAIRS, split_readings, known_slides,
+                    jobs=1))
+
+
+def test_max_qualifying_rises_shared_offsets(hx_data):
+    """Computing several lookbacks together matches computing each alone."""
+    series, _ = hx_data
+    together = threshold_grid.get_max_qualifying_rises(series, 0.5, [16, 20])
+    for max_lookback in (16, 20):
+        alone = threshold_grid.get_max_qualifying_rises(series, 0.5,
+                [max_lookback])
+        assert((together[max_lookback] == alone[max_lookback]).all())
+
+
+def test_evaluate_grid_other_parameters(hx_data):
+    """Configs that sweep the other detection parameters also match."""
+    readings, known_slides = hx_data
+    all_readings = [readings]
+    configs = [a_utils.AnalysisConfig(*parameters)
+                for parameters in product((2.0, 2.5), (0.5,), (20.0, 20.5),
+                    (None, 3), (6, 12), (24, 36))]
+    cache = threshold_grid.StageCache()
+    grid_results = threshold_grid.evaluate_grid(all_readings, known_slides,
+            configs, cache=cache)
+    # Configs that only differ in later stages share earlier results.
+    assert(len(cache.max_rises) == 3)
+
+    for config, grid_result in zip(configs, grid_results):
+        trial_result = vp.analyze_all_data(all_readings=all_readings,
+                known_slides=known_slides, **config._asdict())
+        del trial_result['alpha name']
+        assert(grid_result == trial_result)
+
+def test_adaptive_search_stores_final_labels(hx_data, tmp_path):
+    # Labels in the store must match the labels that are returned.
+    readings, known_slides = hx_data
+    all_readings = [readings]
+    store = ResultStore(str(tmp_path / 'results.jsonl'))
+    all_results, _ = vp.run_adaptive_search((2.25, 2.75), (0.375, 0.625),
+            all_readings, known_slides, budget=40, store=store)
+
+    labels = {result_store.get_result_key(results_dict):
+                    results_dict['alpha name']
+                for results_dict in all_results}
+    assert(len(set(labels.values())) == len(all_results))
+    assert({result_store.get_result_key(results_dict):
+                results_dict['alpha name'] for results_dict in store}
+            == labels)
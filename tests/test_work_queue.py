@@ -0,0 +1,121 @@
+"""Tests for utils/work_queue.py.
+
+Several local worker processes stand in for workers on separate hosts.
+
+Run this from project root directory:
+$ python -m pytest tests/test_work_queue.py
+"""
+
+import os, time
+from multiprocessing import Process
+
+import pytest
+
+import vary_parameters as vp
+import utils.result_store as result_store
+from utils.result_store import ResultStore
+from utils.work_queue import WorkQueue
+
+
+PARAMETER_PAIRS = [(rise_critical, m_critical)
+                    for rise_critical in (2.25, 2.5, 2.75)
+                    for m_critical in (0.375, 0.5, 0.625)]
+
+
+def test_local_workers_match_grid(hx_data, tmp_path):
+    readings, known_slides = hx_data
+    all_readings = [readings]
+    queue_dir = str(tmp_path / 'queue')
+    vp.submit_trials(queue_dir, PARAMETER_PAIRS)
+
+    workers = [Process(target=vp.run_worker,
+                    args=(queue_dir, all_readings, known_slides),
+                    kwargs={'poll_seconds': 0.1})
+                for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert(worker.exitcode == 0)
+
+    queue_results = vp.run_coordinator(queue_dir, PARAMETER_PAIRS,
+            poll_seconds=0.1)
+    grid_results = vp.run_grid(PARAMETER_PAIRS, all_readings, known_slides)
+    assert(len(queue_results) == len(PARAMETER_PAIRS))
+    assert([results_dict['alpha name'] for results_dict in queue_results]
+            == [vp.get_alpha_name(i) for i in range(len(PARAMETER_PAIRS))])
+    for results_dict in queue_results + grid_results:
+        del results_dict['alpha name']
+    assert(queue_results == grid_results)
+
+
+def test_each_trial_claimed_once(tmp_path):
+    queue = WorkQueue(tmp_path)
+    assert(queue.submit([('t0', 'a'), ('t1', 'b')]) == 2)
+    # Submitting again doesn't add the same trials twice.
+    assert(queue.submit([('t0', 'a'), ('t1', 'b'), ('t2', 'c')]) == 1)
+
+    claims = [queue.claim() for _ in range(4)]
+    assert(claims == [('t0', 'a'), ('t1', 'b'), ('t2', 'c'), None])
+    assert(queue.get_counts() == (0, 3, 0))
+
+
+def test_trial_id_keeps_its_spec(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.submit([('t0', 'a')])
+    trial_id, _ = queue.claim()
+    queue.complete(trial_id, {'trial': 'a'})
+    with pytest.raises(ValueError):
+        queue.submit([('t0', 'b')])
+    assert(queue.get_counts() == (0, 0, 1))
+
+
+def test_reused_queue_dir(hx_data, tmp_path):
+    """A second sweep in the same queue directory only gets its own
+    results, labeled for that sweep.
+    """
+    readings, known_slides = hx_data
+    all_readings = [readings]
+    queue_dir = str(tmp_path / 'queue')
+    store = ResultStore(str(tmp_path / 'results.jsonl'))
+
+    def run_sweep(parameter_sets):
+        vp.submit_trials(queue_dir, parameter_sets, store)
+        vp.run_worker(queue_dir, all_readings, known_slides,
+                poll_seconds=0.1)
+        return vp.run_coordinator(queue_dir, parameter_sets, store,
+                poll_seconds=0.1)
+
+    run_sweep([(2.5, 0.5), (3.0, 0.5)])
+    parameter_sets = [(1.0, 0.5), (1.5, 0.5), (2.0, 0.5)]
+    queue_results = run_sweep(parameter_sets)
+
+    grid_results = vp.run_grid(parameter_sets, all_readings, known_slides)
+    assert(queue_results == grid_results)
+    # Each trial was written to the store once.
+    assert(len(list(result_store.iter_results(store.results_file))) == 5)
+
+    # Reusing the directory without a store still skips the old results.
+    queue_results = vp.run_coordinator(queue_dir, parameter_sets[::-1],
+            poll_seconds=0.1)
+    assert(queue_results == vp.run_grid(parameter_sets[::-1], all_readings,
+                                        known_slides))
+
+
+def test_stale_claim_is_requeued(tmp_path):
+    queue = WorkQueue(tmp_path)
+    queue.submit([('t0', 'a'), ('t1', 'b')])
+    dead_id, _ = queue.claim()
+    live_id, _ = queue.claim()
+
+    # The first worker died an hour ago; the second is still running.
+    an_hour_ago = time.time() - 3600
+    os.utime(queue.claimed_dir / f"{dead_id}.json",
+            (an_hour_ago, an_hour_ago))
+    assert(queue.requeue_stale(stale_seconds=600) == 1)
+    assert(queue.claim() == (dead_id, 'a'))
+
+    queue.complete(dead_id, {'trial': 'a'})
+    queue.complete(live_id, {'trial': 'b'})
+    assert(queue.is_finished())
+    assert(list(queue.iter_results()) == [{'trial': 'a'}, {'trial': 'b'}])
@@ -1,7 +1,8 @@
 """Utility functions for analyzing stream gauge data, and slide data.
 """
 
-import math, datetime, pickle
+import datetime, pickle
+from collections import namedtuple
 
 from xml.etree import ElementTree as ET
 
@@ -9,6 +10,12 @@ import requests, pytz
 
 # Assume this file will be imported in a directory outside of utils.
 import utils.ir_reading as ir_reading
+import utils.critical_points as critical_points
+import utils.parse_utils as parse_utils
+import utils.reading_archive as reading_archive
+from utils.reading_series import TimeIndex, get_reading_rate
+from utils.event_record import EventRecord
+from slide_event import SlideCatalog
 import plot_heights as ph
 
 
@@ -18,14 +25,50 @@ RISE_CRITICAL = 2.5
 M_CRITICAL = 0.5
 RIVER_MIN_HEIGHT = 20.5
 
+# Hours of readings to keep on each side of a first critical point.
+WINDOW_HOURS = 24
+# Critical points within this many hours of a first critical point are
+#   part of the same event.
+DEDUP_HOURS = 12
 
-def fetch_current_data(fresh=True, filename='ir_data_other/current_data.txt'):
+# Critical values for one analysis. Pass an AnalysisConfig to the analysis
+#   functions, instead of changing the module-level values, so analyses
+#   with different critical values can run in the same process.
+#   The module-level values are only read here, as the defaults.
+#   lookback_hours of None means rise_critical / m_critical, rounded up.
+AnalysisConfig = namedtuple('AnalysisConfig',
+        ['rise_critical', 'm_critical', 'river_min_height', 'lookback_hours',
+         'dedup_hours', 'window_hours'],
+        defaults=[RISE_CRITICAL, M_CRITICAL, RIVER_MIN_HEIGHT, None,
+                  DEDUP_HOURS, WINDOW_HOURS])
+
+
+# Minimum critical heights around the end of a set of readings, for the
+#   overlays on static plots. Each pair is an array of timestamps and an
+#   array of heights. See get_critical_forecast().
+CriticalForecast = namedtuple('CriticalForecast',
+        ['future_timestamps', 'future_heights', 'prev_timestamps',
+         'prev_heights'])
+
+
+def get_default_config():
+    """Return an AnalysisConfig with the default critical values."""
+    return AnalysisConfig()
+
+
+def fetch_current_data(fresh=True, filename='ir_data_other/current_data.txt',
+        store_file=reading_archive.STORE_FILE):
     """Fetches current data from the river gauge.
 
     If fresh is False, looks for cached data.
       Cached data is really just for development purposes, to avoid hitting
       the server unnecessarily.
 
+    Fresh readings that are newer than anything already in the reading store
+      are appended to it, so fetched data builds up a long-term record.
+      Pass store_file=None to skip this. If the readings can't be parsed or
+      stored, the error is printed, and the data is still returned.
+
     Returns the current data as text.
     """
     print("  Fetching data...")
@@ -42,6 +85,18 @@ def fetch_current_data(fresh=True, filename='ir_data_other/current_data.txt'):
             f.write(r.text)
         print(f"    Wrote data to {filename}.")
 
+        if store_file and r.status_code == 200:
+            try:
+                readings = process_xml_data(r.text)
+                store = reading_archive.ReadingStore(store_file)
+                n_new_readings = store.append(readings)
+            except (ET.ParseError, IndexError, TypeError, ValueError,
+                    OSError) as e:
+                # The store is a side effect; callers still get the data.
+                print(f"    Couldn't add readings to {store_file}: {e}")
+            else:
+                print(f"    Added {n_new_readings} new readings to {store_file}.")
+
         return r.text
 
     else:
@@ -89,20 +144,47 @@ def process_xml_data(data):
     return readings
 
 
-def get_readings_from_data_file(data_file):
+def get_readings_from_data_file(data_file,
+        archive_file=reading_archive.ARCHIVE_FILE, use_cache=True):
     """Process a single data file.
-    Returns a list of IRReading objects.
+    Returns a ReadingSeries.
+
+    If data_file is in the binary reading archive, and hasn't changed since
+      the archive was built, readings are loaded from the archive instead.
+      Pass archive_file=None to skip the archive.
+
+    Otherwise, parsed readings are cached in reading_archive.CACHE_DIR, and
+      the cache is used until the data file or the parser changes. Pass
+      use_cache=False to always parse the data file.
     """
+    if archive_file:
+        all_readings = reading_archive.get_series_from_archive(data_file,
+                archive_file)
+        if all_readings is not None:
+            print(f"\nLoaded {len(all_readings)} readings for {data_file} from {archive_file}.")
+            return all_readings
+
+    if use_cache:
+        all_readings = reading_archive.get_cached_series(data_file)
+        if all_readings is not None:
+            print(f"\nLoaded {len(all_readings)} cached readings for {data_file}.")
+            return all_readings
+
     # Use proper parsing function.
+    print(f"\nReading historical data from {data_file}.")
     if 'hx_format' in data_file:
-        all_readings = ph.get_readings_hx_format(data_file)
+        all_readings = parse_utils.get_series_hx_format(data_file)
     elif 'arch_format' in data_file:
-        all_readings = ph.get_readings_arch_format(data_file)
+        all_readings = parse_utils.get_series_arch_format(data_file)
+    print(f"  Found {len(all_readings)} readings.")
+
+    if use_cache:
+        reading_archive.cache_series(data_file, all_readings)
 
     return all_readings
 
 
-def get_reading_sets(readings, known_slides, stats):
+def get_reading_sets(readings, known_slides, stats, config=None):
     """Takes in a single list of readings, and returns two lists,
     critical_reading_sets and slide_readings_sets.
 
@@ -113,6 +195,22 @@ def get_reading_sets(readings, known_slides, stats):
 
     Updates stats.
     """
+    return [record.readings for record in get_event_records(readings,
+                known_slides, stats, config)]
+
+
+def get_event_records(readings, known_slides, stats, config=None):
+    """Takes in a single list of readings, and returns an EventRecord for
+    each critical event, followed by an EventRecord for each slide event
+    that isn't associated with critical points.
+
+    Critical points are found once for each event, and kept in its record.
+
+    Updates stats.
+    """
+    if config is None:
+        config = get_default_config()
+
     # Keep track of earliest and latest reading across all data files.
     #   DEV: This is probably better calculated later, in a separate fn.
     if not stats['earliest_reading']:
@@ -129,23 +227,34 @@ def get_reading_sets(readings, known_slides, stats):
             known_slides, readings)
 
     # Find the start of all critical periods in this data file.
-    first_critical_points = get_first_critical_points(readings)
+    first_critical_points = get_first_critical_points(readings, config)
     for reading in first_critical_points:
         print(ir_reading.get_formatted_reading(reading))
     stats['notifications_issued'] += len(first_critical_points)
 
     # critical_reading_sets is a list of lists. Each list is a set of
     #   readings to plot, based around a first critical point.
-    critical_reading_sets = [get_48hr_readings(fcp, readings)
+    time_index = TimeIndex(readings)
+    critical_reading_sets = [get_48hr_readings(fcp, readings, time_index,
+                                        config.window_hours)
                                     for fcp in first_critical_points]
 
     # Determine which critical sets are associated with slides, so we can
     #   process readings for unassociated slides and build
-    #   slide_reading_sets.
-    for reading_set in critical_reading_sets:
-        critical_points = get_critical_points(reading_set)
-        relevant_slide = ph.get_relevant_slide(reading_set, known_slides)
+    #   slide records. All sets are matched against the catalog at once.
+    if not isinstance(known_slides, SlideCatalog):
+        known_slides = SlideCatalog(known_slides)
+    windows = [(reading_set[0].dt_reading, reading_set[-1].dt_reading)
+                    for reading_set in critical_reading_sets]
+    relevant_slides = known_slides.associate(windows)
+
+    critical_records = []
+    for reading_set, relevant_slide in zip(critical_reading_sets,
+            relevant_slides):
+        critical_points = get_critical_points(reading_set, config)
+        notification_time = None
         if relevant_slide:
+            print(f"Slide in range: {relevant_slide.name} - {relevant_slide.dt_slide}")
             stats['relevant_slides'].append(relevant_slide)
             stats['associated_notifications'] += 1
             notification_time = ph.get_notification_time(critical_points,
@@ -159,83 +268,56 @@ def get_reading_sets(readings, known_slides, stats):
             stats['unassociated_notification_points'].append(
                     critical_points[0])
             stats['unassociated_notifications'] += 1
+        critical_records.append(EventRecord(reading_set, critical_points,
+                relevant_slide, notification_time))
 
     # Any slides left in slides_in_range are unassociated.
     #   We can grab a 48-hr data set around these slide.
-    slide_reading_sets = []
+    slide_records = []
     for slide in slides_in_range:
         # Get first reading after this slide, and base 48 hrs around that.
-        for reading in readings:
-            if reading.dt_reading > slide.dt_slide:
-                slide_readings = get_48hr_readings(
-                        reading, readings)
-                slide_reading_sets.append(slide_readings)
-                break
+        reading = time_index.first_after(slide.dt_slide)
+        if reading:
+            slide_readings = get_48hr_readings(reading, readings, time_index,
+                    config.window_hours)
+            slide_records.append(EventRecord(slide_readings,
+                    get_critical_points(slide_readings, config), slide, None))
 
         stats['unassociated_slides'].append(slide)
 
-    return critical_reading_sets + slide_reading_sets
+    return critical_records + slide_records
 
 
 def pickle_reading_set(reading_set, root_output_directory=''):
     """Pickle a reading set, for further analysis and quicker plotting."""
     dt_last_reading_str = reading_set[-1].dt_reading.strftime('%m%d%Y')
     dump_filename = f'{root_output_directory}other_output/reading_dump_{dt_last_reading_str}.pkl'
+    # Always dump a plain list of IRReading objects, even if the set is a
+    #   ReadingSeries, so other programs can load dumps without utils/.
     with open(dump_filename, 'wb') as f:
-        pickle.dump(reading_set, f)
+        pickle.dump(list(reading_set), f)
 
 
-def get_critical_points(readings):
+def get_critical_points(readings, config=None):
     """Return critical points.
     A critical point is the first point where the slope has been critical
     over a minimum rise. Once a point is considered critical, there are no
     more critical points for the next 6 hours.
+
+    If config is None, the default AnalysisConfig() is used.
     """
     print("  Looking for critical points...")
+    if config is None:
+        config = get_default_config()
 
-    # What's the longest it could take to reach critical?
-    #   RISE_CRITICAL / M_CRITICAL
-    #  If it rises faster than that, we want to know.
-    #    Multiplied by 4, because there are 4 readings/hr.
     readings_per_hr = get_reading_rate(readings)
-    max_lookback = math.ceil(RISE_CRITICAL / M_CRITICAL) * readings_per_hr
-
-    critical_points = []
-    # Start with 10th reading, so can look back.
-    for reading_index, reading in enumerate(readings[max_lookback:]):
-        # print(f"  Examining reading: {reading.get_formatted_reading()}")
-
-        # If reading is below the base level of the river plus the minimum
-        #   critical rise, this reading can't be critical, and we don't need
-        #   to examine it.
-        if reading.height < RIVER_MIN_HEIGHT + RISE_CRITICAL:
-            continue
-
-        # Get prev max_lookback readings.
-        prev_readings = [reading for reading in readings[reading_index-max_lookback:reading_index]]
-        for prev_reading in prev_readings:
-            rise = ir_reading.get_rise(reading, prev_reading)
-            m = ir_reading.get_slope(reading, prev_reading)
-            # print(f"    Rise: {rise} Slope: {m}")
-            if rise >= RISE_CRITICAL and m > M_CRITICAL:
-                # print(f"Critical point: {reading.get_formatted_reading()}")
-                critical_points.append(reading)
-                break
-
-    print(f"    Found {len(critical_points)} critical points.")
-    return critical_points
-
-
-def get_reading_rate(readings):
-    """Return readings/hr.
-    Should be 1 or 4, for hourly or 15-min readings.
-    """
-    reading_interval = (
-        (readings[1].dt_reading - readings[0].dt_reading).total_seconds() // 60)
-    reading_rate = int(60 / reading_interval)
-    # print(f"Reading rate for this set of readings: {reading_rate}")
+    critical_indices = critical_points.find_critical_indices(readings,
+            config.rise_critical, config.m_critical, config.river_min_height,
+            readings_per_hr, config.lookback_hours)
+    critical_points_found = [readings[i] for i in critical_indices.tolist()]
 
-    return reading_rate
+    print(f"    Found {len(critical_points_found)} critical points.")
+    return critical_points_found
 
 
 def get_recent_readings(readings, hours_lookback):
@@ -246,74 +328,87 @@ def get_recent_readings(readings, hours_lookback):
     last_reading = readings[-1]
     td_lookback = datetime.timedelta(hours=hours_lookback)
     dt_first_reading = last_reading.dt_reading - td_lookback
-    recent_readings = [r for r in readings
-                            if r.dt_reading >= dt_first_reading]
+    recent_readings = TimeIndex(readings).since(dt_first_reading)
 
     print(f"    Found {len(recent_readings)} recent readings.")
     return recent_readings
 
 
-def get_first_critical_points(readings):
+def get_first_critical_points(readings, config=None):
     """From a long set of data, find the first critical reading in
     each potentially critical event.
     Return this set of readings.
+
+    If config is None, the default AnalysisConfig() is used.
     """
     print("\nLooking for first critical points...")
+    if config is None:
+        config = get_default_config()
 
-    # What's the longest it could take to reach critical?
-    #   RISE_CRITICAL / M_CRITICAL
-    #  If it rises faster than that, we want to know.
-    #    Multiplied by 4, because there are 4 readings/hr.
-    # Determine readings/hr from successive readings.
-    #  reading_interval is in minutes
     # Assumes all readings in this set of readings are at a consistent interval.
-    reading_interval = (readings[1].dt_reading - readings[0].dt_reading).total_seconds() // 60
-    lookback_factor = int(60 / reading_interval)
-    # print('lf', lookback_factor)
-    max_lookback = math.ceil(RISE_CRITICAL / M_CRITICAL) * lookback_factor
-
-    first_critical_points = []
-    # Start with 10th reading, so can look back.
-    for reading_index, reading in enumerate(readings[max_lookback:]):
-        # print(f"  Examining reading: {reading.get_formatted_reading()}")
-
-        # If reading is below the base level of the river plus the minimum
-        #   critical rise, this reading can't be critical, and we don't need
-        #   to examine it.
-        if reading.height < RIVER_MIN_HEIGHT + RISE_CRITICAL:
-            continue
-
-        # Get prev max_lookback readings.
-        prev_readings = [reading for reading in readings[reading_index-max_lookback:reading_index]]
-        for prev_reading in prev_readings:
-            rise = ir_reading.get_rise(reading, prev_reading)
-            m = ir_reading.get_slope(reading, prev_reading)
-            # print(f"    Rise: {rise} Slope: {m}")
-            if rise >= RISE_CRITICAL and m > M_CRITICAL:
-                # print(f"Critical point: {reading.get_formatted_reading()}")
-                # Ignore points 12 hours after an existing critical point.
-                if not first_critical_points:
-                    first_critical_points.append(reading)
-                    break
-                elif (reading.dt_reading - first_critical_points[-1].dt_reading).total_seconds() // 3600 > 12:
-                    first_critical_points.append(reading)
-                    break
-                else:
-                    # This is shortly after an already-identified point.
-                    break
-
-    return first_critical_points
-
-
-def get_48hr_readings(first_critical_point, all_readings):
+    readings_per_hr = get_reading_rate(readings)
+    first_critical_indices = critical_points.find_first_critical_indices(
+            readings, config.rise_critical, config.m_critical,
+            config.river_min_height, readings_per_hr, config.lookback_hours,
+            config.dedup_hours)
+
+    return [readings[i] for i in first_critical_indices.tolist()]
+
+
+def get_critical_forecast(readings, config=None, n_future=18,
+        interval_minutes=15, prev_hours=12):
+    """Return a CriticalForecast for a set of readings.
+
+    The future heights are the minimum heights that would be critical for
+      n_future points after the last reading, interval_minutes apart. The
+      previous heights are the minimum critical heights for each reading in
+      the last prev_hours of readings.
+
+    These heights are a guide for plots, not the detector's exact test. Each
+      height is taken over a plain trailing window of lookback_hours, or
+      rise_critical / m_critical when lookback_hours is None, as the plot
+      overlays have always been drawn. The detector compares each reading
+      against the readings max_lookback + 1 through 2 * max_lookback
+      readings back, with the lookback rounded up to whole readings, and also
+      requires river_min_height + rise_critical. See
+      critical_points.find_critical_indices(). So a reading can reach these
+      heights without being flagged, or be flagged below them.
+
+    If config is None, the default AnalysisConfig() is used.
+    """
+    if config is None:
+        config = get_default_config()
+
+    future_timestamps, future_heights = (
+            critical_points.find_min_critical_future(readings,
+                config.rise_critical, config.m_critical, n_future,
+                interval_minutes, config.lookback_hours))
+    prev_timestamps, prev_heights = (
+            critical_points.find_min_critical_previous(readings,
+                config.rise_critical, config.m_critical, prev_hours,
+                config.lookback_hours))
+
+    return CriticalForecast(future_timestamps, future_heights,
+            prev_timestamps, prev_heights)
+
+
+def get_48hr_readings(first_critical_point, all_readings, time_index=None,
+        window_hours=WINDOW_HOURS):
     """Return 24 hrs of readings before, and 24 hrs of readings after the
-    first critical point."""
+    first critical point. Pass window_hours to use a different window.
+
+    Pass a TimeIndex for all_readings when calling this repeatedly, so the
+      index is only built once.
+    """
+    if not time_index:
+        time_index = TimeIndex(all_readings)
+
     readings_per_hr = get_reading_rate(all_readings)
     # Pull from all_readings, with indices going back 24 hrs and forward
     #  24 hrs.
-    fcp_index = all_readings.index(first_critical_point)
-    start_index = fcp_index - 24 * readings_per_hr
-    end_index = fcp_index + 24 * readings_per_hr
+    fcp_index = time_index.index_of(first_critical_point.dt_reading)
+    start_index = fcp_index - window_hours * readings_per_hr
+    end_index = fcp_index + window_hours * readings_per_hr
     # print(readings_per_hr, start_index, end_index)
 
     return all_readings[start_index:end_index]
@@ -324,6 +419,8 @@ def get_slides_in_range(known_slides, readings):
     """
     start = readings[0].dt_reading
     end = readings[-1].dt_reading
+    if isinstance(known_slides, SlideCatalog):
+        return known_slides.in_range(start, end)
     return [slide for slide in known_slides if start <= slide.dt_slide <= end]
 
 def get_earliest_latest_readings(reading_sets,stats):
@@ -343,8 +440,11 @@ def get_earliest_latest_readings(reading_sets,stats):
     stats['latest_reading'] = latest
 
 
-def summarize_results(reading_sets, known_slides, stats):
+def summarize_results(reading_sets, known_slides, stats, config=None):
     """Summarize results of analysis."""
+    if config is None:
+        config = get_default_config()
+
     get_earliest_latest_readings(reading_sets, stats)
 
     assert(stats['unassociated_notifications']
@@ -360,8 +460,8 @@ def summarize_results(reading_sets, known_slides, stats):
     end_str = stats['latest_reading'].dt_reading.strftime('%m/%d/%Y')
     print("\n\n --- Final Results ---\n")
     print(f"Data analyzed from: {start_str} to {end_str}")
-    print(f"  Critical rise used: {RISE_CRITICAL} feet")
-    print(f"  Critical rise rate used: {M_CRITICAL} ft/hr")
+    print(f"  Critical rise used: {config.rise_critical} feet")
+    print(f"  Critical rise rate used: {config.m_critical} ft/hr")
 
     print(f"\nNotifications Issued: {stats['notifications_issued']}")
     print(f"\nTrue Positives: {stats['associated_notifications']}")
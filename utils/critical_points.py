@@ -0,0 +1,363 @@
+"""Find critical points in stream gauge readings, using NumPy.
+
+These functions do the work behind analysis_utils.get_critical_points() and
+  analysis_utils.get_first_critical_points(). They operate on a
+  ReadingSeries, and return indices into that series.
+
+CriticalPointDetector does the same analysis one reading at a time, for
+  live data.
+
+find_min_critical_future() and find_min_critical_previous() find the
+  lowest heights that would be critical around the end of a set of
+  readings, for the overlays on static plots.
+"""
+
+import math
+from collections import deque, namedtuple
+
+import numpy as np
+
+from utils.reading_series import as_reading_series, dt_to_timestamp
+
+
+DetectorResult = namedtuple('DetectorResult',
+        ['is_critical', 'is_first_critical'])
+
+
+def get_max_lookback(rise_critical, m_critical, readings_per_hr,
+        lookback_hours=None):
+    """Return the number of readings to look back from each reading.
+
+    What's the longest it could take to reach critical?
+      rise_critical / m_critical hours. If it rises faster than that,
+      we want to know.
+
+    Pass lookback_hours to use a different lookback.
+    """
+    if lookback_hours is None:
+        return math.ceil(rise_critical / m_critical) * readings_per_hr
+    return math.ceil(lookback_hours * readings_per_hr)
+
+
+def find_critical_indices(readings, rise_critical, m_critical,
+        river_min_height, readings_per_hr, lookback_hours=None):
+    """Return an array of indices of all critical readings.
+
+    A reading is critical if it's at least river_min_height + rise_critical,
+      and there's an earlier reading in its lookback window it has risen at
+      least rise_critical from, at a rate greater than m_critical.
+
+    The lookback window matches the original loop in get_critical_points():
+      reading i is compared against readings i - 2*max_lookback through
+      i - max_lookback - 1.
+    """
+    series = as_reading_series(readings)
+    heights = series.heights
+    timestamps = series.timestamps
+
+    max_lookback = get_max_lookback(rise_critical, m_critical,
+            readings_per_hr, lookback_hours)
+    first_index = 2 * max_lookback
+    if len(series) <= first_index:
+        return np.array([], dtype=np.intp)
+
+    # Readings below the base level of the river plus the minimum critical
+    #   rise can't be critical, so only examine the rest.
+    candidates = np.flatnonzero(
+            ~(heights[first_index:] < river_min_height + rise_critical))
+    candidates += first_index
+    if not len(candidates):
+        return candidates
+
+    candidate_heights = heights[candidates]
+    candidate_timestamps = timestamps[candidates]
+    is_critical = np.zeros(len(candidates), dtype=bool)
+
+    # Compare every candidate against the reading at each offset in the
+    #   lookback window, one offset at a time. This keeps memory use at
+    #   O(n) instead of O(n * max_lookback).
+    for offset in range(max_lookback + 1, 2 * max_lookback + 1):
+        prev_indices = candidates - offset
+        rise = candidate_heights - heights[prev_indices]
+        # Time difference in hours.
+        d_time = (candidate_timestamps - timestamps[prev_indices]) / 3600
+        slope = np.abs(rise / d_time)
+        is_critical |= (rise >= rise_critical) & (slope > m_critical)
+
+    return candidates[is_critical]
+
+
+def find_first_critical_indices(readings, rise_critical, m_critical,
+        river_min_height, readings_per_hr, lookback_hours=None,
+        dedup_hours=12):
+    """Return an array of indices of the first critical reading in each
+    potentially critical event.
+
+    Critical points within dedup_hours of an existing first critical point
+      are ignored.
+    """
+    series = as_reading_series(readings)
+    critical_indices = find_critical_indices(series, rise_critical,
+            m_critical, river_min_height, readings_per_hr, lookback_hours)
+
+    return select_first_critical_indices(critical_indices, series.timestamps,
+            dedup_hours)
+
+
+def select_first_critical_indices(critical_indices, timestamps,
+        dedup_hours=12):
+    """From an array of critical indices, keep only the first index of each
+    event. Critical points within dedup_hours of the previous first critical
+    point are part of the same event.
+    """
+    # There are far fewer critical points than readings, so a simple
+    #   loop is fine here.
+    first_critical_indices = []
+    last_timestamp = None
+    for index, timestamp in zip(critical_indices.tolist(),
+            timestamps[critical_indices].tolist()):
+        if (last_timestamp is None
+                or (timestamp - last_timestamp) // 3600 > dedup_hours):
+            first_critical_indices.append(index)
+            last_timestamp = timestamp
+
+    return np.array(first_critical_indices, dtype=np.intp)
+
+
+def get_window_minimums(values, starts, ends):
+    """Return the minimum of values[start:end] for each pair of start and end
+    indices. Empty windows are NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = np.asarray(ends, dtype=np.intp)
+    minimums = np.full(len(starts), np.nan)
+    nonempty = starts < ends
+    if not nonempty.any():
+        return minimums
+
+    # reduceat() reduces between each pair of adjacent indices, so interleave
+    #   starts and ends, and keep every other result. An end can be
+    #   len(values), so pad values to keep every index in range.
+    padded = np.append(values, np.nan)
+    bounds = np.column_stack((starts[nonempty], ends[nonempty])).ravel()
+    minimums[nonempty] = np.minimum.reduceat(padded, bounds)[::2]
+    return minimums
+
+
+def get_critical_heights(min_heights, first_heights, rise_critical,
+        m_critical, lookback_hours):
+    """Return the lowest heights that would be critical, given the minimum
+    height and the first height in each lookback window.
+
+    A height rise_critical above the minimum satisfies the total rise. If
+      that isn't an average rise of m_critical over the window, the height
+      is bumped to rise at m_critical from the first height instead.
+    """
+    critical_heights = min_heights + rise_critical
+    m_avg = (critical_heights - first_heights) / lookback_hours
+    return np.where(m_avg < m_critical,
+            lookback_hours * m_critical + first_heights, critical_heights)
+
+
+def find_min_critical_future(readings, rise_critical, m_critical,
+        n_future=18, interval_minutes=15, lookback_hours=None):
+    """Return timestamps and heights of the minimum critical heights for
+    n_future points after the last reading, interval_minutes apart.
+
+    These are the heights the river would need to reach to become, or
+      remain, critical. Each point's lookback window includes the readings
+      since lookback_hours before it, and the future points before it.
+      This trailing window isn't the detector's window; see
+      analysis_utils.get_critical_forecast().
+    """
+    series = as_reading_series(readings)
+    if lookback_hours is None:
+        lookback_hours = rise_critical / m_critical
+
+    timestamps = (series.timestamps[-1]
+            + interval_minutes * 60 * np.arange(1, n_future + 1))
+    starts = np.searchsorted(series.timestamps,
+            timestamps - lookback_hours * 3600)
+    window_mins = get_window_minimums(series.heights, starts,
+            np.full(n_future, len(series)))
+
+    # Each future point lowers the minimum for the points after it, so step
+    #   through them. There are only a few, and the work over the readings
+    #   is already done.
+    heights = np.empty(n_future)
+    prev_min = np.nan
+    for i, (window_min, start) in enumerate(zip(window_mins.tolist(),
+            starts.tolist())):
+        if start < len(series):
+            first_height = series.heights[start]
+        else:
+            # No readings in the window; it starts with the future points.
+            first_height = heights[0] if i else np.nan
+        min_height = np.fmin(window_min, prev_min)
+        heights[i] = get_critical_heights(min_height, first_height,
+                rise_critical, m_critical, lookback_hours)
+        prev_min = np.fmin(prev_min, heights[i])
+
+    return timestamps, heights
+
+
+def find_min_critical_previous(readings, rise_critical, m_critical,
+        hours=12, lookback_hours=None):
+    """Return timestamps and heights of the minimum critical heights for
+    each reading in the last hours of readings.
+
+    This shows how close conditions were to being critical. Each reading's
+      lookback window includes the readings since lookback_hours before it,
+      up to but not including the reading itself. Readings with no earlier
+      readings in their window are NaN. This trailing window isn't the
+      detector's window; see analysis_utils.get_critical_forecast().
+    """
+    series = as_reading_series(readings)
+    if lookback_hours is None:
+        lookback_hours = rise_critical / m_critical
+
+    first = np.searchsorted(series.timestamps,
+            series.timestamps[-1] - hours * 3600)
+    timestamps = series.timestamps[first:]
+    starts = np.searchsorted(series.timestamps,
+            timestamps - lookback_hours * 3600)
+    ends = np.searchsorted(series.timestamps, timestamps)
+    window_mins = get_window_minimums(series.heights, starts, ends)
+    first_heights = series.heights[np.minimum(starts, len(series) - 1)]
+
+    return timestamps, get_critical_heights(window_mins, first_heights,
+            rise_critical, m_critical, lookback_hours)
+
+
+class CriticalPointDetector:
+    """Find critical points in a stream of readings, one reading at a time.
+
+    Feed readings to update() in chronological order. The results agree
+      with find_critical_indices() and find_first_critical_indices() run
+      over the same readings.
+
+    Each update is O(1) amortized. A reading j in the lookback window
+      satisfies the slope test for the current reading i exactly when
+      h_j - m_critical * t_j < h_i - m_critical * t_i, so only the window
+      minimum of that key matters. A monotonic deque tracks that minimum.
+      With the default lookback, the window starts more than
+      rise_critical / m_critical hours back, so a reading that passes the
+      slope test also passes the rise test. With a shorter lookback_hours,
+      the window is checked exactly when the slope test passes.
+    """
+
+    # Keys closer than this are rechecked with the exact rise and slope
+    #   calculations, so floating point rounding can't change a result.
+    KEY_TOLERANCE = 1e-6
+
+    def __init__(self, rise_critical, m_critical, river_min_height,
+            readings_per_hr=None, lookback_hours=None, dedup_hours=12):
+        self.rise_critical = rise_critical
+        self.m_critical = m_critical
+        self.river_min_height = river_min_height
+        self.lookback_hours = lookback_hours
+        self.dedup_hours = dedup_hours
+
+        # If readings_per_hr isn't given, it's determined from the first
+        #   two readings, the same way get_reading_rate() does it.
+        self.readings_per_hr = readings_per_hr
+        self.max_lookback = None
+        if readings_per_hr:
+            self.max_lookback = get_max_lookback(rise_critical, m_critical,
+                    readings_per_hr, lookback_hours)
+
+        # Number of readings seen so far.
+        self.position = 0
+        # Keys are measured from the first reading, to keep them small.
+        self._origin = None
+        self._prev_timestamp = None
+        self._last_first_critical = None
+
+        # Readings that haven't entered the lookback window yet.
+        self._pending = deque()
+        # All readings in the lookback window, and the monotonic deque of
+        #   window minimums. Entries are (position, timestamp, height, key).
+        self._window = deque()
+        self._window_min = deque()
+
+
+    def update(self, reading):
+        """Process the next reading.
+        Return a DetectorResult for this reading.
+        """
+        timestamp = dt_to_timestamp(reading.dt_reading)
+        height = reading.height
+        position = self.position
+
+        if self._origin is None:
+            self._origin = timestamp
+        elif self.max_lookback is None:
+            reading_interval = (timestamp - self._prev_timestamp) // 60
+            self.readings_per_hr = int(60 / reading_interval)
+            self.max_lookback = get_max_lookback(self.rise_critical,
+                    self.m_critical, self.readings_per_hr,
+                    self.lookback_hours)
+        self._prev_timestamp = timestamp
+
+        key = height - self.m_critical * (timestamp - self._origin) / 3600
+        result = DetectorResult(False, False)
+
+        if self.max_lookback is not None:
+            self._advance_window(position)
+            if (position >= 2 * self.max_lookback
+                    and not height < self.river_min_height + self.rise_critical
+                    and self._is_critical(timestamp, height, key)):
+                is_first = (self._last_first_critical is None
+                        or (timestamp - self._last_first_critical) // 3600
+                            > self.dedup_hours)
+                if is_first:
+                    self._last_first_critical = timestamp
+                result = DetectorResult(True, is_first)
+
+        self._pending.append((position, timestamp, height, key))
+        self.position += 1
+        return result
+
+
+    def _advance_window(self, position):
+        """Move the lookback window so it covers readings
+        position - 2*max_lookback through position - max_lookback - 1.
+        """
+        while (self._pending
+                and self._pending[0][0] <= position - self.max_lookback - 1):
+            entry = self._pending.popleft()
+            self._window.append(entry)
+            while self._window_min and self._window_min[-1][3] >= entry[3]:
+                self._window_min.pop()
+            self._window_min.append(entry)
+
+        first_position = position - 2 * self.max_lookback
+        while self._window and self._window[0][0] < first_position:
+            self._window.popleft()
+        while self._window_min and self._window_min[0][0] < first_position:
+            self._window_min.popleft()
+
+
+    def _is_critical(self, timestamp, height, key):
+        """Check the current reading against the lookback window."""
+        if not self._window_min:
+            return False
+
+        min_entry = self._window_min[0]
+        if min_entry[3] >= key + self.KEY_TOLERANCE:
+            return False
+        if self._passes(timestamp, height, min_entry):
+            return True
+
+        # Rounding left this too close to call; check the whole window.
+        return any(self._passes(timestamp, height, entry)
+                        for entry in self._window)
+
+
+    def _passes(self, timestamp, height, entry):
+        """Exact rise and slope test, matching find_critical_indices()."""
+        rise = height - entry[2]
+        d_time = (timestamp - entry[1]) / 3600
+        slope = abs(rise / d_time)
+        return rise >= self.rise_critical and slope > self.m_critical
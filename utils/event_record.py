@@ -0,0 +1,56 @@
+"""Model for one event found in the gauge data.
+
+An event is a set of readings around either a first critical point, or a
+  slide that wasn't preceded by a critical point. Everything the analysis
+  learns about an event is kept with its readings, so later stages such as
+  plotting don't run detection again.
+
+Records are pickled separately from the reading dumps, so the dumps stay
+  plain lists of readings that other programs can load.
+"""
+
+import pickle
+from collections import namedtuple
+from os import listdir, path
+
+
+# readings: list or ReadingSeries of readings in the event.
+# critical_points: critical readings found in this set of readings.
+# slide: associated slide, or None.
+# notification_time: minutes from the first critical point to the slide,
+#   or None if the event isn't a notification followed by a slide.
+EventRecord = namedtuple('EventRecord',
+        ['readings', 'critical_points', 'slide', 'notification_time'])
+
+EVENT_RECORDS_DIR = 'other_output/event_records'
+
+
+def get_record_filename(record, root_output_directory=''):
+    """Return the file name for a record, based on its last reading."""
+    dt_last_reading_str = record.readings[-1].dt_reading.strftime('%m%d%Y')
+    return f"{root_output_directory}{EVENT_RECORDS_DIR}/event_record_{dt_last_reading_str}.pkl"
+
+
+def pickle_event_record(record, root_output_directory=''):
+    """Pickle a record, so plots can be made later without any analysis."""
+    # Store a plain list of readings, like the reading dumps.
+    record = record._replace(readings=list(record.readings))
+    with open(get_record_filename(record, root_output_directory), 'wb') as f:
+        pickle.dump(record, f)
+
+
+def load_event_records(root_output_directory=''):
+    """Load all pickled records, in order of file name.
+    Returns an empty list if there aren't any records.
+    """
+    records_dir = f"{root_output_directory}{EVENT_RECORDS_DIR}"
+    if not path.isdir(records_dir):
+        return []
+
+    records = []
+    for filename in sorted(listdir(records_dir)):
+        if not filename.endswith('.pkl'):
+            continue
+        with open(path.join(records_dir, filename), 'rb') as f:
+            records.append(pickle.load(f))
+    return records
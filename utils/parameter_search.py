@@ -0,0 +1,174 @@
+"""Adaptive coarse-to-fine search over pairs of critical values.
+
+A fixed grid spends most of its trials in regions where nothing changes,
+  and can step right over a sharp transition. This search starts with a
+  coarse grid, and then only refines cells where the outcome changes
+  between corners. Of those, cells with a corner on the Pareto front of
+  outcomes are refined first, so the budget goes to the front.
+
+An outcome is (true positives, false positives, false negatives). One
+  outcome dominates another if it's at least as good in all three, and
+  better in at least one: more true positives, fewer false positives, and
+  fewer false negatives.
+"""
+
+from numpy import linspace
+
+from utils.result_store import get_trial_key
+
+
+def get_outcome(results_dict):
+    """Return (tp, fp, fn) for one trial."""
+    return (results_dict['true positives'], results_dict['false positives'],
+            results_dict['false negatives'])
+
+
+def dominates(outcome_a, outcome_b):
+    """Return True if outcome_a is better than outcome_b."""
+    tp_a, fp_a, fn_a = outcome_a
+    tp_b, fp_b, fn_b = outcome_b
+    return ((tp_a >= tp_b and fp_a <= fp_b and fn_a <= fn_b)
+            and outcome_a != outcome_b)
+
+
+def get_pareto_front(all_results):
+    """Return the trials whose outcomes aren't dominated by any other trial,
+    in their original order.
+    """
+    outcomes = {get_outcome(results_dict) for results_dict in all_results}
+    front_outcomes = {outcome for outcome in outcomes
+                        if not any(dominates(other, outcome)
+                                    for other in outcomes)}
+    return [results_dict for results_dict in all_results
+                if get_outcome(results_dict) in front_outcomes]
+
+
+class EvaluationCache:
+    """Results of every pair of critical values evaluated so far.
+
+    evaluate is a function that takes a list of (rise_critical, m_critical)
+      pairs, and returns a list of results dicts in the same order. Pairs
+      are only ever passed to evaluate once.
+    """
+
+    def __init__(self, evaluate):
+        self.evaluate = evaluate
+        self.results = {}
+
+
+    def get_key(self, pair):
+        # Keys are rounded, so midpoints computed two different ways are
+        #   the same pair.
+        return get_trial_key(pair)
+
+
+    def __contains__(self, pair):
+        return self.get_key(pair) in self.results
+
+
+    def __len__(self):
+        return len(self.results)
+
+
+    def __getitem__(self, pair):
+        return self.results[self.get_key(pair)]
+
+
+    def evaluate_pairs(self, pairs):
+        """Evaluate any pairs that haven't been evaluated yet."""
+        new_pairs, new_keys = [], []
+        for pair in pairs:
+            key = self.get_key(pair)
+            if key not in self.results and key not in new_keys:
+                new_pairs.append(pair)
+                new_keys.append(key)
+        if new_pairs:
+            for key, results_dict in zip(new_keys, self.evaluate(new_pairs)):
+                self.results[key] = results_dict
+        return len(new_pairs)
+
+
+    def all_results(self):
+        """Return all results, ordered by rise_critical, then m_critical."""
+        return [self.results[pair] for pair in sorted(self.results)]
+
+
+def get_cell_corners(cell):
+    """Return the four corner pairs of a cell."""
+    r_low, r_high, m_low, m_high = cell
+    return [(r_low, m_low), (r_low, m_high), (r_high, m_low), (r_high, m_high)]
+
+
+def split_cell(cell):
+    """Split a cell into four cells.
+    Returns the new cells, and the pairs that need to be evaluated.
+    """
+    r_low, r_high, m_low, m_high = cell
+    r_mid = (r_low + r_high) / 2
+    m_mid = (m_low + m_high) / 2
+    new_cells = [(r_low, r_mid, m_low, m_mid), (r_low, r_mid, m_mid, m_high),
+                 (r_mid, r_high, m_low, m_mid), (r_mid, r_high, m_mid, m_high)]
+    new_pairs = [(r_mid, m_low), (r_mid, m_high), (r_low, m_mid),
+                 (r_high, m_mid), (r_mid, m_mid)]
+    return new_cells, new_pairs
+
+
+def adaptive_search(evaluate, rise_range, m_range, initial_steps=5,
+        budget=200, min_rise_step=0.01, min_m_step=0.005):
+    """Search for the best pairs of critical values.
+
+    rise_range and m_range are (low, high) tuples. The search starts with
+      an initial_steps x initial_steps grid, and refines cells until no
+      cell needs refining, the cells get smaller than the min steps, or
+      budget pairs have been evaluated.
+
+    Returns all evaluated results, and the Pareto front.
+    """
+    cache = EvaluationCache(evaluate)
+
+    rise_values = linspace(*rise_range, initial_steps).tolist()
+    m_values = linspace(*m_range, initial_steps).tolist()
+    cache.evaluate_pairs([(rise_critical, m_critical)
+                            for rise_critical in rise_values
+                            for m_critical in m_values])
+    cells = [(r_low, r_high, m_low, m_high)
+                for r_low, r_high in zip(rise_values, rise_values[1:])
+                for m_low, m_high in zip(m_values, m_values[1:])]
+
+    while cells and len(cache) < budget:
+        front_outcomes = {get_outcome(results_dict) for results_dict
+                            in get_pareto_front(cache.all_results())}
+
+        # Refine cells that touch the front first, then the cells with the
+        #   most varied outcomes.
+        cells_to_refine = []
+        for cell in cells:
+            r_low, r_high, m_low, m_high = cell
+            if r_high - r_low < min_rise_step or m_high - m_low < min_m_step:
+                continue
+            outcomes = {get_outcome(cache[pair])
+                            for pair in get_cell_corners(cell)}
+            on_front = bool(outcomes & front_outcomes)
+            if len(outcomes) > 1:
+                cells_to_refine.append((not on_front, -len(outcomes), cell))
+        if not cells_to_refine:
+            break
+        cells_to_refine.sort()
+
+        # Evaluate each round as one batch, so evaluate can share work
+        #   between pairs.
+        cells, round_pairs = [], {}
+        for _, _, cell in cells_to_refine:
+            new_cells, new_pairs = split_cell(cell)
+            new_pairs = {cache.get_key(pair): pair for pair in new_pairs
+                            if pair not in cache}
+            if len(cache) + len({**round_pairs, **new_pairs}) > budget:
+                break
+            round_pairs.update(new_pairs)
+            cells += new_cells
+        if not round_pairs:
+            break
+        cache.evaluate_pairs([round_pairs[key] for key in sorted(round_pairs)])
+
+    all_results = cache.all_results()
+    return all_results, get_pareto_front(all_results)
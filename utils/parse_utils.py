@@ -0,0 +1,166 @@
+"""Bulk parsers for stream gauge data files.
+
+These read a whole data file in one pass, straight into NumPy arrays, and
+  return a ReadingSeries. The line-by-line parsers in plot_heights.py are
+  now adapters over these functions, for code that wants a list of
+  IRReading objects.
+"""
+
+import datetime
+
+import numpy as np
+
+from utils.reading_series import ReadingSeries
+
+
+# Bump this whenever a parser's output changes, so archives and parse
+#   caches written by older parsers aren't used.
+PARSER_VERSION = 1
+
+# The hx format has 4 header lines, ending with a sentinel row that has
+#   no real date.
+HX_HEADER_LINES = 4
+HX_SENTINEL = '0000-00-00'
+
+
+def get_series_hx_format(data_file):
+    """Parse a file in the historical format into a ReadingSeries.
+    Date,Type Source,Stage
+    0000-00-00 00:00:00,RZ,20.97
+    2014-07-14 23:00:00,RZ,21.21
+
+    These are stored in UTC.
+    """
+    with open(data_file) as f:
+        lines = f.read().splitlines()[HX_HEADER_LINES:]
+    lines = [line for line in lines
+                if line and not line.startswith(HX_SENTINEL)]
+
+    data = np.loadtxt(lines, delimiter=',', usecols=(0, 2), ndmin=1,
+            dtype=[('dt_reading', 'datetime64[s]'), ('height', 'f8')])
+
+    return ReadingSeries(data['dt_reading'].astype(np.int64), data['height'])
+
+
+# The arch format has a commented header, ending with a line describing
+#   column widths. Data lines look like this:
+#   USGS    15087700    2016-02-09 15:45    AKST    20.86   A   54.0    A
+ARCH_HEADER_END = "5s  15s 20d 6s  14n 10s 14n 10s"
+
+# Columns kept from each line: date, time, timezone, height, discharge.
+#   Heights have always been read from the first 5 characters of the
+#   height field, so they're parsed as 5-character strings first.
+ARCH_USECOLS = (2, 3, 4, 5, 7)
+ARCH_DTYPE = [
+    ('date', 'datetime64[D]'),
+    ('time', 'U5'),
+    ('tz', 'U4'),
+    ('height', 'U5'),
+    ('discharge', 'f8'),
+]
+
+# Hours to add to local time to get UTC.
+ARCH_UTC_OFFSETS = {'AKST': 9, 'AKDT': 8}
+
+
+def get_series_arch_format(data_file, bad_lines=None):
+    """Parse a file in the USGS archival format into a ReadingSeries.
+    USGS    15087700    2016-02-09 15:45    AKST    20.86   A   54.0    A
+
+    Times are in AKST or AKDT, and are converted to UTC. The discharge
+      column is kept in the series' discharges array.
+
+    Lines that can't be parsed are skipped, and summarized at the end. Pass
+      a list as bad_lines to collect (line number, line) pairs for them.
+    """
+    with open(data_file) as f:
+        lines = f.read().splitlines()
+
+    # Skip header lines.
+    first_data_line = 0
+    for line_index, line in enumerate(lines):
+        if ARCH_HEADER_END in line:
+            first_data_line = line_index + 1
+            break
+    lines = lines[first_data_line:]
+
+    # Clean files are tokenized in one call. If anything in the file doesn't
+    #   fit the format, fall back to checking each line.
+    try:
+        data = np.loadtxt(lines, dtype=ARCH_DTYPE, usecols=ARCH_USECOLS,
+                ndmin=1, comments='#')
+        seconds_of_day = _get_arch_seconds_of_day(data['time'])
+        is_akst = data['tz'] == 'AKST'
+        if not (is_akst | (data['tz'] == 'AKDT')).all():
+            raise ValueError("Unrecognized timezone.")
+        n_bad_lines = 0
+    except ValueError:
+        data, n_bad_lines = _get_arch_data_by_line(lines,
+                first_data_line + 1, bad_lines)
+        seconds_of_day = _get_arch_seconds_of_day(data['time'])
+        is_akst = data['tz'] == 'AKST'
+
+    # Convert local times to UTC with an array of offsets.
+    offsets = np.where(is_akst, ARCH_UTC_OFFSETS['AKST'],
+            ARCH_UTC_OFFSETS['AKDT']) * 3600
+    timestamps = (data['date'].astype('datetime64[s]').astype(np.int64)
+            + seconds_of_day + offsets)
+    heights = data['height'].astype(np.float64)
+
+    if n_bad_lines:
+        print(f"  Skipped {n_bad_lines} lines that couldn't be parsed.")
+
+    return ReadingSeries(timestamps, heights, data['discharge'])
+
+
+def _get_arch_seconds_of_day(times):
+    """Convert an array of 'HH:MM' strings to seconds after midnight.
+    Raises ValueError if any time isn't in that format.
+    """
+    digits = (np.ascontiguousarray(times, dtype='U5').view(np.uint32)
+            .reshape(-1, 5).astype(np.int64) - ord('0'))
+    hh_mm = digits[:, [0, 1, 3, 4]]
+    if (((hh_mm < 0) | (hh_mm > 9)).any()
+            or (digits[:, 2] != ord(':') - ord('0')).any()):
+        raise ValueError("Times must be in HH:MM format.")
+
+    hours = hh_mm[:, 0] * 10 + hh_mm[:, 1]
+    minutes = hh_mm[:, 2] * 10 + hh_mm[:, 3]
+    return hours * 3600 + minutes * 60
+
+
+def _get_arch_data_by_line(lines, first_line_number, bad_lines=None):
+    """Parse arch-format lines one at a time, skipping bad lines.
+    Returns a structured array matching ARCH_DTYPE, and the number of lines
+    that were skipped.
+    """
+    rows = []
+    n_bad_lines = 0
+    for line_number, line in enumerate(lines, start=first_line_number):
+        if not line.strip() or line.startswith('#'):
+            continue
+
+        tokens = line.split()
+        try:
+            date, time, tz, height = tokens[2:6]
+            if tz not in ARCH_UTC_OFFSETS:
+                raise ValueError
+            datetime.datetime.strptime(f"{date} {time}", '%Y-%m-%d %H:%M')
+            _get_arch_seconds_of_day([time])
+            height = height[:5]
+            float(height)
+        except ValueError:
+            n_bad_lines += 1
+            if bad_lines is not None:
+                bad_lines.append((line_number, line))
+            continue
+
+        # A missing or non-numeric discharge doesn't invalidate the height.
+        try:
+            discharge = float(tokens[7])
+        except (IndexError, ValueError):
+            discharge = float('nan')
+
+        rows.append((date, time, tz, height, discharge))
+
+    return np.array(rows, dtype=ARCH_DTYPE), n_bad_lines
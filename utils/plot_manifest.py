@@ -0,0 +1,108 @@
+"""Manifest of plots that are already up to date.
+
+Each plot is keyed by a hash of everything that goes into it: the event's
+  readings and critical points, the slide shown on the plot, the analysis
+  parameters, and the plotting code itself. If a plot file exists and its
+  key matches the manifest, there's no need to render it again.
+
+The manifest is a json file in the plot directory, mapping each plot's
+  file name to its key.
+"""
+
+import hashlib, json, os
+
+import matplotlib
+import plotly
+
+import plot_heights as ph
+import utils.analysis_utils as a_utils
+import utils.critical_points as critical_points
+from utils.reading_series import ReadingSeries
+from slide_event import SlideCatalog
+
+
+MANIFEST_FILENAME = 'plot_manifest.json'
+
+# Changes to these files can change any plot.
+PLOT_SOURCE_FILES = [ph.__file__, a_utils.__file__,
+        critical_points.__file__]
+
+
+def get_code_version():
+    """Return a hash of the plotting code, and the plotting libraries'
+    versions.
+    """
+    code_hash = hashlib.sha256()
+    for source_file in PLOT_SOURCE_FILES:
+        with open(source_file, 'rb') as f:
+            code_hash.update(f.read())
+    code_hash.update(f"matplotlib {matplotlib.__version__}".encode())
+    code_hash.update(f"plotly {plotly.__version__}".encode())
+    return code_hash.hexdigest()
+
+
+def get_plot_filename(readings, suffix):
+    """Return the file name plot_data() or plot_data_static() uses for a
+    set of readings. suffix is 'html' or 'png'.
+    """
+    return f"ir_plot_{readings[-1].dt_reading.__str__()[:10]}.{suffix}"
+
+
+def get_plot_key(record, known_slides, config, suffix, code_version,
+        plot_options=None):
+    """Return a hash of everything that goes into one plot of an event.
+    plot_options is a dict of any options passed to the plot function.
+    """
+    plot_hash = hashlib.sha256()
+    plot_hash.update(f"{suffix} {code_version}".encode())
+    plot_hash.update(repr(tuple(config)).encode())
+    if plot_options:
+        plot_hash.update(repr(sorted(plot_options.items())).encode())
+
+    for readings in (record.readings, record.critical_points):
+        series = ReadingSeries.from_readings(readings)
+        plot_hash.update(len(series).to_bytes(8, 'little'))
+        plot_hash.update(series.timestamps.tobytes())
+        plot_hash.update(series.heights.tobytes())
+
+    # The plot functions look up the slide to show themselves.
+    if not isinstance(known_slides, SlideCatalog):
+        known_slides = SlideCatalog(known_slides)
+    slide = known_slides.first_in_range(record.readings[0].dt_reading,
+            record.readings[-1].dt_reading)
+    if slide:
+        plot_hash.update(f"{slide.name} {slide.dt_slide}".encode())
+
+    return plot_hash.hexdigest()
+
+
+class PlotManifest:
+    """Keys of the plots in plots_dir, as of the last time they were
+    rendered.
+    """
+
+    def __init__(self, plots_dir):
+        self.plots_dir = plots_dir
+        self.manifest_file = os.path.join(plots_dir, MANIFEST_FILENAME)
+        self.entries = {}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as f:
+                self.entries = json.load(f)
+
+
+    def is_current(self, filename, key):
+        """Return True if filename exists, and was rendered from key."""
+        return (self.entries.get(filename) == key
+                and os.path.exists(os.path.join(self.plots_dir, filename)))
+
+
+    def update(self, filename, key):
+        self.entries[filename] = key
+
+
+    def save(self):
+        """Write the manifest, so readers never see a partial file."""
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
@@ -1,6 +1,16 @@
 """Utilities for plotting stream gauge data.
+
+Interactive plots can share one copy of plotly.js, instead of each html
+  file including all of it. A dashboard can also show every event on one
+  page, loading each event's traces from a small json file when it's
+  selected. Browsers don't load json from local files, so serve the plot
+  directory to use the dashboard:
+$ python -m http.server --directory current_ir_plots
 """
 
+import json, os
+from pathlib import Path
+
 import pytz
 
 from plotly.graph_objs import Scatter, Layout
@@ -10,10 +20,18 @@ from plotly import offline
 aktz = pytz.timezone('US/Alaska')
 
 
+PLOTLYJS_FILENAME = 'plotly.min.js'
+DASHBOARD_FILENAME = 'dashboard.html'
+EVENTS_DIR = 'events'
+
+
 def plot_current_data_html(readings, critical_points=[], known_slides=[],
-        filename=None):
+        filename=None, include_plotlyjs=True):
     """Plot IR gauge data, with critical points in red. Known slide
     events are indicated by a vertical line at the time of the event.
+
+    Pass include_plotlyjs='directory' to load plotly.js from a shared
+      plotly.min.js file in the same directory as filename.
     """
     # DEV: This fn should receive any relevant slides, it shouldn't do any
     #   data processing.
@@ -87,5 +105,86 @@ def plot_current_data_html(readings, critical_points=[], known_slides=[],
     }
 
     fig = {'data': data, 'layout': my_layout}
-    offline.plot(fig, filename=filename)
-    print("    Plotted data.")
\ No newline at end of file
+    if include_plotlyjs == 'directory':
+        write_plotlyjs(os.path.dirname(filename) or '.')
+    offline.plot(fig, filename=filename, include_plotlyjs=include_plotlyjs)
+    print("    Plotted data.")
+
+
+def write_plotlyjs(directory):
+    """Write the plotly.js bundle to directory, for pages that share it.
+    The file is only written if it's missing or from another version of
+      plotly.
+    """
+    plotlyjs = offline.get_plotlyjs().encode()
+    plotlyjs_path = Path(directory) / PLOTLYJS_FILENAME
+    if plotlyjs_path.exists() and plotlyjs_path.read_bytes() == plotlyjs:
+        return
+    # Write to a temp file first, so a page never loads a partial bundle.
+    tmp_path = plotlyjs_path.with_name(f".{PLOTLYJS_FILENAME}.tmp")
+    tmp_path.write_bytes(plotlyjs)
+    os.replace(tmp_path, plotlyjs_path)
+
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Indian River Gauge Events</title>
+  <script src="PLOTLYJS_FILENAME"></script>
+</head>
+<body>
+  <select id="event-select"></select>
+  <div id="event-plot" style="height: 90vh;"></div>
+  <script>
+    const events = EVENTS;
+    const select = document.getElementById('event-select');
+    for (const event of events) {
+      const option = document.createElement('option');
+      option.value = event.file;
+      option.textContent = event.title;
+      select.appendChild(option);
+    }
+
+    function showEvent(file) {
+      fetch(file)
+        .then(response => response.json())
+        .then(fig => Plotly.react('event-plot', fig.data, fig.layout));
+    }
+
+    select.addEventListener('change', () => showEvent(select.value));
+    if (events.length) {
+      showEvent(events[0].file);
+    }
+  </script>
+</body>
+</html>
+"""
+
+
+def write_dashboard(figures, directory):
+    """Write one dashboard page for many plots.
+
+    figures is a dict of plotly figures, keyed by a short name for each
+      event. Each figure is written to its own compact json file, which the
+      dashboard only loads when that event is selected. The page and the
+      json files share one copy of plotly.js.
+    Returns the path to the dashboard.
+    """
+    events_dir = Path(directory) / EVENTS_DIR
+    events_dir.mkdir(parents=True, exist_ok=True)
+    write_plotlyjs(directory)
+
+    events = []
+    for name, fig in sorted(figures.items()):
+        event_file = f"{EVENTS_DIR}/{name}.json"
+        with open(Path(directory) / event_file, 'w') as f:
+            json.dump(fig, f, separators=(',', ':'))
+        events.append({'file': event_file, 'title': fig['layout']['title']})
+
+    dashboard_html = (DASHBOARD_HTML
+            .replace('PLOTLYJS_FILENAME', PLOTLYJS_FILENAME)
+            .replace('EVENTS', json.dumps(events)))
+    dashboard_path = Path(directory) / DASHBOARD_FILENAME
+    dashboard_path.write_text(dashboard_html)
+    return dashboard_path
\ No newline at end of file
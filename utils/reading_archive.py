@@ -0,0 +1,329 @@
+"""Compact binary archive of cleaned gauge readings.
+
+Parsing the text data files is a fixed cost paid on every run. The archive
+  stores the readings from any number of data files in one binary file,
+  which is memory-mapped when it's loaded, so scripts can start working
+  with readings almost immediately.
+
+File layout:
+  - 8 bytes: ARCHIVE_MAGIC
+  - 4 bytes: length of the json header, little-endian uint32
+  - json header, padded with spaces so records start on a 16-byte boundary
+  - fixed-width records: int64 timestamp (UTC seconds), float64 height
+
+The header records the parser version the readings came from, and
+  describes each segment of records: the source file it was parsed from, the source file's size and mtime when it was parsed, the
+  reading interval, and where its records are in the file. Each source file
+  has a consistent reading interval, so each one gets its own segment.
+
+A parse cache for a single data file is an archive with one segment,
+  stored in CACHE_DIR. Archives and caches from a different parser version
+  are ignored.
+
+ReadingStore uses the same records in an append-only file, for readings
+  fetched from the live gauge. Old records are never rewritten.
+"""
+
+import json, os, struct, hashlib
+from pathlib import Path
+
+import numpy as np
+
+import utils.parse_utils as parse_utils
+from utils.reading_series import ReadingSeries, as_reading_series
+
+
+ARCHIVE_MAGIC = b'IRGARCH1'
+ARCHIVE_FILE = 'other_output/ir_readings_archive.bin'
+CACHE_DIR = 'other_output/parse_cache'
+CACHE_SUFFIX = '.irgcache'
+STORE_MAGIC = b'IRGSTOR1'
+STORE_FILE = 'ir_data_other/current_data_store.bin'
+RECORD_DTYPE = np.dtype([('timestamp', '<i8'), ('height', '<f8')])
+
+# Directories that hold data files, and how to recognize each format.
+DATA_DIRS = ['ir_data_clean', 'ir_data_other']
+DATA_FILE_FORMATS = ['hx_format', 'arch_format']
+
+
+def get_source_key(data_file):
+    """Return the key used to look up a data file in an archive."""
+    return Path(os.path.normpath(data_file)).as_posix()
+
+
+def get_source_stat(data_file):
+    """Return the size and mtime of a data file, for staleness checks."""
+    stat = os.stat(data_file)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def get_content_hash(data_file):
+    """Return the sha256 hash of a data file's contents."""
+    sha = hashlib.sha256()
+    with open(data_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def source_is_unchanged(data_file, segment):
+    """Check whether data_file still matches what was archived in segment.
+
+    Size and mtime are checked first. If they differ, for example after a
+      fresh git checkout, the content hash decides.
+    """
+    if not os.path.exists(data_file) or segment.get('size') is None:
+        # Nothing to compare against, so trust the archive.
+        return True
+    stat = get_source_stat(data_file)
+    if stat['size'] != segment['size']:
+        return False
+    if stat['mtime_ns'] == segment['mtime_ns']:
+        return True
+    return get_content_hash(data_file) == segment.get('sha256')
+
+
+def get_reading_interval(series):
+    """Return the interval between the first two readings, in seconds."""
+    if len(series) < 2:
+        return None
+    return int(series.timestamps[1] - series.timestamps[0])
+
+
+def write_archive(archive_file, segments):
+    """Write an archive.
+
+    segments is a list of (data_file, series) pairs. Each series is stored
+      as its own segment.
+    """
+    header = {'version': 1, 'parser_version': parse_utils.PARSER_VERSION,
+                'record_size': RECORD_DTYPE.itemsize, 'segments': []}
+    start = 0
+    for data_file, series in segments:
+        segment = {
+            'source': get_source_key(data_file),
+            'reading_interval': get_reading_interval(series),
+            'start': start,
+            'count': len(series),
+        }
+        if os.path.exists(data_file):
+            segment.update(get_source_stat(data_file))
+            segment['sha256'] = get_content_hash(data_file)
+        header['segments'].append(segment)
+        start += len(series)
+
+    header_bytes = json.dumps(header).encode()
+    # Pad the header so the records are aligned.
+    prefix_length = len(ARCHIVE_MAGIC) + 4
+    padding = -(prefix_length + len(header_bytes)) % RECORD_DTYPE.itemsize
+    header_bytes += b' ' * padding
+
+    records = np.empty(start, dtype=RECORD_DTYPE)
+    for segment, (_, series) in zip(header['segments'], segments):
+        segment_records = records[segment['start']:
+                                  segment['start'] + segment['count']]
+        segment_records['timestamp'] = series.timestamps
+        segment_records['height'] = series.heights
+
+    # Write to a temp file and rename, so readers never see a partial file.
+    tmp_file = f"{archive_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(ARCHIVE_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(records.tobytes())
+    os.replace(tmp_file, archive_file)
+
+
+def read_archive_header(archive_file):
+    """Return the json header of an archive, and the offset of its records."""
+    with open(archive_file, 'rb') as f:
+        magic = f.read(len(ARCHIVE_MAGIC))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(f"{archive_file} is not a reading archive.")
+        header_length = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(header_length))
+
+    data_offset = len(ARCHIVE_MAGIC) + 4 + header_length
+    return header, data_offset
+
+
+def load_archive(archive_file):
+    """Memory-map an archive.
+    Returns a dict of ReadingSeries, keyed by source file.
+    """
+    header, data_offset = read_archive_header(archive_file)
+    n_records = sum(segment['count'] for segment in header['segments'])
+    if not n_records:
+        return {segment['source']: ReadingSeries([], [])
+                    for segment in header['segments']}
+
+    records = np.memmap(archive_file, dtype=RECORD_DTYPE, mode='r',
+            offset=data_offset, shape=(n_records,))
+
+    all_series = {}
+    for segment in header['segments']:
+        segment_records = records[segment['start']:
+                                  segment['start'] + segment['count']]
+        all_series[segment['source']] = ReadingSeries(
+                segment_records['timestamp'], segment_records['height'])
+    return all_series
+
+
+def get_series_from_archive(data_file, archive_file=ARCHIVE_FILE):
+    """Return the archived readings for data_file, or None if the archive
+    doesn't exist, was built by a different parser version, doesn't
+    include data_file, or data_file has changed since the archive was
+    built.
+    """
+    if not os.path.exists(archive_file):
+        return None
+
+    header, _ = read_archive_header(archive_file)
+    if header.get('parser_version') != parse_utils.PARSER_VERSION:
+        return None
+    source_key = get_source_key(data_file)
+    for segment in header['segments']:
+        if segment['source'] != source_key:
+            continue
+        if not source_is_unchanged(data_file, segment):
+            return None
+        return load_archive(archive_file)[source_key]
+
+    return None
+
+
+def get_cache_file(data_file, cache_dir=None):
+    """Return the path of the parse cache for data_file, in cache_dir.
+    cache_dir defaults to CACHE_DIR.
+
+    Data files with the same name in different directories get different
+      caches.
+    """
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    path_hash = hashlib.sha256(
+            get_source_key(os.path.abspath(data_file)).encode()).hexdigest()
+    return f"{cache_dir}/{Path(data_file).name}.{path_hash[:12]}{CACHE_SUFFIX}"
+
+
+def get_cached_series(data_file, cache_dir=None):
+    """Return cached readings for data_file, or None if there's no cache,
+    or the cache is out of date.
+    """
+    cache_file = get_cache_file(data_file, cache_dir)
+    try:
+        return get_series_from_archive(data_file, cache_file)
+    except ValueError:
+        # Not a valid cache file; it will be overwritten.
+        return None
+
+
+def cache_series(data_file, series, cache_dir=None):
+    """Store parsed readings for data_file in cache_dir.
+    Failing to write the cache isn't an error; the file just gets parsed
+    again next time.
+    """
+    cache_file = get_cache_file(data_file, cache_dir)
+    try:
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        write_archive(cache_file, [(data_file, series)])
+    except OSError as e:
+        print(f"  Couldn't write parse cache for {data_file}: {e}")
+
+
+def find_data_files(data_dirs=DATA_DIRS):
+    """Return all hx and arch format data files in data_dirs."""
+    data_files = []
+    for data_dir in data_dirs:
+        data_dir = Path(data_dir)
+        if not data_dir.exists():
+            continue
+        for path in sorted(data_dir.iterdir()):
+            if any(file_format in path.name
+                        for file_format in DATA_FILE_FORMATS):
+                data_files.append(path.as_posix())
+    return data_files
+
+
+class ReadingStore:
+    """Append-only, memory-mappable store of readings.
+
+    The file is a 16-byte header (STORE_MAGIC plus padding), followed by
+      records in chronological order. The timestamp of the last record is
+      the watermark; appending only adds readings newer than the watermark,
+      so overlapping batches of readings can be appended safely.
+    """
+
+    HEADER_SIZE = 16
+
+    def __init__(self, store_file=STORE_FILE):
+        self.store_file = store_file
+        if not os.path.exists(store_file):
+            with open(store_file, 'wb') as f:
+                f.write(STORE_MAGIC.ljust(self.HEADER_SIZE, b'\0'))
+        else:
+            with open(store_file, 'rb') as f:
+                if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                    raise ValueError(f"{store_file} is not a reading store.")
+
+
+    def __len__(self):
+        data_size = os.path.getsize(self.store_file) - self.HEADER_SIZE
+        return data_size // RECORD_DTYPE.itemsize
+
+
+    @property
+    def watermark(self):
+        """Timestamp of the most recent stored reading, or None."""
+        n_records = len(self)
+        if not n_records:
+            return None
+        with open(self.store_file, 'rb') as f:
+            f.seek(self.HEADER_SIZE + (n_records-1) * RECORD_DTYPE.itemsize)
+            record = np.frombuffer(f.read(RECORD_DTYPE.itemsize),
+                    dtype=RECORD_DTYPE)
+        return int(record['timestamp'][0])
+
+
+    def append(self, readings):
+        """Append any readings newer than the watermark.
+        Returns the number of readings appended.
+        """
+        series = as_reading_series(readings)
+        timestamps, heights = series.timestamps, series.heights
+
+        # Keep one reading per timestamp, in chronological order.
+        timestamps, unique_indices = np.unique(timestamps, return_index=True)
+        heights = heights[unique_indices]
+
+        watermark = self.watermark
+        if watermark is not None:
+            is_new = timestamps > watermark
+            timestamps, heights = timestamps[is_new], heights[is_new]
+
+        if not len(timestamps):
+            return 0
+
+        records = np.empty(len(timestamps), dtype=RECORD_DTYPE)
+        records['timestamp'] = timestamps
+        records['height'] = heights
+
+        with open(self.store_file, 'r+b') as f:
+            # Drop any partial record left by an interrupted append.
+            f.seek(self.HEADER_SIZE + len(self) * RECORD_DTYPE.itemsize)
+            f.truncate()
+            f.write(records.tobytes())
+
+        return len(records)
+
+
+    def load(self):
+        """Memory-map the store, and return all readings as a ReadingSeries."""
+        n_records = len(self)
+        if not n_records:
+            return ReadingSeries([], [])
+
+        records = np.memmap(self.store_file, dtype=RECORD_DTYPE, mode='r',
+                offset=self.HEADER_SIZE, shape=(n_records,))
+        return ReadingSeries(records['timestamp'], records['height'])
@@ -0,0 +1,228 @@
+"""Columnar storage for Indian River stream gauge readings.
+
+A ReadingSeries holds the same information as a list of IRReading
+  namedtuples, but stores it in two NumPy arrays:
+  - timestamps: int64 seconds since the epoch, in UTC.
+  - heights: float64 river heights, in feet.
+
+Some data files also include discharge, in cubic feet per second. This is
+  kept in an optional third array, with NaN for missing values.
+
+IRReading objects are only built when a caller asks for them, so existing
+  code that indexes or iterates over a list of readings keeps working.
+"""
+
+import datetime
+
+import numpy as np
+import pytz
+
+import utils.ir_reading as ir_reading
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+def dt_to_timestamp(dt):
+    """Convert an aware datetime to int seconds since the epoch."""
+    return int((dt - EPOCH).total_seconds())
+
+
+def timestamp_to_dt(timestamp):
+    """Convert seconds since the epoch to an aware UTC datetime."""
+    return EPOCH + datetime.timedelta(seconds=int(timestamp))
+
+
+class ReadingSeries:
+    """A chronological sequence of readings, backed by NumPy arrays.
+
+    Indexing with an int returns an IRReading. Slicing returns a new
+      ReadingSeries that shares memory with this one.
+    """
+
+    def __init__(self, timestamps, heights, discharges=None):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.heights = np.asarray(heights, dtype=np.float64)
+
+        if self.timestamps.shape != self.heights.shape:
+            raise ValueError("timestamps and heights must be the same length.")
+
+        self.discharges = None
+        if discharges is not None:
+            self.discharges = np.asarray(discharges, dtype=np.float64)
+            if self.discharges.shape != self.heights.shape:
+                raise ValueError("discharges must be the same length as heights.")
+
+
+    @classmethod
+    def from_readings(cls, readings):
+        """Build a ReadingSeries from a list of IRReading objects."""
+        if isinstance(readings, cls):
+            return readings
+
+        timestamps = np.fromiter(
+                (dt_to_timestamp(r.dt_reading) for r in readings),
+                dtype=np.int64, count=len(readings))
+        heights = np.fromiter((r.height for r in readings),
+                dtype=np.float64, count=len(readings))
+        return cls(timestamps, heights)
+
+
+    def to_readings(self):
+        """Return a list of IRReading objects."""
+        return [ir_reading.IRReading(timestamp_to_dt(timestamp), height)
+                    for timestamp, height in zip(self.timestamps.tolist(),
+                                                  self.heights.tolist())]
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            discharges = None
+            if self.discharges is not None:
+                discharges = self.discharges[key]
+            return ReadingSeries(self.timestamps[key], self.heights[key],
+                    discharges)
+
+        # Use tolist() so callers get plain Python ints and floats, just
+        #   like readings parsed directly from a data file.
+        timestamp = self.timestamps[key].tolist()
+        height = self.heights[key].tolist()
+        return ir_reading.IRReading(timestamp_to_dt(timestamp), height)
+
+
+    def __iter__(self):
+        for timestamp, height in zip(self.timestamps.tolist(),
+                                     self.heights.tolist()):
+            yield ir_reading.IRReading(timestamp_to_dt(timestamp), height)
+
+
+    def __repr__(self):
+        if not len(self):
+            return "ReadingSeries([])"
+        first = ir_reading.get_formatted_reading(self[0])
+        last = ir_reading.get_formatted_reading(self[-1])
+        return f"ReadingSeries({len(self)} readings, {first} to {last})"
+
+
+    def index(self, reading):
+        """Return the index of reading, like list.index().
+        Assumes timestamps are sorted.
+        """
+        timestamp = dt_to_timestamp(reading.dt_reading)
+        index = int(np.searchsorted(self.timestamps, timestamp, side='left'))
+        while (index < len(self)
+                and self.timestamps[index] == timestamp):
+            if self.heights[index] == reading.height:
+                return index
+            index += 1
+        raise ValueError(f"{reading} is not in series")
+
+
+    def between(self, dt_start, dt_end):
+        """Return the readings with dt_start <= dt_reading <= dt_end."""
+        start = np.searchsorted(self.timestamps, dt_to_timestamp(dt_start),
+                side='left')
+        end = np.searchsorted(self.timestamps, dt_to_timestamp(dt_end),
+                side='right')
+        return self[start:end]
+
+
+    @property
+    def datetimes(self):
+        """Return reading times as a datetime64[s] array, in UTC."""
+        return self.timestamps.astype('datetime64[s]')
+
+
+    @property
+    def nbytes(self):
+        """Memory used by the underlying arrays."""
+        nbytes = self.timestamps.nbytes + self.heights.nbytes
+        if self.discharges is not None:
+            nbytes += self.discharges.nbytes
+        return nbytes
+
+
+class TimeIndex:
+    """Binary search index over the reading times of a sorted list of
+    readings, or a ReadingSeries.
+
+    Queries return readings from the original sequence, so a list of
+    IRReading objects gives back the same objects.
+    """
+
+    def __init__(self, readings):
+        self.readings = readings
+        if isinstance(readings, ReadingSeries):
+            self.timestamps = readings.timestamps
+        else:
+            self.timestamps = np.fromiter(
+                    (dt_to_timestamp(r.dt_reading) for r in readings),
+                    dtype=np.int64, count=len(readings))
+
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+    def bisect_left(self, dt):
+        """Return the index of the first reading at or after dt."""
+        return int(np.searchsorted(self.timestamps, dt_to_timestamp(dt),
+                side='left'))
+
+
+    def bisect_right(self, dt):
+        """Return the index of the first reading after dt."""
+        return int(np.searchsorted(self.timestamps, dt_to_timestamp(dt),
+                side='right'))
+
+
+    def index_of(self, dt):
+        """Return the index of the reading taken at dt.
+        Raises ValueError if there's no such reading, like list.index().
+        """
+        index = self.bisect_left(dt)
+        if (index == len(self)
+                or self.timestamps[index] != dt_to_timestamp(dt)):
+            raise ValueError(f"No reading at {dt}.")
+        return index
+
+
+    def first_after(self, dt):
+        """Return the first reading after dt, or None."""
+        index = self.bisect_right(dt)
+        if index == len(self):
+            return None
+        return self.readings[index]
+
+
+    def since(self, dt):
+        """Return all readings at or after dt."""
+        return self.readings[self.bisect_left(dt):]
+
+
+    def window_around(self, dt, hours_before, hours_after):
+        """Return readings from hours_before dt, up to but not including
+        hours_after dt.
+        """
+        start = self.bisect_left(dt - datetime.timedelta(hours=hours_before))
+        end = self.bisect_left(dt + datetime.timedelta(hours=hours_after))
+        return self.readings[start:end]
+
+
+def get_reading_rate(readings):
+    """Return readings/hr, from the first two readings in a list of
+    readings or a ReadingSeries.
+    Should be 1 or 4, for hourly or 15-min readings.
+    """
+    reading_interval = (
+        (readings[1].dt_reading - readings[0].dt_reading).total_seconds() // 60)
+    return int(60 / reading_interval)
+
+
+def as_reading_series(readings):
+    """Return readings as a ReadingSeries, converting a list if needed."""
+    return ReadingSeries.from_readings(readings)
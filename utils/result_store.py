@@ -0,0 +1,158 @@
+"""Append-only store of parameter sweep results.
+
+Each trial is written as one line of json as soon as it's finished, so a
+  long sweep that crashes or is interrupted loses at most the trial that
+  was running. Trials are keyed by their parameter values, so a resumed
+  sweep can skip every trial that's already in the store.
+
+The store can be read one trial at a time, so even very large sweeps can
+  be analyzed without loading every result at once.
+"""
+
+import json, os
+
+from utils.analysis_utils import AnalysisConfig
+
+
+RESULTS_FILE = 'other_output/all_results.jsonl'
+
+# Fields that identify a trial, for each AnalysisConfig field.
+CONFIG_FIELDS = {
+    'rise_critical': 'critical rise',
+    'm_critical': 'critical slope',
+    'river_min_height': 'river min height',
+    'lookback_hours': 'lookback hours',
+    'dedup_hours': 'dedup hours',
+    'window_hours': 'window hours',
+}
+
+# Parameter values are rounded to this many decimal places in keys, so the
+#   same value computed two different ways is the same trial.
+PRECISION = 6
+
+
+def get_config(parameters):
+    """Return an AnalysisConfig for an AnalysisConfig, or a tuple of
+    leading parameter values such as (rise_critical, m_critical).
+    """
+    return AnalysisConfig(*parameters)
+
+
+def get_config_fields(config):
+    """Return the fields identifying a trial, for its results dict."""
+    return {CONFIG_FIELDS[name]: value
+                for name, value in config._asdict().items()}
+
+
+def get_trial_name(config):
+    """Return a short name for a trial: rise_critical_m_critical.
+    If any other parameter isn't at its default value, all of them are
+    added to the name.
+    """
+    name = f"{config.rise_critical}_{config.m_critical}"
+    default_config = AnalysisConfig()
+    if config[2:] != default_config[2:]:
+        name += '_' + '_'.join(str(value) for value in config[2:])
+    return name
+
+
+def get_trial_key(parameters):
+    """Return the key for a set of parameter values."""
+    return tuple(value if value is None else round(float(value), PRECISION)
+                    for value in get_config(parameters))
+
+
+def get_result_key(results_dict):
+    """Return the key for a trial's results.
+    Results written before a parameter was sweepable get its default value.
+    """
+    default_config = AnalysisConfig()
+    return get_trial_key(results_dict.get(field, getattr(default_config, name))
+                            for name, field in CONFIG_FIELDS.items())
+
+
+def iter_results(results_file=RESULTS_FILE):
+    """Yield the results of each trial in the store, in the order they
+    were written.
+
+    A partial last line, left by an interrupted write, is ignored.
+    """
+    if not os.path.exists(results_file):
+        return
+    with open(results_file) as f:
+        for line in f:
+            if not line.endswith('\n'):
+                # Partial write; this trial will be run again.
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+class ResultStore:
+    """Append-only json lines file of trial results.
+
+    Existing results are kept, unless fresh is True.
+    """
+
+    def __init__(self, results_file=RESULTS_FILE, fresh=False):
+        self.results_file = results_file
+        if fresh and os.path.exists(results_file):
+            os.remove(results_file)
+
+        # Only keys are kept in memory, not full results.
+        self.keys = {get_result_key(results_dict)
+                        for results_dict in iter_results(results_file)}
+        self._drop_partial_line()
+
+
+    def __contains__(self, parameters):
+        return get_trial_key(parameters) in self.keys
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def __iter__(self):
+        return iter_results(self.results_file)
+
+
+    def _drop_partial_line(self):
+        """Remove a partial last line, so new results start on a new line."""
+        if not os.path.exists(self.results_file):
+            return
+        with open(self.results_file, 'rb+') as f:
+            contents = f.read()
+            if contents and not contents.endswith(b'\n'):
+                f.truncate(contents.rfind(b'\n') + 1)
+
+
+    def get_pending(self, parameter_sets):
+        """Return the parameter sets that aren't in the store yet."""
+        return [parameters for parameters in parameter_sets
+                    if parameters not in self]
+
+
+    def append(self, results_dict):
+        """Write one trial's results to the store."""
+        key = get_result_key(results_dict)
+        if key in self.keys:
+            return
+        with open(self.results_file, 'a') as f:
+            f.write(json.dumps(results_dict) + '\n')
+        self.keys.add(key)
+
+
+    def get_results(self, parameter_sets):
+        """Return stored results for each of parameter_sets, in the same
+        order. Parameter sets that haven't been run are skipped.
+        """
+        wanted = {get_trial_key(parameters) for parameters in parameter_sets}
+        found = {}
+        for results_dict in self:
+            key = get_result_key(results_dict)
+            if key in wanted:
+                found[key] = results_dict
+        return [found[get_trial_key(parameters)]
+                    for parameters in parameter_sets
+                    if get_trial_key(parameters) in found]
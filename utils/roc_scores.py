@@ -0,0 +1,284 @@
+"""Continuous ROC curves from per-reading scores.
+
+Trials in a parameter sweep each run the full analysis, so an ROC curve
+  built from trials only has as many points as there are trials. Instead,
+  this module follows a threshold path where rise_critical is always
+  ratio_hours * m_critical, and the lookback is ratio_hours rounded up.
+  Along that path the lookback window never changes, so each reading gets
+  a single score: the largest m_critical at which it would be critical. A
+  reading is critical at m_critical exactly when its score is at least
+  m_critical. Scores are computed with the same floating point tests as
+  the detector, including its strict slope test, so this holds at ties.
+
+As m_critical falls, readings only ever become critical. Visiting the
+  scores from highest to lowest adds critical readings in order. After
+  each score:
+  - first critical points are updated wherever the new critical readings
+    change them, with the same dedup_hours rule as the full analysis.
+  - each first critical point is matched against slides over the same
+    window_hours reading set as the full analysis. Whether a notification
+    is a true or false positive only depends on its own reading set.
+
+So TP, FP, and FN at every point on the curve are exactly what the full
+  analysis gives for that point's critical values, with lookback_hours of
+  ratio_hours rounded up. That's the default lookback of
+  rise_critical / m_critical rounded up, unless rounding in that division
+  crosses a whole number of hours. Sorting the scores is O(n log n), and
+  updating the first critical points only revisits the readings near each
+  change.
+"""
+
+import math
+from bisect import bisect_left, insort
+
+import numpy as np
+
+import utils.threshold_grid as threshold_grid
+from utils.reading_series import as_reading_series, timestamp_to_dt
+from utils.reading_series import get_reading_rate
+from slide_event import SlideCatalog
+
+
+def get_lookback_hours(ratio_hours):
+    """Return the lookback for every threshold on a path."""
+    return math.ceil(ratio_hours)
+
+
+def to_ordered_ints(values):
+    """Map floats to int64s in the same order, one apart for adjacent
+    floats.
+    """
+    bits = values.view(np.int64)
+    return np.where(bits < 0, -(bits & np.iinfo(np.int64).max), bits)
+
+
+def from_ordered_ints(keys):
+    """Inverse of to_ordered_ints()."""
+    bits = np.where(keys < 0, (-keys) | np.iinfo(np.int64).min, keys)
+    return bits.view(np.float64)
+
+
+def get_max_passing(passes, guesses):
+    """Return the largest float that passes a test, for each entry in
+    guesses.
+
+    passes takes an array, and returns True for each entry that passes. It
+      must pass every value up to some float, and none above it. Each guess
+      must be finite, and close to that largest value.
+    """
+    low = to_ordered_ints(guesses)
+    step = np.ones_like(low)
+    failing = ~passes(from_ordered_ints(low))
+    while failing.any():
+        low[failing] -= step[failing]
+        step[failing] *= 2
+        failing = ~passes(from_ordered_ints(low))
+
+    # Now low passes. Find a value above it that fails.
+    high = low + 1
+    step = np.ones_like(low)
+    passing = passes(from_ordered_ints(high))
+    while passing.any():
+        low[passing] = high[passing]
+        high[passing] += step[passing]
+        step[passing] *= 2
+        passing = passes(from_ordered_ints(high))
+
+    while (high - low > 1).any():
+        middle = low + (high - low) // 2
+        passing = passes(from_ordered_ints(middle))
+        low = np.where(passing, middle, low)
+        high = np.where(passing, high, middle)
+    return from_ordered_ints(low)
+
+
+def get_reading_scores(series, ratio_hours, river_min_height):
+    """Return the largest m_critical at which each reading is critical,
+    with rise_critical = ratio_hours * m_critical.
+    Readings that are never examined get -inf.
+
+    A reading is critical against an earlier reading if it has risen at
+      least rise_critical, and the slope is greater than m_critical. So
+      against one earlier reading, the largest m_critical passes both
+      tests, and the reading's score is the best over its lookback window.
+    """
+    series = as_reading_series(series)
+    heights = series.heights
+    timestamps = series.timestamps
+
+    max_lookback = (get_lookback_hours(ratio_hours)
+                        * get_reading_rate(series))
+    scores = np.full(len(series), -np.inf)
+
+    for offset in range(max_lookback + 1, 2 * max_lookback + 1):
+        if offset >= len(series):
+            break
+        rise = heights[offset:] - heights[:-offset]
+        d_time = (timestamps[offset:] - timestamps[:-offset]) / 3600
+        slope = np.abs(rise / d_time)
+        rise_scores = get_max_passing(
+                lambda m_critical: rise >= ratio_hours * m_critical,
+                rise / ratio_hours)
+        # The largest m_critical below the slope.
+        slope_scores = np.nextafter(slope, -np.inf)
+        np.maximum(scores[offset:], np.minimum(rise_scores, slope_scores),
+                out=scores[offset:])
+
+    # Readings this early aren't examined at all.
+    scores[:2*max_lookback] = -np.inf
+
+    # A reading must also be at least river_min_height + rise_critical.
+    height_scores = get_max_passing(
+            lambda m_critical: ~(heights
+                < river_min_height + ratio_hours * m_critical),
+            (heights - river_min_height) / ratio_hours)
+    return np.minimum(scores, height_scores)
+
+
+def add_critical_indices(critical_indices, first_indices, new_indices,
+        next_first_bounds):
+    """Add new_indices to critical_indices, and update first_indices to
+    match. Both are sorted lists, and first_indices are chosen from
+    critical_indices the same way select_first_critical_indices() does.
+
+    next_first_bounds has the lowest index that can be the next first
+      critical point after each index.
+    Returns the indices removed from first_indices, and the indices added.
+    """
+    for index in new_indices:
+        insort(critical_indices, index)
+
+    removed, added = [], []
+    for index in sorted(new_indices):
+        position = bisect_left(first_indices, index)
+        if (position < len(first_indices)
+                and first_indices[position] == index):
+            continue
+
+        # Follow first critical points on from the one before index, until
+        #   they rejoin the first critical points from before.
+        bound = next_first_bounds[first_indices[position-1]] if position else 0
+        critical_position = bisect_left(critical_indices, bound)
+        end = position
+        new_first_indices = []
+        while critical_position < len(critical_indices):
+            first_index = critical_indices[critical_position]
+            while end < len(first_indices) and first_indices[end] < first_index:
+                end += 1
+            if end < len(first_indices) and first_indices[end] == first_index:
+                break
+            new_first_indices.append(first_index)
+            critical_position = bisect_left(critical_indices,
+                    next_first_bounds[first_index], critical_position)
+        else:
+            # They never rejoined, so every later one is replaced.
+            end = len(first_indices)
+
+        removed += first_indices[position:end]
+        added += new_first_indices
+        first_indices[position:end] = new_first_indices
+
+    return removed, added
+
+
+def get_roc_curve(all_readings, known_slides, ratio_hours, river_min_height,
+        min_m_critical=0.1, dedup_hours=12, window_hours=24):
+    """Return TP, FP, and FN at every threshold along the path
+    rise_critical = ratio_hours * m_critical, for m_critical of at least
+    min_m_critical.
+
+    Returns a list of dicts, one for each threshold where the outcome
+      changes, in order of decreasing m_critical. Each outcome holds from
+      its critical slope down to just above the next point's.
+    """
+    if not isinstance(known_slides, SlideCatalog):
+        known_slides = SlideCatalog(known_slides)
+    all_series = [as_reading_series(readings) for readings in all_readings]
+
+    # A critical point starts a new event once its timestamp is at least
+    #   this far past the last first critical point.
+    dedup_seconds = (math.floor(dedup_hours) + 1) * 3600
+
+    file_states, all_scores, score_files, score_indices = [], [], [], []
+    for file_index, series in enumerate(all_series):
+        scores = get_reading_scores(series, ratio_hours, river_min_height)
+        candidates = np.flatnonzero(scores >= min_m_critical)
+
+        # Each candidate's notification would be matched with this slide.
+        _, windows = threshold_grid.get_notification_windows(series,
+                candidates, get_reading_rate(series), window_hours)
+        file_states.append({
+            'critical indices': [],
+            'first indices': [],
+            'next first bounds': np.searchsorted(series.timestamps,
+                    series.timestamps + dedup_seconds).tolist(),
+            'slides': dict(zip(candidates.tolist(),
+                    known_slides.associate(windows))),
+        })
+        all_scores.append(scores[candidates])
+        score_files.append(np.full(len(candidates), file_index))
+        score_indices.append(candidates)
+
+    # Any slide between the earliest and latest readings that isn't
+    #   detected is a false negative.
+    earliest = min(series.timestamps[0] for series in all_series)
+    latest = max(series.timestamps[-1] for series in all_series)
+    n_slides = len(known_slides.in_range(timestamp_to_dt(earliest),
+            timestamp_to_dt(latest)))
+
+    # Sort all scores once, from the highest threshold down.
+    all_scores = np.concatenate(all_scores)
+    score_files = np.concatenate(score_files).tolist()
+    score_indices = np.concatenate(score_indices).tolist()
+    order = np.argsort(-all_scores, kind='stable').tolist()
+    all_scores = all_scores.tolist()
+
+    roc_curve = []
+    tp, fp = 0, 0
+    slide_counts = {}
+    group_start = 0
+    while group_start < len(order):
+        # Every reading with this score becomes critical at once.
+        score = all_scores[order[group_start]]
+        group_end = group_start
+        new_indices = [[] for _ in all_series]
+        while (group_end < len(order)
+                and all_scores[order[group_end]] == score):
+            score_index = order[group_end]
+            new_indices[score_files[score_index]].append(
+                    score_indices[score_index])
+            group_end += 1
+        group_start = group_end
+
+        for file_state, file_new_indices in zip(file_states, new_indices):
+            if not file_new_indices:
+                continue
+            removed, added = add_critical_indices(
+                    file_state['critical indices'],
+                    file_state['first indices'], file_new_indices,
+                    file_state['next first bounds'])
+            for index, change in ([(index, -1) for index in removed]
+                                    + [(index, 1) for index in added]):
+                slide = file_state['slides'][index]
+                if slide:
+                    tp += change
+                    slide_counts[slide] = slide_counts.get(slide, 0) + change
+                else:
+                    fp += change
+
+        fn = n_slides - sum(1 for count in slide_counts.values() if count)
+        if roc_curve and (roc_curve[-1]['true positives'],
+                roc_curve[-1]['false positives'],
+                roc_curve[-1]['false negatives']) == (tp, fp, fn):
+            # Same outcome; the last point now holds down to this score.
+            continue
+        roc_curve.append({
+            'critical slope': score,
+            'critical rise': score * ratio_hours,
+            'lookback hours': get_lookback_hours(ratio_hours),
+            'true positives': tp,
+            'false positives': fp,
+            'false negatives': fn,
+        })
+
+    return roc_curve
@@ -1,17 +1,30 @@
 """Module for tracking stats in historical analysis."""
 
-# Track overall stats.
-#   How many notifications followed by slides?
-#   How many notifications not followed by slides?
-#   How many slides were not missed?
-stats = {
-    "notifications_issued": 0,
-    "associated_notifications": 0,
-    "unassociated_notifications": 0,
-    "unassociated_notification_points": [],
-    "relevant_slides": [],
-    "unassociated_slides": [],
-    "notification_times": {},
-    "earliest_reading": None,
-    "latest_reading": None,
-}
\ No newline at end of file
+
+class AnalysisStats(dict):
+    """Stats for one run of the analysis.
+
+    Each run should use its own AnalysisStats, so separate analyses can
+      run in the same process without mixing their results.
+    """
+
+    def __init__(self):
+        # Track overall stats.
+        #   How many notifications followed by slides?
+        #   How many notifications not followed by slides?
+        #   How many slides were not missed?
+        super().__init__(
+            notifications_issued=0,
+            associated_notifications=0,
+            unassociated_notifications=0,
+            unassociated_notification_points=[],
+            relevant_slides=[],
+            unassociated_slides=[],
+            notification_times={},
+            earliest_reading=None,
+            latest_reading=None,
+        )
+
+
+# Default stats, for scripts that only run one analysis.
+stats = AnalysisStats()
@@ -0,0 +1,241 @@
+"""Synthetic river height data, for testing at scale.
+
+The data files in the repo cover a few years of hourly and 15-min readings.
+  This module generates realistic hydrographs of any length and interval,
+  so the detector and the whole pipeline can be run against decades of
+  1-min data.
+
+A hydrograph is a baseline with a small seasonal swing, plus storms. Each
+  storm rises linearly at its rise rate until it has risen by its
+  magnitude, and then recedes exponentially. Noise is added to every
+  reading, and heights are rounded to 0.01 ft like gauge data. Gaps can be
+  cut out of the series, to mimic gauge outages.
+
+Slides are generated to match: some storms that rise far enough have a
+  slide near their peak, and a few slides happen with no storm at all.
+
+The series can be written in the hx and arch text formats, or turned into
+  a list of IRReading objects with to_readings(). Slides are written in
+  the format SlideEvent.load_slides() reads, so generated data can be
+  used anywhere real data is used.
+"""
+
+import json
+from collections import namedtuple
+
+import numpy as np
+import pytz
+
+from slide_event import SlideEvent
+import utils.parse_utils as parse_utils
+from utils.reading_series import ReadingSeries, dt_to_timestamp
+from utils.reading_series import timestamp_to_dt
+
+
+aktz = pytz.timezone('US/Alaska')
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+HydrographConfig = namedtuple('HydrographConfig',
+        ['interval_minutes', 'base_height', 'seasonal_amplitude', 'noise',
+         'storms_per_year', 'rise_range', 'rise_rate_range',
+         'recession_hours', 'gaps_per_year', 'gap_hours_range',
+         'slide_probability', 'slide_min_rise',
+         'unassociated_slides_per_year'],
+        defaults=[
+            15,             # interval_minutes
+            21.0,           # base_height, ft
+            0.3,            # seasonal_amplitude, ft
+            0.01,           # noise, standard deviation in ft
+            20,             # storms_per_year
+            (0.5, 4.5),     # rise_range, ft
+            (0.1, 1.0),     # rise_rate_range, ft/hr
+            12,             # recession_hours
+            0,              # gaps_per_year
+            (1, 48),        # gap_hours_range
+            0.3,            # slide_probability, for storms over slide_min_rise
+            2.5,            # slide_min_rise, ft
+            0.2,            # unassociated_slides_per_year
+        ])
+
+# One storm in a synthetic hydrograph. Times are seconds since the epoch.
+Storm = namedtuple('Storm', ['start', 'peak', 'rise', 'rise_rate'])
+
+
+def get_discharges(heights):
+    """Approximate discharge in cfs from height, with a power-law fit to
+    the gauge's rating curve.
+    """
+    return np.round(110 * np.maximum(heights - 20.2, 0) ** 1.95)
+
+
+def generate_series(dt_start, days, config=None, seed=None):
+    """Generate days of synthetic readings, starting at dt_start.
+    Returns a ReadingSeries, and a list of the storms in it.
+
+    Pass the same seed to generate the same data again.
+    """
+    if config is None:
+        config = HydrographConfig()
+    rng = np.random.default_rng(seed)
+
+    interval = config.interval_minutes * 60
+    start = dt_to_timestamp(dt_start) // interval * interval
+    n_readings = int(days * 24 * 3600 // interval)
+    timestamps = start + np.arange(n_readings, dtype=np.int64) * interval
+    end = start + n_readings * interval
+    years = (end - start) / SECONDS_PER_YEAR
+
+    # Baseline, with higher water in the fall.
+    phase = 2 * np.pi * (timestamps - start) / SECONDS_PER_YEAR
+    heights = config.base_height + config.seasonal_amplitude * np.sin(phase)
+
+    # Add each storm over the readings it affects.
+    n_storms = rng.poisson(config.storms_per_year * years)
+    storm_starts = np.sort(rng.uniform(start, end, n_storms)).astype(np.int64)
+    rises = rng.uniform(*config.rise_range, n_storms)
+    rise_rates = rng.uniform(*config.rise_rate_range, n_storms)
+    recession = config.recession_hours * 3600
+
+    storms = []
+    for storm_start, rise, rise_rate in zip(storm_starts.tolist(),
+            rises.tolist(), rise_rates.tolist()):
+        peak = storm_start + int(rise / rise_rate * 3600)
+        storms.append(Storm(storm_start, peak, rise, rise_rate))
+
+        # After 8 time constants, the storm is less than 0.001 of its rise.
+        first, last = np.searchsorted(timestamps,
+                [storm_start, peak + 8 * recession])
+        storm_timestamps = timestamps[first:last]
+        heights[first:last] += np.where(storm_timestamps <= peak,
+                rise_rate * (storm_timestamps - storm_start) / 3600,
+                rise * np.exp(-(storm_timestamps - peak) / recession))
+
+    heights += rng.normal(0, config.noise, n_readings)
+    heights = np.round(heights, 2)
+
+    # Cut out gaps.
+    keep = np.ones(n_readings, dtype=bool)
+    n_gaps = rng.poisson(config.gaps_per_year * years)
+    gap_starts = rng.uniform(start, end, n_gaps)
+    gap_lengths = rng.uniform(*config.gap_hours_range, n_gaps) * 3600
+    for gap_start, gap_length in zip(gap_starts, gap_lengths):
+        first, last = np.searchsorted(timestamps,
+                [gap_start, gap_start + gap_length])
+        keep[first:last] = False
+
+    series = ReadingSeries(timestamps[keep], heights[keep],
+            get_discharges(heights[keep]))
+    return series, storms
+
+
+def generate_slides(storms, series, config=None, seed=None):
+    """Generate slides to go with a synthetic series.
+
+    Storms that rise at least slide_min_rise have a slide with probability
+      slide_probability, between halfway up the rise and 6 hours after the
+      peak. Slides with no storm are spread at random over the series.
+    Returns a list of SlideEvent objects, in chronological order.
+    """
+    if config is None:
+        config = HydrographConfig()
+    rng = np.random.default_rng(seed)
+
+    slide_times = []
+    for storm in storms:
+        if storm.rise < config.slide_min_rise:
+            continue
+        if rng.random() >= config.slide_probability:
+            continue
+        earliest = (storm.start + storm.peak) / 2
+        slide_times.append(rng.uniform(earliest, storm.peak + 6 * 3600))
+
+    start, end = series.timestamps[0], series.timestamps[-1]
+    n_unassociated = rng.poisson(config.unassociated_slides_per_year
+                                    * (end - start) / SECONDS_PER_YEAR)
+    slide_times += rng.uniform(start, end, n_unassociated).tolist()
+
+    slides = []
+    for slide_num, slide_time in enumerate(sorted(slide_times), start=1):
+        # Slide times are only known to the minute.
+        slide = SlideEvent(timestamp_to_dt(int(slide_time) // 60 * 60))
+        slide.name = f"Synthetic Slide {slide_num}"
+        slide.desc_location = 'Synthetic data'
+        slide.fatalities = 0
+        slides.append(slide)
+    return slides
+
+
+def write_slides_file(slides, filename):
+    """Write slides in the known_slides.json format."""
+    slides_dicts = []
+    for slide in slides:
+        slide_dict = dict(slide.__dict__)
+        slide_dict['dt_slide'] = str(slide.dt_slide)
+        slides_dicts.append(slide_dict)
+
+    with open(filename, 'w') as f:
+        json.dump(slides_dicts, f, indent=2)
+
+
+def _get_date_strings(timestamps):
+    """Return 'YYYY-MM-DD' and 'HH:MM:SS' strings for each timestamp."""
+    datetimes = np.datetime_as_string(timestamps.astype('datetime64[s]'))
+    return ([dt_str[:10] for dt_str in datetimes.tolist()],
+            [dt_str[11:] for dt_str in datetimes.tolist()])
+
+
+def write_hx_file(series, filename, chunk_size=1_000_000):
+    """Write a series in the hx format. Times are in UTC."""
+    with open(filename, 'w') as f:
+        f.write("Synthetic data, generated for testing.\n")
+        f.write("Indian River at Sitka (IRVA2)\n")
+        f.write("Date,Type Source,Stage\n")
+        f.write(f"0000-00-00 00:00:00,RZ,{series.heights[0]:.2f}\n")
+
+        for first in range(0, len(series), chunk_size):
+            chunk = series[first:first + chunk_size]
+            dates, times = _get_date_strings(chunk.timestamps)
+            f.writelines(f"{date} {time},RZ,{height:.2f}\n"
+                    for date, time, height in zip(dates, times,
+                                                  chunk.heights.tolist()))
+
+
+def get_local_offsets(timestamps):
+    """Return the offset from UTC to Alaska local time for each timestamp,
+    in seconds, and whether each one is in AKDT.
+    """
+    # DST changes on the hour, so it's enough to convert each hour once.
+    hours, hour_indices = np.unique(timestamps // 3600, return_inverse=True)
+    hour_offsets = np.array([
+            timestamp_to_dt(hour * 3600).astimezone(aktz).utcoffset()
+                .total_seconds()
+            for hour in hours.tolist()], dtype=np.int64)
+    offsets = hour_offsets[hour_indices]
+    return offsets, offsets == -8 * 3600
+
+
+def write_arch_file(series, filename, chunk_size=1_000_000):
+    """Write a series in the USGS arch format. Times are in AKST or AKDT,
+    so times repeat when DST ends, as they do in real files.
+    """
+    with open(filename, 'w') as f:
+        f.write("# Synthetic data, generated for testing.\n")
+        f.write("#\n")
+        f.write("agency_cd   site_no datetime    tz_cd   1343_00065  1343_00065_cd   1344_00060  1344_00060_cd\n")
+        f.write(f"{parse_utils.ARCH_HEADER_END}\n")
+
+        discharges = series.discharges
+        if discharges is None:
+            discharges = get_discharges(series.heights)
+
+        for first in range(0, len(series), chunk_size):
+            chunk = series[first:first + chunk_size]
+            offsets, is_akdt = get_local_offsets(chunk.timestamps)
+            dates, times = _get_date_strings(chunk.timestamps + offsets)
+            tz_names = np.where(is_akdt, 'AKDT', 'AKST').tolist()
+            f.writelines(
+                f"USGS    15087700    {date} {time[:5]}    {tz_name}    {height:.2f}   A   {discharge:.0f} A\n"
+                for date, time, tz_name, height, discharge in zip(dates,
+                        times, tz_names, chunk.heights.tolist(),
+                        discharges[first:first + chunk_size].tolist()))
@@ -0,0 +1,282 @@
+"""Evaluate a whole grid of critical values in one pass.
+
+A reading is critical when there's a reading in its lookback window that
+  it has risen at least rise_critical from, at a slope greater than
+  m_critical. So for a given m_critical and lookback window, the only thing
+  that matters about a reading is the largest rise over any earlier reading
+  in the window that passes the slope test. That is computed once per
+  (m_critical, lookback) group, and every rise_critical in the group is then
+  tested at once by broadcasting.
+
+The other parameters in an AnalysisConfig are applied in later stages:
+  river_min_height along with rise_critical, then dedup_hours, then
+  window_hours. Intermediate results from each stage are cached, and shared
+  by every config that only differs in later stages.
+
+The results match running the full analysis once per config, as
+  vary_parameters.analyze_all_data() does.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+import utils.critical_points as critical_points
+import utils.result_store as result_store
+from utils.analysis_utils import AnalysisConfig
+from utils.reading_series import as_reading_series, timestamp_to_dt
+from utils.reading_series import get_reading_rate
+from slide_event import SlideCatalog
+
+
+def get_max_qualifying_rises(series, m_critical, max_lookbacks):
+    """For each reading, find the largest rise over any reading in its
+    lookback window, counting only rises with a slope greater than
+    m_critical.
+
+    Returns a dict of arrays, keyed by max_lookback. Readings without a
+      qualifying rise get -inf.
+
+    The window for max_lookback L covers offsets L+1 through 2L, matching
+      find_critical_indices(). Windows for different lookbacks overlap, so
+      the rise at each offset is computed once, and shared by every window
+      that includes it.
+    """
+    heights = series.heights
+    timestamps = series.timestamps
+
+    max_rises = {max_lookback: np.full(len(series), -np.inf)
+                    for max_lookback in max_lookbacks}
+    offsets = sorted({offset for max_lookback in max_lookbacks
+                        for offset in range(max_lookback+1, 2*max_lookback+1)})
+
+    for offset in offsets:
+        if offset >= len(series):
+            break
+        rise = heights[offset:] - heights[:-offset]
+        # Time difference in hours.
+        d_time = (timestamps[offset:] - timestamps[:-offset]) / 3600
+        slope = np.abs(rise / d_time)
+        qualifying_rise = np.where(slope > m_critical, rise, -np.inf)
+
+        for max_lookback in max_lookbacks:
+            if max_lookback < offset <= 2 * max_lookback:
+                np.maximum(max_rises[max_lookback][offset:], qualifying_rise,
+                        out=max_rises[max_lookback][offset:])
+
+    for max_lookback, max_rise in max_rises.items():
+        # Readings this early aren't examined at all.
+        max_rise[:2*max_lookback] = -np.inf
+
+    return max_rises
+
+
+def find_critical_indices_grid(series, rise_criticals, river_min_heights,
+        max_rise):
+    """Return a list with an array of critical indices for each pair of
+    values in rise_criticals and river_min_heights. All pairs share the
+    lookback window used to compute max_rise.
+    """
+    rise_criticals = np.asarray(rise_criticals, dtype=np.float64)
+    min_heights = rise_criticals + np.asarray(river_min_heights,
+            dtype=np.float64)
+
+    # Only readings that are critical for the smallest rise and lowest
+    #   minimum height can be critical for any pair in the group.
+    candidates = np.flatnonzero((max_rise >= rise_criticals.min())
+            & ~(series.heights < min_heights.min()))
+
+    # One row per pair, one column per candidate reading.
+    is_critical = ((max_rise[candidates] >= rise_criticals[:, np.newaxis])
+            & ~(series.heights[candidates] < min_heights[:, np.newaxis]))
+
+    return [candidates[row] for row in is_critical]
+
+
+def get_reading_set_range(fcp_index, n_readings, readings_per_hr,
+        window_hours=24):
+    """Return the start and end index of the reading set around a first
+    critical point, with the same slicing as get_48hr_readings().
+    """
+    window = window_hours * readings_per_hr
+    indices = range(n_readings)[fcp_index - window:fcp_index + window]
+    return indices.start, indices.stop
+
+
+class StageCache:
+    """Intermediate results for each stage of the analysis, shared between
+    configs that only differ in later stages.
+
+    - max rises depend on the data file, m_critical, and the lookback.
+    - critical indices also depend on rise_critical and river_min_height.
+    - first critical indices also depend on dedup_hours.
+    - window_hours only affects association with slides, which is cheap.
+
+    Reuse one StageCache for repeated calls to evaluate_grid() with the
+      same all_readings, such as in an adaptive search.
+    """
+
+    def __init__(self):
+        self.max_rises = {}
+        self.critical_indices = {}
+        self.first_critical_indices = {}
+
+
+def evaluate_grid(all_readings, known_slides, parameter_sets,
+        river_min_height=None, cache=None):
+    """Evaluate every set of parameters in parameter_sets.
+
+    Each parameter set is an AnalysisConfig, or a (rise_critical, m_critical)
+      pair. Pairs use river_min_height if it's given, and the default values
+      for everything else.
+
+    all_readings is a list of readings, one for each data file.
+    Returns a list of results dicts, in the same order as parameter_sets.
+    """
+    if not isinstance(known_slides, SlideCatalog):
+        known_slides = SlideCatalog(known_slides)
+    if cache is None:
+        cache = StageCache()
+    all_series = [as_reading_series(readings) for readings in all_readings]
+
+    configs = [result_store.get_config(parameters)
+                    for parameters in parameter_sets]
+    if river_min_height is not None:
+        configs = [config._replace(river_min_height=river_min_height)
+                        if not isinstance(parameters, AnalysisConfig)
+                        else config
+                    for config, parameters in zip(configs, parameter_sets)]
+
+    # Everything that's tracked for each config, across all data files.
+    trial_stats = [{'associated_notifications': 0,
+                    'unassociated_notifications': 0,
+                    'relevant_slides': [],
+                    'notification_times': {}}
+                        for _ in configs]
+
+    for file_index, series in enumerate(all_series):
+        readings_per_hr = get_reading_rate(series)
+
+        # Group configs by m_critical, then by lookback.
+        groups = defaultdict(lambda: defaultdict(list))
+        for config_index, config in enumerate(configs):
+            max_lookback = critical_points.get_max_lookback(
+                    config.rise_critical, config.m_critical, readings_per_hr,
+                    config.lookback_hours)
+            groups[config.m_critical][max_lookback].append(config_index)
+
+        for m_critical, lookback_groups in groups.items():
+            # Stage 1: max qualifying rises, for every new lookback at once.
+            new_lookbacks = [max_lookback for max_lookback in lookback_groups
+                    if (file_index, m_critical, max_lookback)
+                        not in cache.max_rises]
+            if new_lookbacks:
+                max_rises = get_max_qualifying_rises(series, m_critical,
+                        new_lookbacks)
+                for max_lookback, max_rise in max_rises.items():
+                    cache.max_rises[(file_index, m_critical, max_lookback)] = (
+                            max_rise)
+
+            for max_lookback, config_indices in lookback_groups.items():
+                stage_key = (file_index, m_critical, max_lookback)
+
+                # Stage 2: critical indices, for every new pair of
+                #   rise_critical and river_min_height at once.
+                new_pairs = []
+                for config_index in config_indices:
+                    config = configs[config_index]
+                    pair = (config.rise_critical, config.river_min_height)
+                    if (stage_key + pair not in cache.critical_indices
+                            and pair not in new_pairs):
+                        new_pairs.append(pair)
+                if new_pairs:
+                    all_critical_indices = find_critical_indices_grid(series,
+                            [pair[0] for pair in new_pairs],
+                            [pair[1] for pair in new_pairs],
+                            cache.max_rises[stage_key])
+                    for pair, critical_indices in zip(new_pairs,
+                            all_critical_indices):
+                        cache.critical_indices[stage_key + pair] = (
+                                critical_indices)
+
+                # Stage 3: first critical indices, then association.
+                for config_index in config_indices:
+                    config = configs[config_index]
+                    critical_key = stage_key + (config.rise_critical,
+                            config.river_min_height)
+                    first_key = critical_key + (config.dedup_hours,)
+                    critical_indices = cache.critical_indices[critical_key]
+                    if first_key not in cache.first_critical_indices:
+                        cache.first_critical_indices[first_key] = (
+                            critical_points.select_first_critical_indices(
+                                critical_indices, series.timestamps,
+                                config.dedup_hours))
+
+                    record_trial(series, critical_indices,
+                            cache.first_critical_indices[first_key],
+                            max_lookback, readings_per_hr,
+                            config.window_hours, known_slides,
+                            trial_stats[config_index])
+
+    # Slides outside the range of all readings can't be found.
+    earliest = min(series.timestamps[0] for series in all_series)
+    latest = max(series.timestamps[-1] for series in all_series)
+    slides_in_range = {slide for slide in known_slides.in_range(
+            timestamp_to_dt(earliest), timestamp_to_dt(latest))}
+
+    all_results = []
+    for config, stats in zip(configs, trial_stats):
+        unassociated_slides = slides_in_range - set(stats['relevant_slides'])
+        results_dict = {'name': result_store.get_trial_name(config)}
+        results_dict.update(result_store.get_config_fields(config))
+        results_dict.update({
+            'true positives': stats['associated_notifications'],
+            'false positives': stats['unassociated_notifications'],
+            'false negatives': len(unassociated_slides),
+            'notification times': list(stats['notification_times'].values()),
+        })
+        all_results.append(results_dict)
+
+    return all_results
+
+
+def get_notification_windows(series, first_critical_indices,
+        readings_per_hr, window_hours=24):
+    """Return the range of the reading set around each first critical
+    point, and the (dt_start, dt_end) window that's matched against slides.
+    """
+    set_ranges = [get_reading_set_range(fcp_index, len(series),
+                        readings_per_hr, window_hours)
+                    for fcp_index in first_critical_indices.tolist()]
+    windows = [(timestamp_to_dt(series.timestamps[start]),
+                timestamp_to_dt(series.timestamps[end-1]))
+                    for start, end in set_ranges]
+    return set_ranges, windows
+
+
+def record_trial(series, critical_indices, first_critical_indices,
+        max_lookback, readings_per_hr, window_hours, known_slides, stats):
+    """Associate the notifications for one config with slides, and update
+    stats for that config.
+    """
+    set_ranges, windows = get_notification_windows(series,
+            first_critical_indices, readings_per_hr, window_hours)
+    relevant_slides = known_slides.associate(windows)
+
+    for (start, end), relevant_slide in zip(set_ranges, relevant_slides):
+        if not relevant_slide:
+            stats['unassociated_notifications'] += 1
+            continue
+
+        # The first critical point within the reading set. Within the set,
+        #   only readings at least 2*max_lookback in can be critical.
+        first_index = critical_indices[np.searchsorted(critical_indices,
+                start + 2*max_lookback)]
+        assert(first_index < end)
+        dt_first_critical = timestamp_to_dt(series.timestamps[first_index])
+        notification_time = relevant_slide.dt_slide - dt_first_critical
+
+        stats['relevant_slides'].append(relevant_slide)
+        stats['associated_notifications'] += 1
+        stats['notification_times'][relevant_slide] = int(
+                notification_time.total_seconds() / 60)
@@ -0,0 +1,198 @@
+"""File-backed work queue, for running sweeps across several machines.
+
+A coordinator writes one json file per trial into a shared directory. Any
+  number of workers, on any host that can see the directory, claim trials,
+  run them, and write results back. Nothing else is shared between workers.
+
+Layout of the queue directory:
+  - specs/<trial_id>.json: every trial ever submitted. A trial id always
+    refers to the same spec, so a queue directory can be reused.
+  - pending/<trial_id>.json: trials waiting for a worker.
+  - claimed/<trial_id>.json: trials a worker is running. The file's mtime
+    is the worker's heartbeat.
+  - done/<trial_id>.json: results of finished trials.
+
+A worker claims a trial by renaming it from pending/ to claimed/. Renames
+  are atomic within one filesystem, so if two workers try to claim the same
+  trial, exactly one of them succeeds. A claim that hasn't had a heartbeat
+  for stale_seconds is assumed to belong to a worker that died, and is moved
+  back to pending/ so another worker can run it.
+"""
+
+import json, os, socket, time, threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+SPECS_DIR = 'specs'
+PENDING_DIR = 'pending'
+CLAIMED_DIR = 'claimed'
+DONE_DIR = 'done'
+
+
+def get_worker_id():
+    """Return an id that's unique to this process, across hosts."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def write_json_atomic(path, data):
+    """Write json to path, so readers never see a partial file."""
+    tmp_path = path.with_name(f".{path.name}.{get_worker_id()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class WorkQueue:
+    """A queue of trials, stored in queue_dir."""
+
+    def __init__(self, queue_dir):
+        self.queue_dir = Path(queue_dir)
+        self.specs_dir = self.queue_dir / SPECS_DIR
+        self.pending_dir = self.queue_dir / PENDING_DIR
+        self.claimed_dir = self.queue_dir / CLAIMED_DIR
+        self.done_dir = self.queue_dir / DONE_DIR
+        for directory in (self.specs_dir, self.pending_dir, self.claimed_dir,
+                self.done_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+
+    def get_trial_ids(self, directory):
+        return sorted(path.stem for path in directory.glob('*.json'))
+
+
+    def submit(self, trials):
+        """Add trials to the queue. trials is a list of (trial_id, spec)
+        pairs, where each trial_id is a string that can be used as a file
+        name, and each spec is json-serializable. Trials are run, and their
+        results collected, in order of trial_id.
+
+        Trials that are already in the queue, in any state, aren't added
+        again, so a coordinator can be restarted with the same trials.
+        Raises ValueError if a trial_id was already submitted with a
+          different spec.
+        Returns the number of trials added.
+        """
+        existing = set()
+        for directory in (self.pending_dir, self.claimed_dir, self.done_dir):
+            existing.update(self.get_trial_ids(directory))
+
+        n_added = 0
+        for trial_id, trial in trials:
+            spec_path = self.specs_dir / f"{trial_id}.json"
+            if spec_path.exists():
+                with open(spec_path) as f:
+                    if json.load(f) != trial:
+                        raise ValueError(
+                            f"Trial {trial_id} was already submitted to {self.queue_dir} with a different spec.")
+            else:
+                write_json_atomic(spec_path, trial)
+            if trial_id in existing:
+                continue
+            write_json_atomic(self.pending_dir / f"{trial_id}.json", trial)
+            n_added += 1
+        return n_added
+
+
+    def claim(self):
+        """Claim the next pending trial.
+        Returns (trial_id, trial), or None if there's nothing to claim.
+        """
+        for trial_id in self.get_trial_ids(self.pending_dir):
+            claimed_path = self.claimed_dir / f"{trial_id}.json"
+            try:
+                os.rename(self.pending_dir / f"{trial_id}.json", claimed_path)
+            except FileNotFoundError:
+                # Another worker claimed this trial first.
+                continue
+            # Start the heartbeat from the time of the claim.
+            os.utime(claimed_path)
+            with open(claimed_path) as f:
+                return trial_id, json.load(f)
+        return None
+
+
+    def heartbeat(self, trial_id):
+        """Show that the worker running trial_id is still alive."""
+        try:
+            os.utime(self.claimed_dir / f"{trial_id}.json")
+        except FileNotFoundError:
+            # The claim was requeued; the result is still accepted.
+            pass
+
+
+    @contextmanager
+    def keep_alive(self, trial_id, interval):
+        """Send a heartbeat for trial_id every interval seconds, from a
+        background thread, for as long as the trial is running.
+        """
+        stop = threading.Event()
+
+        def send_heartbeats():
+            while not stop.wait(interval):
+                self.heartbeat(trial_id)
+
+        thread = threading.Thread(target=send_heartbeats, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+
+    def complete(self, trial_id, results):
+        """Record the results of a trial, and release the claim."""
+        write_json_atomic(self.done_dir / f"{trial_id}.json", results)
+        for directory in (self.claimed_dir, self.pending_dir):
+            # If this claim was requeued while it was running, there's no
+            #   need to run it again.
+            try:
+                os.remove(directory / f"{trial_id}.json")
+            except FileNotFoundError:
+                pass
+
+
+    def requeue_stale(self, stale_seconds):
+        """Move claims without a recent heartbeat back to pending.
+        Returns the number of trials requeued.
+        """
+        n_requeued = 0
+        now = time.time()
+        for trial_id in self.get_trial_ids(self.claimed_dir):
+            claimed_path = self.claimed_dir / f"{trial_id}.json"
+            try:
+                if now - claimed_path.stat().st_mtime < stale_seconds:
+                    continue
+                if (self.done_dir / f"{trial_id}.json").exists():
+                    os.remove(claimed_path)
+                    continue
+                os.rename(claimed_path, self.pending_dir / f"{trial_id}.json")
+                n_requeued += 1
+            except FileNotFoundError:
+                # Completed, or requeued by someone else, in the meantime.
+                continue
+        return n_requeued
+
+
+    def get_counts(self):
+        """Return the number of pending, claimed, and done trials."""
+        return (len(self.get_trial_ids(self.pending_dir)),
+                len(self.get_trial_ids(self.claimed_dir)),
+                len(self.get_trial_ids(self.done_dir)))
+
+
+    def is_finished(self):
+        """Return True if no trials are pending or claimed."""
+        n_pending, n_claimed, _ = self.get_counts()
+        return not n_pending and not n_claimed
+
+
+    def iter_results(self):
+        """Yield the results of every finished trial in the queue, in
+        trial order. This includes trials submitted by earlier
+        coordinators.
+        """
+        for trial_id in self.get_trial_ids(self.done_dir):
+            with open(self.done_dir / f"{trial_id}.json") as f:
+                yield json.load(f)
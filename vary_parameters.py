@@ -8,122 +8,116 @@ Output is a list of dicts; each dict contains the values for that trial:
 critical_rise, m_critical, tp/fp/fn, and a name for the series. These results
 can be analyzed in a separate file.
 
-This file will take a while to run, especially with the current naive
-processing approach. So, developing visualizations of this data will be much
-easier if they can be done separately from the work of varying the critical 
-parameters.
+By default, the whole grid of critical values is evaluated at once, in a
+single vectorized pass over the data. To run every trial through the full
+analysis instead, in a pool of worker processes (one per core by default):
+$ python vary_parameters.py --engine trials --jobs 8
+
+An adaptive search starts with the same coarse grid, and refines only where
+outcomes change, up to a budget of evaluated pairs:
+$ python vary_parameters.py --search adaptive --budget 200
+
+Each trial is written to an append-only results store as soon as it
+finishes. Trials already in the store aren't run again, so an interrupted
+sweep picks up where it left off. To discard earlier results and start
+over:
+$ python vary_parameters.py --fresh
+
+Other detection parameters can be swept too. Intermediate results are
+shared between trials that only differ in later-stage parameters:
+$ python vary_parameters.py --river-min-heights 20 20.5 --dedup-hours 6 12
+
+To spread a sweep across machines, start a coordinator, and then any number
+of workers that can see the same directory. Workers claim trials one at a
+time. Trials claimed by a worker that dies are retried by other workers:
+$ python vary_parameters.py --queue-dir /shared/sweep
+$ python vary_parameters.py --queue-dir /shared/sweep --worker
+
+Developing visualizations of this data is still much easier if they can be
+done separately from the work of varying the critical parameters.
 
 IMPORTANT: Can't trust this fully until further validation of known slides.
 For example, Starrigavan slide should be evaluated, and known slides should
 be confirmed against an existing list.
 """
 
-import sys, string, pprint, json
+import sys, string, pprint, json, argparse, os, time
+from itertools import product
+from multiprocessing import Pool
 
 from numpy import linspace
 
-# DEV: The functions used from plot_heights should be moved to utils.
-import plot_heights as ph
-from slide_event import SlideEvent
+from slide_event import SlideCatalog
 import utils.analysis_utils as a_utils
-from utils.analysis_utils import RISE_CRITICAL, M_CRITICAL
-
-
-def analyze_all_data(rise_critical, m_critical, verbose=False, 
-        all_results=[], alpha_name=''):
-    # DEV: This is an abuse of Python norms. All caps should be constants. :(
-    a_utils.RISE_CRITICAL = rise_critical
-    a_utils.M_CRITICAL = m_critical
-
-    # Make sure to call the correct parsing function for the data file format.
-    # Data analysis is data cleaning. :/
-    # DEV: Should probably walk the ir_data_clean directory, instead of making
-    #      this list manually.
-    # DEV: Should generate a JSON file of IRReading objects, and not have to
-    #      parse this data set.
-    data_files = [
-        'ir_data_clean/irva_utc_072014-022016_hx_format.txt',
-        'ir_data_clean/irva_akdt_022016-102019_arch_format.txt',
-    ]
-
-    # Get known slides.
-    slides_file = 'known_slides/known_slides.json'
-    known_slides = SlideEvent.load_slides(slides_file)
-
-    # Track overall stats.
-    #   How many notifications followed by slides?
-    #   How many notifications not followed by slides?
-    #   How many slides were not missed?
-    notifications_issued = 0
-    associated_notifications = 0
-    unassociated_notifications = 0
-    unassociated_notification_points = []
-    relevant_slides = []
-    unassociated_slides = []
-    notification_times = {}
-    earliest_reading, latest_reading = None, None
-
-    for data_file in data_files:
-        # Use proper parsing function.
-        if 'hx_format' in data_file:
-            all_readings = ph.get_readings_hx_format(data_file)
-        elif 'arch_format' in data_file:
-            all_readings = ph.get_readings_arch_format(data_file)
-
-        # Keep track of earliest and latest reading across all data files.
-        if not earliest_reading:
-            earliest_reading = all_readings[0]
-            latest_reading = all_readings[-1]
-        else:
-            if all_readings[0].dt_reading < earliest_reading.dt_reading:
-                earliest_reading = all_readings[0]
-            if all_readings[-1].dt_reading > latest_reading.dt_reading:
-                latest_reading = all_readings[-1]
-
-        # Get all the known slides that occurred during these readings.
-        slides_in_range = a_utils.get_slides_in_range(
-                known_slides, all_readings)
-
-        # Find the start of all critical periods in this data file.
-        first_critical_points = a_utils.get_first_critical_points(all_readings)
-        for reading in first_critical_points:
-            print(reading.get_formatted_reading())
-        notifications_issued += len(first_critical_points)
-
-        # reading_sets is a list of lists. Each list is a set of readings to
-        #   plot or analyze, based around a first critical point.
-        reading_sets = [a_utils.get_48hr_readings(fcp, all_readings)
-                                        for fcp in first_critical_points]
-
-        for reading_set in reading_sets:
-            critical_points = a_utils.get_critical_points(reading_set)
-            relevant_slide = ph.get_relevant_slide(reading_set, known_slides)
-            if relevant_slide:
-                relevant_slides.append(relevant_slide)
-                associated_notifications += 1
-                notification_time = ph.get_notification_time(critical_points,
-                        relevant_slide)
-                notification_times[relevant_slide] = notification_time
-                # Remove this slide from slides_in_range, so we'll
-                #   be left with unassociated slides.
-                slides_in_range.remove(relevant_slide)
-            else:
-                # This may be an unassociated notification.
-                unassociated_notification_points.append(critical_points[0])
-                unassociated_notifications += 1
-
-        # Any slides left in slides_in_range are unassociated.
-        #   We can grab a 48-hr data set around this slide.
-        for slide in slides_in_range:
-            # Get first reading after this slide, and base 48 hrs around that.
-            for reading in all_readings:
-                if reading.dt_reading > slide.dt_slide:
-                    slide_readings = a_utils.get_48hr_readings(
-                            reading, all_readings)
-                    break
-            unassociated_slides.append(slide)
+import utils.threshold_grid as threshold_grid
+import utils.parameter_search as parameter_search
+from utils.result_store import ResultStore, RESULTS_FILE
+import utils.result_store as result_store
+from utils.stats import AnalysisStats
+from utils.work_queue import WorkQueue
+
+
+# Make sure to call the correct parsing function for the data file format.
+# Data analysis is data cleaning. :/
+# DEV: Should probably walk the ir_data_clean directory, instead of making
+#      this list manually.
+DATA_FILES = [
+    'ir_data_clean/irva_utc_072014-022016_hx_format.txt',
+    'ir_data_clean/irva_akdt_022016-102019_arch_format.txt',
+]
+SLIDES_FILE = 'known_slides/known_slides.json'
+
+# Readings and known slides shared by every trial in a worker process.
+#   Set once per process by init_worker(), and only read after that.
+_sweep_data = {}
+
+
+def load_data(data_files=DATA_FILES, slides_file=SLIDES_FILE):
+    """Parse all data files and load known slides, once per sweep.
+    Returns a list of ReadingSeries, one per data file, and a SlideCatalog.
+    """
+    all_readings = [a_utils.get_readings_from_data_file(data_file)
+                        for data_file in data_files]
+    known_slides = SlideCatalog.load(slides_file)
+    return all_readings, known_slides
+
+
+def init_worker(all_readings, known_slides):
+    """Store shared sweep data in a worker process."""
+    _sweep_data['all_readings'] = all_readings
+    _sweep_data['known_slides'] = known_slides
+
+
+def analyze_all_data(rise_critical, m_critical, verbose=False,
+        all_readings=None, known_slides=None, alpha_name='',
+        **config_options):
+    """Run the full analysis for one pair of critical values.
+    Returns a dict summarizing the results of this trial.
+
+    Pass all_readings and known_slides from load_data() to avoid parsing
+      data files on every trial.
+    Any other AnalysisConfig fields, such as dedup_hours, can be passed as
+      keyword arguments.
+    """
+    if all_readings is None or known_slides is None:
+        all_readings, known_slides = load_data()
+
+    # Each trial gets its own config and stats, so trials can safely run
+    #   in the same process, or in threads.
+    config = a_utils.AnalysisConfig(rise_critical, m_critical,
+            **config_options)
+    stats = AnalysisStats()
+    for readings in all_readings:
+        a_utils.get_reading_sets(readings, known_slides, stats, config)
 
     # Summarize results.
+    earliest_reading = stats['earliest_reading']
+    latest_reading = stats['latest_reading']
+    relevant_slides = stats['relevant_slides']
+    notification_times = stats['notification_times']
+    unassociated_notifications = stats['unassociated_notifications']
+    unassociated_notification_points = stats['unassociated_notification_points']
+
     assert(unassociated_notifications == len(unassociated_notification_points))
     unassociated_slides = set(known_slides) - set(relevant_slides)
     slides_outside_range = []
@@ -137,11 +131,11 @@ def analyze_all_data(rise_critical, m_critical, verbose=False,
     if verbose:
         print("\n\n --- Final Results ---\n")
         print(f"Data analyzed from: {start_str} to {end_str}")
-        print(f"  Critical rise used: {a_utils.RISE_CRITICAL} feet")
-        print(f"  Critical rise rate used: {a_utils.M_CRITICAL} ft/hr")
+        print(f"  Critical rise used: {config.rise_critical} feet")
+        print(f"  Critical rise rate used: {config.m_critical} ft/hr")
 
-        print(f"\nNotifications Issued: {notifications_issued}")
-        print(f"\nTrue Positives: {associated_notifications}")
+        print(f"\nNotifications Issued: {stats['notifications_issued']}")
+        print(f"\nTrue Positives: {stats['associated_notifications']}")
         for slide in relevant_slides:
             print(f"  {slide.name} - Notification time: {notification_times[slide]} minutes")
         print(f"\nFalse Positives: {unassociated_notifications}")
@@ -155,42 +149,331 @@ def analyze_all_data(rise_critical, m_critical, verbose=False,
         for slide in slides_outside_range:
             print(f"  {slide.name}")
 
-
-    # Build results dict here, and add to file.
+    # Build results dict for this trial.
     results_dict = {
         'alpha name': alpha_name,
-        'name': f"{a_utils.RISE_CRITICAL}_{a_utils.M_CRITICAL}",
-        'critical rise': a_utils.RISE_CRITICAL,
-        'critical slope': a_utils.M_CRITICAL,
-        'true positives': associated_notifications,
+        'name': result_store.get_trial_name(config),
+    }
+    results_dict.update(result_store.get_config_fields(config))
+    results_dict.update({
+        'true positives': stats['associated_notifications'],
         'false positives': unassociated_notifications,
         'false negatives': len(unassociated_slides),
         'notification times': list(notification_times.values()),
-    }
+    })
+
+    return results_dict
+
+
+def run_trial(trial):
+    """Run one trial in a worker process, using the shared sweep data.
+    trial is a tuple of (config, alpha_name).
+    """
+    config, alpha_name = trial
+    print(f"\n --- {result_store.get_trial_name(config)} ---")
+    return analyze_all_data(alpha_name=alpha_name,
+            all_readings=_sweep_data['all_readings'],
+            known_slides=_sweep_data['known_slides'], **config._asdict())
+
+
+def get_alpha_name(trial_index):
+    """Return a label for a trial: A-Z, then AA, AB, ..."""
+    letters = string.ascii_uppercase
+    name = ''
+    trial_index += 1
+    while trial_index:
+        trial_index, remainder = divmod(trial_index - 1, len(letters))
+        name = letters[remainder] + name
+    return name
+
+
+def run_sweep(parameter_sets, all_readings, known_slides, jobs=None,
+        store=None, first_index=0):
+    """Run a trial for every set of parameters. Each parameter set is an
+    AnalysisConfig, or a (rise_critical, m_critical) pair.
+
+    Data is parsed once, by the caller, and shared read-only with a pool of
+      worker processes. Results are returned in the same order as
+      parameter_sets, regardless of which trial finishes first.
+
+    If a ResultStore is passed, trials already in the store are skipped, and
+      each new trial is written to the store as soon as it finishes.
+
+    Trials are labeled in order, starting with the label for first_index.
+    """
+    trials = [(result_store.get_config(parameters),
+                    get_alpha_name(trial_index))
+                for trial_index, parameters in enumerate(parameter_sets,
+                                                         first_index)]
+    if store is not None:
+        trials = [trial for trial in trials if trial[0] not in store]
+
+    if jobs == 1:
+        init_worker(all_readings, known_slides)
+        all_results = map(run_trial, trials)
+        return collect_results(parameter_sets, all_results, store)
+
+    with Pool(processes=jobs, initializer=init_worker,
+            initargs=(all_readings, known_slides)) as pool:
+        # imap() yields results in order, as soon as each one is ready.
+        all_results = pool.imap(run_trial, trials)
+        return collect_results(parameter_sets, all_results, store)
 
-    all_results.append(results_dict)
 
-    # Write all_results to file for further analysis.
-    filename = 'other_output/all_results.json'
+def get_alpha_names(parameter_sets, first_index=0):
+    """Return the alpha name for each trial, keyed by its trial key."""
+    return {result_store.get_trial_key(parameters): get_alpha_name(trial_index)
+                for trial_index, parameters in enumerate(parameter_sets,
+                                                         first_index)}
+
+
+def run_grid(parameter_sets, all_readings, known_slides, store=None,
+        cache=None, first_index=0):
+    """Evaluate every set of parameters in one vectorized pass.
+    Results are the same as run_sweep(), without running each trial.
+
+    Pass a threshold_grid.StageCache to reuse intermediate results between
+      calls.
+    """
+    alpha_names = get_alpha_names(parameter_sets, first_index)
+    pending_sets = parameter_sets
+    if store is not None:
+        pending_sets = store.get_pending(parameter_sets)
+
+    all_results = []
+    if pending_sets:
+        all_results = threshold_grid.evaluate_grid(all_readings,
+                known_slides, pending_sets, cache=cache)
+    for parameters, results_dict in zip(pending_sets, all_results):
+        results_dict['alpha name'] = alpha_names[
+                result_store.get_trial_key(parameters)]
+    return collect_results(parameter_sets, all_results, store)
+
+
+def collect_results(parameter_sets, new_results, store=None):
+    """Write new results to the store as they arrive.
+    Returns results for every set in parameter_sets, in order, including
+      results from earlier runs that are already in the store.
+    """
+    if store is None:
+        return list(new_results)
+
+    for results_dict in new_results:
+        store.append(results_dict)
+    return store.get_results(parameter_sets)
+
+
+def run_adaptive_search(rise_range, m_range, all_readings, known_slides,
+        engine='grid', jobs=None, budget=200, store=None, base_config=None):
+    """Search coarse-to-fine for the best critical values, evaluating at
+    most budget pairs.
+    Parameters other than rise_critical and m_critical come from
+      base_config, if it's given.
+    Trials are labeled in the order they're evaluated, so each label is
+      final when the trial is written to the store.
+    Returns all evaluated results, and the Pareto front.
+    """
+    if base_config is None:
+        base_config = a_utils.AnalysisConfig()
+    cache = threshold_grid.StageCache()
+    n_evaluated = 0
+
+    def evaluate(parameter_pairs):
+        nonlocal n_evaluated
+        first_index = n_evaluated
+        n_evaluated += len(parameter_pairs)
+        configs = [base_config._replace(rise_critical=rise_critical,
+                        m_critical=m_critical)
+                    for rise_critical, m_critical in parameter_pairs]
+        if engine == 'grid':
+            return run_grid(configs, all_readings, known_slides,
+                    store=store, cache=cache, first_index=first_index)
+        return run_sweep(configs, all_readings, known_slides,
+                jobs=jobs, store=store, first_index=first_index)
+
+    return parameter_search.adaptive_search(evaluate, rise_range, m_range,
+            budget=budget)
+
+
+def get_trial_id(parameters):
+    """Return the id of a trial in a shared work queue. It comes from the
+    trial's parameters, so the same id always means the same trial.
+    """
+    return '_'.join(str(value)
+                        for value in result_store.get_trial_key(parameters))
+
+
+def submit_trials(queue_dir, parameter_sets, store=None):
+    """Put every trial that isn't already in the store in a shared work
+    queue. Returns the queue.
+    """
+    queue = WorkQueue(queue_dir)
+    trials = []
+    for parameters in parameter_sets:
+        config = result_store.get_config(parameters)
+        if store is not None and config in store:
+            continue
+        # DEV: Alpha names depend on the sweep, so they're not part of the
+        #   trial. The coordinator adds them when it collects results.
+        trials.append((get_trial_id(config), config._asdict()))
+    n_added = queue.submit(trials)
+    print(f"\nQueued {n_added} trials in {queue_dir}.")
+    return queue
+
+
+def run_coordinator(queue_dir, parameter_sets, store=None,
+        stale_seconds=600, poll_seconds=5):
+    """Queue every trial, wait for workers to run them, and collect the
+    results.
+
+    Claims without a heartbeat for stale_seconds are requeued, in case
+      their worker died.
+    Returns results in the same order as parameter_sets. The queue
+      directory may hold results from earlier sweeps; only results for
+      parameter_sets are returned.
+    """
+    queue = submit_trials(queue_dir, parameter_sets, store)
+    while not queue.is_finished():
+        n_requeued = queue.requeue_stale(stale_seconds)
+        if n_requeued:
+            print(f"  Requeued {n_requeued} stale trials.")
+        n_pending, n_claimed, n_done = queue.get_counts()
+        print(f"  Pending: {n_pending}, running: {n_claimed}, done: {n_done}")
+        time.sleep(poll_seconds)
+
+    queue_results = {result_store.get_result_key(results_dict): results_dict
+                        for results_dict in queue.iter_results()}
+    new_results = []
+    for trial_key, alpha_name in get_alpha_names(parameter_sets).items():
+        if trial_key in queue_results:
+            results_dict = queue_results[trial_key]
+            results_dict['alpha name'] = alpha_name
+            new_results.append(results_dict)
+    return collect_results(parameter_sets, new_results, store)
+
+
+def run_worker(queue_dir, all_readings, known_slides, stale_seconds=600,
+        poll_seconds=5):
+    """Claim and run trials from a shared work queue, until no trials are
+    pending or running.
+    Returns the number of trials this worker ran.
+    """
+    queue = WorkQueue(queue_dir)
+    n_trials = 0
+    while True:
+        claim = queue.claim()
+        if claim is None:
+            # Another worker may have died while running a trial.
+            queue.requeue_stale(stale_seconds)
+            if queue.is_finished():
+                return n_trials
+            time.sleep(poll_seconds)
+            continue
+
+        trial_id, trial = claim
+        with queue.keep_alive(trial_id, stale_seconds / 4):
+            results_dict = analyze_all_data(all_readings=all_readings,
+                    known_slides=known_slides, **trial)
+        queue.complete(trial_id, results_dict)
+        n_trials += 1
+
+
+def write_results(all_results, filename='other_output/all_results.json'):
+    """Write all_results to file for further analysis."""
     with open(filename, 'w') as f:
         json.dump(all_results, f, indent=4)
 
+
+# Define cli arguments.
+parser = argparse.ArgumentParser()
+parser.add_argument('--engine', choices=['grid', 'trials'], default='grid',
+    help="grid: evaluate all pairs at once. trials: run each trial in full.")
+parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+    help="Number of worker processes. Default: one per core.")
+parser.add_argument('--search', choices=['grid', 'adaptive'], default='grid',
+    help="grid: fixed 5x5 grid. adaptive: refine where outcomes change.")
+parser.add_argument('--budget', type=int, default=200,
+    help="Maximum number of pairs to evaluate in an adaptive search.")
+parser.add_argument('--river-min-heights', nargs='+', type=float,
+    default=[a_utils.RIVER_MIN_HEIGHT],
+    help="Base river heights to sweep over, in feet.")
+parser.add_argument('--lookback-hours', nargs='+', type=float,
+    default=[None],
+    help="Lookbacks to sweep over. Default: rise / slope, rounded up.")
+parser.add_argument('--dedup-hours', nargs='+', type=int,
+    default=[a_utils.DEDUP_HOURS],
+    help="Hours after a first critical point that belong to the same event.")
+parser.add_argument('--window-hours', nargs='+', type=int,
+    default=[a_utils.WINDOW_HOURS],
+    help="Hours of readings on each side of a first critical point.")
+parser.add_argument('--fresh', action='store_true',
+    help="Discard earlier results in the results store, and start over.")
+parser.add_argument('--results-file', default=RESULTS_FILE,
+    help="Append-only store of results, one trial per line.")
+parser.add_argument('--queue-dir',
+    help="Shared directory for a work queue. Run one coordinator, and any number of --worker processes on any host.")
+parser.add_argument('--worker', action='store_true',
+    help="Run trials from --queue-dir, instead of coordinating.")
+parser.add_argument('--stale-seconds', type=float, default=600,
+    help="Requeue claimed trials with no heartbeat for this long.")
+parser.add_argument('--data-files', nargs='+', default=DATA_FILES,
+    help="Data files to analyze.")
+
+
 if __name__ == '__main__':
-    all_results = []
-    alpha_names = list(string.ascii_uppercase)
+    args = parser.parse_args()
 
     # Intervals over which to iterate. linspace(x, y, z) varies from
     #   x to y in z evenly-spaced steps.
-    for rise_critical in linspace(2.25, 2.75, 5):
-        for m_critical in linspace(0.375, 0.625, 5):
+    rise_range, m_range = (2.25, 2.75), (0.375, 0.625)
+    parameter_sets = [a_utils.AnalysisConfig(*parameters)
+                        for parameters in product(
+                            linspace(*rise_range, 5),
+                            linspace(*m_range, 5),
+                            args.river_min_heights, args.lookback_hours,
+                            args.dedup_hours, args.window_hours)]
+
+    if args.worker:
+        if not args.queue_dir:
+            parser.error("--worker requires --queue-dir.")
+        all_readings, known_slides = load_data(args.data_files)
+        n_trials = run_worker(args.queue_dir, all_readings, known_slides,
+                stale_seconds=args.stale_seconds)
+        print(f"\n --- Worker finished; ran {n_trials} trials ---")
+        sys.exit()
 
-            print(f"\n --- rc={rise_critical}, mc={m_critical} ---")
+    all_readings, known_slides = load_data(args.data_files)
+    store = ResultStore(args.results_file, fresh=args.fresh)
+    if store:
+        print(f"\nResuming; {len(store)} trials already in {args.results_file}.")
 
-            alpha_name = alpha_names.pop(0)
-            analyze_all_data(rise_critical=rise_critical, m_critical=m_critical,
-                all_results=all_results, alpha_name=alpha_name)
+    if args.search == 'adaptive':
+        base_config = a_utils.AnalysisConfig(
+                river_min_height=args.river_min_heights[0],
+                lookback_hours=args.lookback_hours[0],
+                dedup_hours=args.dedup_hours[0],
+                window_hours=args.window_hours[0])
+        all_results, pareto_front = run_adaptive_search(rise_range, m_range,
+                all_readings, known_slides, engine=args.engine,
+                jobs=args.jobs, budget=args.budget, store=store,
+                base_config=base_config)
+        print(f"\nEvaluated {len(all_results)} pairs of critical values.")
+        print("Pareto front (rise, slope: tp/fp/fn):")
+        for results_dict in pareto_front:
+            print(f"  {results_dict['critical rise']}, {results_dict['critical slope']}: {results_dict['true positives']}/{results_dict['false positives']}/{results_dict['false negatives']}")
+    elif args.queue_dir:
+        all_results = run_coordinator(args.queue_dir, parameter_sets,
+                store=store, stale_seconds=args.stale_seconds)
+    elif args.engine == 'grid':
+        all_results = run_grid(parameter_sets, all_readings, known_slides,
+                store=store)
+    else:
+        all_results = run_sweep(parameter_sets, all_readings, known_slides,
+                jobs=args.jobs, store=store)
+
+    # Also write the results of this sweep as one json file.
+    write_results(all_results)
 
     print("\n --- Finished all analysis ---")
     pp = pprint.PrettyPrinter(indent=4)
     pp.pprint(all_results)
-